@@ -23,20 +23,65 @@
 #
 #
 
+from __future__ import annotations
+
+import argparse
 import base64
+import collections
+import contextlib
+import csv
 import hashlib
+import importlib
+import importlib.util
+import io
+import json
+import mmap
 import os
 import re
 import shutil
+import socket
 import sys
+import tempfile
+import time
 import traceback
 import zipfile
 from abc import ABC, abstractmethod
-from datetime import datetime
+from collections.abc import Callable, Iterable, Iterator
+from datetime import datetime, timedelta
+
+
+class LazyModule:
+    """
+    Imports a module on first attribute access. Keeps heavy dependencies like pandas
+    and SQLAlchemy out of imports which do not need them (see LightweightImporter).
+    """
 
-import pandas as pd
-import sqlalchemy as db
-from sqlalchemy import exc
+    def __init__(self, name: str):
+        self.__name = name
+        self.__module = None
+
+    def is_available(self) -> bool:
+        return importlib.util.find_spec(self.__name.split('.')[0]) is not None
+
+    def __getattr__(self, attr: str):
+        if self.__module is None:
+            self.__module = importlib.import_module(self.__name)
+        return getattr(self.__module, attr)
+
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+db = LazyModule('sqlalchemy')
+exc = LazyModule('sqlalchemy.exc')
+pa = LazyModule('pyarrow')
+pc = LazyModule('pyarrow.compute')
+pa_csv = LazyModule('pyarrow.csv')
+psycopg2 = LazyModule('psycopg2')
+psycopg2_extras = LazyModule('psycopg2.extras')
+futures = LazyModule('concurrent.futures')
+cProfile = LazyModule('cProfile')
+tracemalloc = LazyModule('tracemalloc')
+resource = LazyModule('resource')
 
 """
 Script to verify and import p21 data into the AKTIN DWH:
@@ -51,42 +96,80 @@ through the optional csv-files (fab,icd,ops) and uploads their facts too
 """
 
 class P21Importer:
-
-  def __init__(self, path_zip: str):
+  """
+  Imports with fewer csv rows than THRESHOLD_LIGHTWEIGHT_IMPORT (all four csv files
+  together) are done by the LightweightImporter, which avoids loading pandas and
+  SQLAlchemy. The threshold can be set by the environment variable
+  'p21_lightweight_threshold' (0 disables the LightweightImporter).
+  """
+  THRESHOLD_LIGHTWEIGHT_IMPORT: int = 10000
+
+  def __init__(self, path_zip: str, cache: EncounterMatchingCache = None):
     self.__zfe = ZipFileExtractor(path_zip)
     path_parent = os.path.dirname(path_zip)
     self.__tfm = TmpFolderManager(path_parent)
+    self.__cache = cache if cache is not None else EncounterMatchingCache()
+    self.__report = ImportStageReport()
+    self.__profiler = StageProfiler(os.path.splitext(os.path.basename(path_zip))[0])
     self.__num_imports = 0
     self.__num_updates = 0
 
   def __extract_and_rename_zip_content(self) -> str:
-    path_tmp = self.__tfm.create_tmp_folder()
+    path_tmp = self.__tfm.create_tmp_folder(self.__zfe.get_uncompressed_size())
     self.__zfe.extract_zip_to_folder(path_tmp)
     self.__tfm.rename_files_in_tmp_folder_to_lowercase()
     return path_tmp
 
   def __preprocess_and_check_csv_files(self, path_folder: str):
-    for v, p in [
-      (FALLVerifier, FALLPreprocessor),
-      (FABVerifier, FABPreprocessor),
-      (ICDVerifier, ICDPreprocessor),
-      (OPSVerifier, OPSPreprocessor),
-    ]:
-      verifier = v(path_folder)
-      preprocessor = p(path_folder)
-      if verifier.is_csv_in_folder():
-        preprocessor.preprocess()
-        verifier.check_column_names_of_csv()
+    """
+    The csv files are independent of each other and are preprocessed concurrently
+    in a process pool. Results are collected in the order of the files, so the
+    SystemExit of the first failing file is raised. The stages measured by the
+    workers are added to the report. When profiling, the files are preprocessed
+    one after another in this process, so that the profiler can see them.
+    """
+    list_pairs = [
+      (v, p)
+      for v, p in [
+        (FALLVerifier, FALLPreprocessor),
+        (FABVerifier, FABPreprocessor),
+        (ICDVerifier, ICDPreprocessor),
+        (OPSVerifier, OPSPreprocessor),
+      ]
+      if v(path_folder).is_csv_in_folder()
+    ]
+    num_workers = min(len(list_pairs), os.cpu_count() or 1)
+    if num_workers <= 1 or self.__profiler.is_enabled():
+      for v, p in list_pairs:
+        self.__report.add_stages(self._preprocess_and_check_csv_file(v, p, path_folder))
+      return
+    with futures.ProcessPoolExecutor(max_workers=num_workers) as executor:
+      list_futures = [executor.submit(self._preprocess_and_check_csv_file, v, p, path_folder) for v, p in list_pairs]
+      for future in list_futures:
+        self.__report.add_stages(future.result())
+
+  @staticmethod
+  def _preprocess_and_check_csv_file(verifier_class: type, preprocessor_class: type, path_folder: str) -> list:
+    """
+    Returns the measured stages (see ImportStageReport.get_stages())
+    """
+    report = ImportStageReport()
+    preprocessor = preprocessor_class(path_folder)
+    with report.measure('preprocessing', preprocessor.CSV_NAME):
+      preprocessor.preprocess()
+    with report.measure('check_column_names', preprocessor.CSV_NAME):
+      verifier_class(path_folder).check_column_names_of_csv()
+    return report.get_stages()
 
   def __get_matched_encounters(self, list_valid_ids: list) -> pd.DataFrame:
     try:
       extractor = EncounterInfoExtractorWithBillingId()
-      matcher = DatabaseEncounterMatcher(extractor)
+      matcher = DatabaseEncounterMatcher(extractor, self.__cache, self.__report)
       return matcher.get_matched_df(list_valid_ids)
     except ValueError:
       print("Matching by billing id failed. trying matching by encounter id...")
       extractor = EncounterInfoExtractorWithEncounterId()
-      matcher = DatabaseEncounterMatcher(extractor)
+      matcher = DatabaseEncounterMatcher(extractor, self.__cache, self.__report)
       return matcher.get_matched_df(list_valid_ids)
 
   def __enrich_with_admission_dates(self, verifier_fall, df_mapping: pd.DataFrame) -> pd.DataFrame:
@@ -97,10 +180,11 @@ class P21Importer:
     })
     return pd.merge(df_mapping, df_admission_dates, on=["encounter_id"])
 
-  def __print_verification_stats(self, verifier_fall, list_valid_ids: list, df_mapping: pd.DataFrame):
-    print(f"Fälle gesamt: {verifier_fall.count_total_encounter()}")
-    print(f"Fälle valide: {len(list_valid_ids)}")
-    print(f"Valide Fälle gematcht mit Datenbank: {df_mapping.shape[0]}")
+  def __print_verification_stats(self, num_total: int, num_valid: int, num_matched: int):
+    print(f"Fälle gesamt: {num_total}")
+    print(f"Fälle valide: {num_valid}")
+    print(f"Valide Fälle gematcht mit Datenbank: {num_matched}")
+    self.__report.ATTRIBUTES.update(encounters_total=num_total, encounters_valid=num_valid, encounters_matched=num_matched)
 
   def __import_observation_facts(self, df_mapping: pd.DataFrame, path_tmp:str):
     for uploader_class in [
@@ -109,9 +193,10 @@ class P21Importer:
       ICDObservationFactUploadManager,
       OPSObservationFactUploadManager,
     ]:
-      uploader = uploader_class(df_mapping, path_tmp)
+      uploader = uploader_class(df_mapping, path_tmp, self.__report)
       if uploader.VERIFIER.is_csv_in_folder():
-        uploader.upload_csv()
+        with self.__profiler.profile('upload', uploader.VERIFIER.CSV_NAME):
+          uploader.upload_csv()
       # Store metrics for unique encounters
       if isinstance(uploader, FALLObservationFactUploadManager):
         self.__num_imports = uploader.NUM_IMPORTS
@@ -122,6 +207,12 @@ class P21Importer:
     print(f"Neue Fälle hochgeladen: {self.__num_imports}")
     print(f"Bestehende Fälle aktualisiert: {self.__num_updates}")
 
+  def get_import_results(self) -> tuple:
+    """
+    Returns the number of new and of updated encounters of the last import
+    """
+    return self.__num_imports, self.__num_updates
+
   def import_file(self):
     """Handles the full file import and data upload process.
 
@@ -136,18 +227,505 @@ class P21Importer:
       Raises:
           Exception: Propagates any errors from processing steps (final cleanup always occurs)
       """
+    self.__report = ImportStageReport(path_zip=self.__zfe.PATH_ZIP, success=False)
+    monitor = SQLStatementMonitor()
+    monitor.start()
+    try:
+      ObservationFactStaticColumns.begin_import()
+      with self.__measure('extraction'):
+        path_tmp = self.__extract_and_rename_zip_content()
+      if self.__is_lightweight_import(path_tmp):
+        self.__report.ATTRIBUTES['engine'] = 'lightweight'
+        self.__import_with_lightweight_importer(path_tmp)
+      else:
+        self.__report.ATTRIBUTES['engine'] = 'pandas'
+        self.__import_with_pandas(path_tmp)
+      self.__print_import_results()
+      self.__report.ATTRIBUTES['success'] = True
+    finally:
+      self.__tfm.remove_tmp_folder()
+      monitor.stop()
+      self.__report.ATTRIBUTES.update(encounters_imported=self.__num_imports, encounters_updated=self.__num_updates,
+                                      sql=monitor.to_dict(self.__num_imports + self.__num_updates))
+      self.__report.write()
+
+  def check_file(self):
+    """
+    Checks the zip file, the existence of fall.csv and the column names of all csv
+    files without importing anything. Only the header lines of the csv files are
+    extracted and checked like in the LightweightImporter, so neither pandas nor
+    SQLAlchemy is loaded.
+    """
     try:
-      path_tmp = self.__extract_and_rename_zip_content()
+      path_tmp = self.__tfm.create_tmp_folder()
+      self.__zfe.extract_headers_to_folder(path_tmp)
+      self.__tfm.rename_files_in_tmp_folder_to_lowercase()
+      LightweightImporter(path_tmp).check_csv_files()
+      print("Prüfung der Datei erfolgreich")
+    finally:
+      self.__tfm.remove_tmp_folder()
+
+  @contextlib.contextmanager
+  def __measure(self, name: str, file: str = None) -> Iterator[dict]:
+    """
+    Measures a stage of the import for the report and profiles it, if enabled
+    (see StageProfiler)
+    """
+    with self.__profiler.profile(name, file), self.__report.measure(name, file) as stage:
+      yield stage
+
+  def __is_lightweight_import(self, path_tmp: str) -> bool:
+    threshold = int(os.environ.get('p21_lightweight_threshold', self.THRESHOLD_LIGHTWEIGHT_IMPORT))
+    return LightweightImporter.count_csv_rows(path_tmp) < threshold
+
+  def __import_with_pandas(self, path_tmp: str):
+    with self.__measure('preprocessing_all_files'):
       self.__preprocess_and_check_csv_files(path_tmp)
-      verifier_fall = FALLVerifier(path_tmp)
+    verifier_fall = FALLVerifier(path_tmp)
+    with self.__measure('verification_valid_ids', verifier_fall.CSV_NAME) as stage:
       list_valid_ids = verifier_fall.get_unique_ids_of_valid_encounter()
+      stage['rows_out'] += len(list_valid_ids)
+    with self.__measure('matching') as stage:
       df_mapping = self.__get_matched_encounters(list_valid_ids)
+      stage['rows_in'] += len(list_valid_ids)
+      stage['rows_out'] += df_mapping.shape[0]
+    with self.__measure('verification_admission_dates', verifier_fall.CSV_NAME) as stage:
       df_mapping = self.__enrich_with_admission_dates(verifier_fall, df_mapping)
-      self.__print_verification_stats(verifier_fall, list_valid_ids, df_mapping)
-      self.__import_observation_facts(df_mapping, path_tmp)
-      self.__print_import_results()
+      stage['rows_out'] += df_mapping.shape[0]
+    with self.__measure('verification_count', verifier_fall.CSV_NAME) as stage:
+      num_total = verifier_fall.count_total_encounter()
+      stage['rows_in'] += num_total
+    self.__print_verification_stats(num_total, len(list_valid_ids), df_mapping.shape[0])
+    self.__import_observation_facts(df_mapping, path_tmp)
+
+  def __import_with_lightweight_importer(self, path_tmp: str):
+    importer = LightweightImporter(path_tmp, self.__cache, self.__report)
+    with self.__measure('check_column_names'):
+      importer.check_csv_files()
+    with self.__measure('verification_admission_dates', FALLVerifier.CSV_NAME) as stage:
+      dict_admission_dates = importer.get_valid_encounter_with_admission_dates()
+      stage['rows_out'] += len(dict_admission_dates)
+    with self.__measure('matching') as stage:
+      dict_mapping = importer.get_matched_encounters(list(dict_admission_dates.keys()))
+      num_matched = sum(len(list_matches) for list_matches in dict_mapping.values())
+      stage['rows_in'] += len(dict_admission_dates)
+      stage['rows_out'] += num_matched
+    with self.__measure('verification_count', FALLVerifier.CSV_NAME) as stage:
+      num_total = importer.count_total_encounter()
+      stage['rows_in'] += num_total
+    self.__print_verification_stats(num_total, len(dict_admission_dates), num_matched)
+    with self.__profiler.profile('upload'):
+      importer.upload_csv_files(dict_mapping, dict_admission_dates)
+    self.__num_imports = importer.NUM_IMPORTS
+    self.__num_updates = importer.NUM_UPDATES
+
+
+class P21BatchImporter:
+  """
+  Imports several zip files one after another in a single process. The database
+  engine, the reflected tables, the parsed aktin.properties, the created pseudonyms
+  and the encounter info extracted from the database are shared between the imports
+  (see DatabaseConnection and EncounterMatchingCache). All zip files are checked
+  before the first import. A failing zip file does not stop the batch, neither by
+  SystemExit nor by any other exception; a report of all zip files is printed at
+  the end.
+  """
+
+  def __init__(self, list_path_zip: list):
+    self.__cache = EncounterMatchingCache()
+    self.__list_importers = [(path_zip, P21Importer(path_zip, self.__cache)) for path_zip in list_path_zip]
+    self.__list_reports = []
+
+  def import_files(self) -> bool:
+    """
+    Returns True, if all zip files were imported successfully
+    """
+    try:
+      for i, (path_zip, importer) in enumerate(self.__list_importers, start=1):
+        print(f"Datei {i}/{len(self.__list_importers)}: {path_zip}")
+        self.__import_file(path_zip, importer)
     finally:
-      self.__tfm.remove_tmp_folder()
+      DatabaseConnection.dispose_engines()
+      self.__print_report()
+    return all(error is None for _, _, _, error in self.__list_reports)
+
+  def __import_file(self, path_zip: str, importer: P21Importer):
+    time_start = time.perf_counter()
+    try:
+      importer.import_file()
+      error = None
+    except SystemExit as exit_import:
+      error = str(exit_import)
+      print(f"Import fehlgeschlagen: {error}")
+    except Exception as exception:
+      traceback.print_exc()
+      error = f"{type(exception).__name__}: {exception}"
+      print(f"Import fehlgeschlagen: {error}")
+    self.__list_reports.append((path_zip, importer.get_import_results(), time.perf_counter() - time_start, error))
+
+  def __print_report(self):
+    print("Zusammenfassung:")
+    for path_zip, (num_imports, num_updates), seconds, error in self.__list_reports:
+      if error is None:
+        print(f"{path_zip}: {num_imports + num_updates} Fälle hochgeladen ({num_imports} neu, {num_updates} aktualisiert) in {seconds:.1f} s")
+      else:
+        print(f"{path_zip}: fehlgeschlagen nach {seconds:.1f} s ({error})")
+
+
+class P21ImportWorker:
+  """
+  Long-running worker, which keeps the interpreter, pandas, SQLAlchemy, the database
+  engine, the reflected tables and the parsed aktin.properties warm between imports.
+  Jobs are received as json lines through a unix socket (see P21ImportWorkerClient)
+  and imported one after another, each with its own environment variables and its
+  own EncounterMatchingCache. Everything the import writes to stdout and stderr is
+  sent back line by line, followed by the exit code of the import.
+  """
+
+  def __init__(self, path_socket: str):
+    self.PATH_SOCKET = path_socket
+
+  def serve_forever(self):
+    self.__warm_up()
+    if os.path.exists(self.PATH_SOCKET):
+      os.remove(self.PATH_SOCKET)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+      umask = os.umask(0o177)
+      try:
+        server.bind(self.PATH_SOCKET)
+      finally:
+        os.umask(umask)
+      server.listen()
+      print(f"p21 worker listening on {self.PATH_SOCKET}")
+      try:
+        while True:
+          conn, _ = server.accept()
+          with conn:
+            try:
+              self.handle_connection(conn)
+            except (OSError, ValueError):
+              traceback.print_exc()
+      finally:
+        DatabaseConnection.dispose_engines()
+        os.remove(self.PATH_SOCKET)
+
+  @staticmethod
+  def __warm_up():
+    _ = pd.DataFrame, np.ndarray, db.Table
+    if all(key in os.environ for key in P21ImportWorkerClient.LIST_ENV_KEYS):
+      ObservationFactTableHandler().reflect_table()
+      AktinPropertiesReader().get_property('pseudonym.salt')
+
+  def handle_connection(self, conn: socket.socket):
+    with conn.makefile('r', encoding='utf-8') as file_in, conn.makefile('w', encoding='utf-8') as file_out:
+      line = file_in.readline()
+      if not line:
+        return
+      code_exit = self.run_job(json.loads(line), file_out)
+      file_out.write(json.dumps({'exit': code_exit}) + '\n')
+      file_out.flush()
+
+  @staticmethod
+  def run_job(dict_job: dict, file_out) -> int:
+    """
+    Imports the zip file of given job with the environment variables of the job.
+    Returns the exit code the import would have in a process of its own
+    """
+    environ_worker = dict(os.environ)
+    os.environ.update(dict_job.get('env', {}))
+    try:
+      with contextlib.redirect_stdout(WorkerOutputStream(file_out, 'stdout')), contextlib.redirect_stderr(WorkerOutputStream(file_out, 'stderr')):
+        try:
+          P21Importer(dict_job['path_zip']).import_file()
+          return 0
+        except SystemExit as exit_import:
+          if exit_import.code is None or isinstance(exit_import.code, int):
+            return exit_import.code or 0
+          print(exit_import.code, file=sys.stderr)
+          return 1
+        except Exception:
+          traceback.print_exc()
+          return 1
+    finally:
+      os.environ.clear()
+      os.environ.update(environ_worker)
+
+
+class WorkerOutputStream(io.TextIOBase):
+  """
+  Helper class to send everything written to stdout or stderr during a job of the
+  P21ImportWorker as json lines of given name
+  """
+
+  def __init__(self, file_out, name: str):
+    self.FILE_OUT = file_out
+    self.NAME = name
+
+  def writable(self) -> bool:
+    return True
+
+  def write(self, text: str) -> int:
+    if text:
+      self.FILE_OUT.write(json.dumps({self.NAME: text}) + '\n')
+      self.FILE_OUT.flush()
+    return len(text)
+
+
+class P21ImportWorkerClient:
+  """
+  Sends an import job to a running P21ImportWorker and writes its output to stdout
+  and stderr as if the import was done in this process. Only the environment
+  variables of the import (LIST_ENV_KEYS and all variables starting with 'p21_')
+  are sent along.
+  """
+  LIST_ENV_KEYS = ['script_id', 'script_version', 'uuid', 'username', 'password', 'connection-url', 'path_aktin_properties']
+
+  def __init__(self, path_socket: str):
+    self.PATH_SOCKET = path_socket
+
+  def submit(self, path_zip: str) -> int | None:
+    """
+    Returns the exit code of the import or None, if no worker is listening on the
+    socket. The import must then be done in this process
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+      try:
+        conn.connect(self.PATH_SOCKET)
+      except (FileNotFoundError, ConnectionRefusedError):
+        return None
+      with conn.makefile('r', encoding='utf-8') as file_in, conn.makefile('w', encoding='utf-8') as file_out:
+        file_out.write(json.dumps({'path_zip': os.path.abspath(path_zip), 'env': self.__get_job_environment()}) + '\n')
+        file_out.flush()
+        for line in file_in:
+          dict_message = json.loads(line)
+          if 'exit' in dict_message:
+            return dict_message['exit']
+          for name, text in dict_message.items():
+            getattr(sys, name).write(text)
+    raise SystemExit('connection to p21 worker was lost during import')
+
+  def __get_job_environment(self) -> dict:
+    return {key: value for key, value in os.environ.items() if key in self.LIST_ENV_KEYS or key.startswith('p21_')}
+
+
+class ImportStageReport:
+    """
+    Helper class to record wall time, cpu time, rows and facts of the stages of an
+    import. Stages are identified by name and csv file, measuring a stage again adds
+    to its values. Time spent in a nested stage is only counted for the nested stage.
+    Stages measured in worker processes (see P21Importer._preprocess_and_check_csv_file())
+    overlap with the stage of the main process which waits for them.
+    The report is appended as a json line to the file of the environment variable
+    'p21_report_path' ('-' for stdout), if it is set. If 'p21_metrics_path' is set,
+    the report is also written as Prometheus metrics to this file, which is replaced
+    by each import (for the textfile collector of the node exporter).
+    """
+    END = object()
+    PREFIX_METRICS: str = 'p21_import'
+
+    def __init__(self, **attributes):
+        self.ATTRIBUTES = attributes
+        self.STAGES = {}
+        self.__stack = []
+        self.__wall_start = time.perf_counter()
+        self.__cpu_start = time.process_time()
+
+    def get_stage(self, name: str, file: str = None) -> dict:
+        key = (name, file)
+        if key not in self.STAGES:
+            self.STAGES[key] = {'stage': name, 'file': file, 'seconds_wall': 0.0, 'seconds_cpu': 0.0, 'rows_in': 0, 'rows_out': 0, 'facts': 0}
+        return self.STAGES[key]
+
+    @contextlib.contextmanager
+    def measure(self, name: str, file: str = None) -> Iterator[dict]:
+        """
+        Yields the dict of the stage, so that rows and facts can be added to it
+        """
+        stage = self.get_stage(name, file)
+        self.__pause_active_stage()
+        self.__stack.append([stage, time.perf_counter(), time.process_time()])
+        try:
+            yield stage
+        finally:
+            self.__pause_active_stage()
+            self.__stack.pop()
+            if self.__stack:
+                self.__stack[-1][1:] = [time.perf_counter(), time.process_time()]
+
+    def __pause_active_stage(self):
+        if self.__stack:
+            entry = self.__stack[-1]
+            wall, cpu = time.perf_counter(), time.process_time()
+            entry[0]['seconds_wall'] += wall - entry[1]
+            entry[0]['seconds_cpu'] += cpu - entry[2]
+            entry[1:] = [wall, cpu]
+
+    def measure_iterator(self, name: str, iterable: Iterable, file: str = None, key_count: str = 'rows_out', get_size: Callable = len) -> Iterator:
+        """
+        Measures the time needed to produce each item of given iterable. The size of
+        each item is added to key_count of the stage
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.measure(name, file) as stage:
+                item = next(iterator, self.END)
+                if item is self.END:
+                    return
+                stage[key_count] += get_size(item)
+            yield item
+
+    def get_stages(self) -> list:
+        return list(self.STAGES.values())
+
+    def add_stages(self, list_stages: list):
+        for stage_other in list_stages:
+            stage = self.get_stage(stage_other['stage'], stage_other['file'])
+            for key in ['seconds_wall', 'seconds_cpu', 'rows_in', 'rows_out', 'facts']:
+                stage[key] += stage_other[key]
+
+    def get_facts_per_file(self) -> dict:
+        return {stage['file']: stage['facts'] for stage in self.STAGES.values() if stage['stage'] == 'upload'}
+
+    @staticmethod
+    def get_peak_rss_mb() -> float:
+        """
+        Peak resident set size of this process (for a worker since its start)
+        """
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+    def to_dict(self) -> dict:
+        list_stages = []
+        for stage in self.STAGES.values():
+            stage = dict(stage, seconds_wall=round(stage['seconds_wall'], 3), seconds_cpu=round(stage['seconds_cpu'], 3))
+            num_rows = max(stage['rows_in'], stage['rows_out'])
+            if num_rows and stage['seconds_wall'] > 0:
+                stage['rows_per_second'] = round(num_rows / stage['seconds_wall'], 1)
+            if stage['facts'] and stage['seconds_wall'] > 0:
+                stage['facts_per_second'] = round(stage['facts'] / stage['seconds_wall'], 1)
+            list_stages.append(stage)
+        return {**self.ATTRIBUTES, 'seconds_wall': round(time.perf_counter() - self.__wall_start, 3),
+                        'seconds_cpu': round(time.process_time() - self.__cpu_start, 3), 'peak_rss_mb': self.get_peak_rss_mb(),
+                        'facts': self.get_facts_per_file(), 'stages': list_stages}
+
+    def to_prometheus(self, dict_report: dict = None) -> str:
+        """
+        Formats given report (or this report) in the Prometheus text format. Numbers
+        missing in the report (like the encounters of a failed import) are left out
+        """
+        dict_report = dict_report if dict_report is not None else self.to_dict()
+        list_lines = []
+        self.__add_metric(list_lines, 'last_run_timestamp_seconds', 'Time of the end of the last import', [({}, time.time())])
+        self.__add_metric(list_lines, 'success', 'Whether the last import was completed', [({}, int(bool(dict_report.get('success'))))])
+        self.__add_metric(list_lines, 'duration_seconds', 'Wall time of the last import', [({}, dict_report['seconds_wall'])])
+        self.__add_metric(list_lines, 'cpu_seconds', 'CPU time of the last import', [({}, dict_report['seconds_cpu'])])
+        self.__add_metric(list_lines, 'peak_rss_bytes', 'Peak resident set size of the importing process', [({}, int(dict_report['peak_rss_mb'] * 1024 * 1024))])
+        list_encounters = [({'status': status}, dict_report['encounters_' + status]) for status in ['total', 'valid', 'matched', 'imported', 'updated']
+                           if dict_report.get('encounters_' + status) is not None]
+        self.__add_metric(list_lines, 'encounters', 'Encounters of the last import by status', list_encounters)
+        self.__add_metric(list_lines, 'facts', 'Observation facts written by the last import per csv file',
+                          [({'file': file}, num_facts) for file, num_facts in dict_report['facts'].items()])
+        self.__add_metric(list_lines, 'stage_duration_seconds', 'Wall time of the stages of the last import',
+                          [({'stage': stage['stage'], 'file': stage['file'] or ''}, stage['seconds_wall']) for stage in dict_report['stages']])
+        dict_kinds = dict_report.get('sql', {}).get('kinds', {})
+        self.__add_metric(list_lines, 'sql_statements', 'SQL statements of the last import by kind', [({'kind': kind}, summary['count']) for kind, summary in dict_kinds.items()])
+        self.__add_metric(list_lines, 'sql_seconds', 'Time of the SQL statements of the last import by kind', [({'kind': kind}, summary['seconds']) for kind, summary in dict_kinds.items()])
+        return ''.join(list_lines)
+
+    def __add_metric(self, list_lines: list, name: str, text_help: str, list_samples: list):
+        if not list_samples:
+            return
+        name = '_'.join([self.PREFIX_METRICS, name])
+        list_lines.append('# HELP {0} {1}\n# TYPE {0} gauge\n'.format(name, text_help))
+        for dict_labels, value in list_samples:
+            labels = ','.join('{0}="{1}"'.format(key, str(label).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                              for key, label in dict_labels.items())
+            list_lines.append('{0}{1} {2}\n'.format(name, '{' + labels + '}' if labels else '', value))
+
+    def write(self):
+        path_report = os.environ.get('p21_report_path')
+        path_metrics = os.environ.get('p21_metrics_path')
+        if not path_report and not path_metrics:
+            return
+        dict_report = self.to_dict()
+        if path_report == '-':
+            print(json.dumps(dict_report, ensure_ascii=False))
+        elif path_report:
+            with open(path_report, 'a', encoding='utf-8') as file_report:
+                file_report.write(json.dumps(dict_report, ensure_ascii=False) + '\n')
+        if path_metrics:
+            self.__write_metrics(path_metrics, self.to_prometheus(dict_report))
+
+    @staticmethod
+    def __write_metrics(path_metrics: str, text: str):
+        """
+        The metrics are written to a temporary file next to given path and renamed, so
+        that the collector never reads a partially written file
+        """
+        path_tmp = path_metrics + '.tmp'
+        with open(path_tmp, 'w', encoding='utf-8') as file_metrics:
+            file_metrics.write(text)
+        os.replace(path_tmp, path_metrics)
+
+
+class StageProfiler:
+    """
+    Helper class for opt-in profiling of the stages of an import in production. If the
+    environment variable 'p21_profile_dir' is set, each stage is run with cProfile and
+    tracemalloc. The pstats file and the TOP_ALLOCATIONS largest allocation sites of
+    each stage are written to a new folder of the import inside 'p21_profile_dir',
+    numbered in the order of the stages. Otherwise profile() does nothing and neither
+    cProfile nor tracemalloc is loaded.
+    """
+    TOP_ALLOCATIONS: int = 25
+
+    def __init__(self, name_import: str = 'p21'):
+        self.PATH_PARENT = os.environ.get('p21_profile_dir')
+        self.NAME_IMPORT = name_import
+        self.PATH_FOLDER = None
+        self.NUM_STAGES = 0
+
+    def is_enabled(self) -> bool:
+        return bool(self.PATH_PARENT)
+
+    @contextlib.contextmanager
+    def profile(self, name: str, file: str = None):
+        if not self.is_enabled():
+            yield
+            return
+        if self.PATH_FOLDER is None:
+            os.makedirs(self.PATH_PARENT, exist_ok=True)
+            prefix_folder = '{0}_{1}_'.format(self.NAME_IMPORT, datetime.now().strftime('%Y%m%d_%H%M%S'))
+            self.PATH_FOLDER = tempfile.mkdtemp(prefix=prefix_folder, dir=self.PATH_PARENT)
+        self.NUM_STAGES += 1
+        name_stage = name if file is None else '_'.join([name, file])
+        prefix = os.path.join(self.PATH_FOLDER, '{0:02d}_{1}'.format(self.NUM_STAGES, name_stage))
+        is_tracing = tracemalloc.is_tracing()
+        if is_tracing:
+            snapshot_start = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+        else:
+            snapshot_start = None
+            tracemalloc.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            snapshot = tracemalloc.take_snapshot()
+            _, size_peak = tracemalloc.get_traced_memory()
+            if not is_tracing:
+                tracemalloc.stop()
+            profiler.dump_stats(prefix + '.pstats')
+            list_stats = snapshot.statistics('lineno') if snapshot_start is None else snapshot.compare_to(snapshot_start, 'lineno')
+            self.__write_allocations(prefix + '_allocations.txt', name_stage, size_peak, list_stats)
+
+    def __write_allocations(self, path_file: str, name_stage: str, size_peak: int, list_stats: list):
+        with open(path_file, 'w', encoding='utf-8') as file_allocations:
+            file_allocations.write('stage {0}: peak of traced memory {1:.1f} MiB\n'.format(name_stage, size_peak / 1024 / 1024))
+            file_allocations.write('top {0} allocation sites still allocated at the end of the stage:\n'.format(self.TOP_ALLOCATIONS))
+            for stat in list_stats[:self.TOP_ALLOCATIONS]:
+                file_allocations.write(str(stat) + '\n')
 
 
 class ZipFileExtractor:
@@ -166,26 +744,67 @@ class ZipFileExtractor:
         with zipfile.ZipFile(self.PATH_ZIP, 'r') as file_zip:
             file_zip.extractall(path_folder)
 
+    def get_uncompressed_size(self) -> int:
+        with zipfile.ZipFile(self.PATH_ZIP, 'r') as file_zip:
+            return sum(info.file_size for info in file_zip.infolist())
+
+    def extract_headers_to_folder(self, path_folder: str):
+        """
+        Extracts only the first line of each file in the root of the zip file
+        """
+        with zipfile.ZipFile(self.PATH_ZIP, 'r') as file_zip:
+            for name in file_zip.namelist():
+                if '/' in name or '\\' in name or name in ('.', '..'):
+                    continue
+                with file_zip.open(name) as file_in, open(os.path.join(path_folder, name), 'wb') as file_out:
+                    file_out.write(file_in.readline())
+
 
 class TmpFolderManager:
     """
-    Creates a temporary folder named tmp where the csv files inside the zip
-    file can be extracted to for preprocessing.
-    Renames all files inside folder tmp to lowercase for case-insensitive
+    Creates a unique temporary folder (prefixed with PREFIX) where the csv files
+    inside the zip file can be extracted to for preprocessing. Each instance only
+    creates and removes its own folder, so concurrent imports of zip files in the
+    same folder do not interfere.
+    The temporary folder is created in given folder or in the folder of the
+    environment variable 'p21_tmp_dir'. If 'p21_tmp_ram_dir' is set (e.g. /dev/shm),
+    the temporary folder is created there instead, as long as FACTOR_SPACE times the
+    size of the content fits into 'p21_tmp_ram_limit_mb' and the free space of the
+    RAM-backed folder. Preprocessing rewrites each csv file next to itself, hence
+    FACTOR_SPACE.
+    Renames all files inside the temporary folder to lowercase for case-insensitive
     processing.
     """
+    PREFIX: str = 'tmp_p21_'
+    FACTOR_SPACE: int = 2
+    LIMIT_RAM_MB: int = 1024
 
     def __init__(self, path_folder: str):
-        self.PATH_TMP = os.path.join(path_folder, 'tmp')
+        self.PATH_FOLDER = os.environ.get('p21_tmp_dir', path_folder)
+        self.PATH_RAM = os.environ.get('p21_tmp_ram_dir')
+        self.LIMIT_RAM_MB = int(os.environ.get('p21_tmp_ram_limit_mb', self.LIMIT_RAM_MB))
+        self.PATH_TMP = None
 
-    def create_tmp_folder(self) -> str:
-        if not os.path.isdir(self.PATH_TMP):
-            os.makedirs(self.PATH_TMP)
+    def create_tmp_folder(self, size_content: int = 0) -> str:
+        """
+        size_content -> size of the files to be extracted in bytes
+        """
+        if self.PATH_TMP is None:
+            self.PATH_TMP = tempfile.mkdtemp(prefix=self.PREFIX, dir=self.__get_parent_folder(size_content))
         return self.PATH_TMP
 
+    def __get_parent_folder(self, size_content: int) -> str:
+        if self.PATH_RAM and os.path.isdir(self.PATH_RAM):
+            size_required = size_content * self.FACTOR_SPACE
+            if size_required <= min(self.LIMIT_RAM_MB * 1024 * 1024, shutil.disk_usage(self.PATH_RAM).free):
+                return self.PATH_RAM
+            print(f"unpacked zip content is too large for {self.PATH_RAM}, using {self.PATH_FOLDER} instead")
+        return self.PATH_FOLDER
+
     def remove_tmp_folder(self):
-        if os.path.isdir(self.PATH_TMP):
-            shutil.rmtree(self.PATH_TMP)
+        if self.PATH_TMP is not None:
+            shutil.rmtree(self.PATH_TMP, ignore_errors=True)
+            self.PATH_TMP = None
 
     def rename_files_in_tmp_folder_to_lowercase(self):
         list_files = self.__get_files_in_tmp_folder()
@@ -198,6 +817,220 @@ class TmpFolderManager:
         return [file for file in os.listdir(self.PATH_TMP) if os.path.isfile(os.path.join(self.PATH_TMP, file))]
 
 
+class MemoryMappedCSVFile:
+    """
+    Helper class for pure I/O passes over a csv file. The file is memory-mapped
+    and scanned as raw bytes, so neither decoding nor copying of the file is
+    required to count its records or to replace its header.
+    """
+
+    SIZE_BLOCK: int = 1 << 20
+    NEWLINE: bytes = b'\n'
+    QUOTE: bytes = b'"'
+
+    def __init__(self, path_csv: str):
+        self.PATH_CSV = path_csv
+
+    def count_records(self) -> int:
+        """
+        Counts the records (including the header) of the csv file. Newlines inside
+        quoted fields are not counted. A last line without newline is counted as well.
+        """
+        if not os.path.getsize(self.PATH_CSV):
+            return 0
+        num_records = 0
+        is_quoted = False
+        with open(self.PATH_CSV, 'rb') as file_csv, mmap.mmap(file_csv.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            for offset in range(0, size, self.SIZE_BLOCK):
+                block = mm[offset:offset + self.SIZE_BLOCK]
+                if self.QUOTE not in block and not is_quoted:
+                    num_records += block.count(self.NEWLINE)
+                    continue
+                list_parts = block.split(self.QUOTE)
+                for i, part in enumerate(list_parts):
+                    if not is_quoted:
+                        num_records += part.count(self.NEWLINE)
+                    if i < len(list_parts) - 1:
+                        is_quoted = not is_quoted
+            if mm[size - 1:size] != self.NEWLINE:
+                num_records += 1
+        return num_records
+
+    def replace_header(self, header: bytes):
+        """
+        Replaces the first line of the csv file with given header (including its newline).
+        A header of the same length is written in place, otherwise the body is moved
+        inside the mapped file to its new position.
+        """
+        size_old = os.path.getsize(self.PATH_CSV)
+        with open(self.PATH_CSV, 'r+b') as file_csv:
+            len_header_old = self.__get_length_of_first_line(file_csv)
+            difference = len(header) - len_header_old
+            size_new = size_old + difference
+            if difference > 0:
+                file_csv.truncate(size_new)
+            if size_new:
+                with mmap.mmap(file_csv.fileno(), 0) as mm:
+                    if difference:
+                        mm.move(len(header), len_header_old, size_old - len_header_old)
+                    mm[:len(header)] = header
+                    mm.flush()
+            if difference < 0:
+                file_csv.truncate(size_new)
+
+    def __get_length_of_first_line(self, file_csv) -> int:
+        length = 0
+        for block in iter(lambda: file_csv.read(self.SIZE_BLOCK), b''):
+            index = block.find(self.NEWLINE)
+            if index != -1:
+                return length + index + 1
+            length += len(block)
+        return length
+
+
+class AdaptiveChunkSizer:
+    """
+    Helper class to adapt the number of rows per chunk to the host and the file.
+    Chunks are sized so that parsing and writing a chunk takes about SECONDS_TARGET
+    and the observation facts of a chunk need at most FRACTION_MEMORY of the available
+    memory. The size changes at most by FACTOR_STEP per measurement and stays within
+    SIZE_MIN and SIZE_MAX (env p21_chunk_size_min and p21_chunk_size_max).
+    """
+
+    SIZE_MIN: int = 1000
+    SIZE_MAX: int = 500000
+    SECONDS_TARGET: float = 2.0
+    FRACTION_MEMORY: float = 0.05
+    BYTES_PER_FACT: int = 1000
+    FACTOR_STEP: float = 2.0
+    WEIGHT_MEASUREMENT: float = 0.5
+
+    def __init__(self, size_initial: int):
+        self.SIZE_MIN = int(os.environ.get('p21_chunk_size_min', self.SIZE_MIN))
+        self.SIZE_MAX = int(os.environ.get('p21_chunk_size_max', self.SIZE_MAX))
+        if not 0 < self.SIZE_MIN <= self.SIZE_MAX:
+            raise SystemExit('invalid bounds for chunk size: {0} to {1}'.format(self.SIZE_MIN, self.SIZE_MAX))
+        self.SIZE = self.__clamp(size_initial)
+        self.SECONDS_PARSE_PER_ROW = None
+        self.SECONDS_WRITE_PER_ROW = None
+        self.FACTS_PER_ROW = None
+
+    def get_size(self) -> int:
+        return self.SIZE
+
+    def record_parse(self, num_rows: int, seconds: float):
+        """
+        Records the time needed to read and parse a chunk of num_rows rows
+        """
+        if num_rows:
+            self.SECONDS_PARSE_PER_ROW = self.__smooth(self.SECONDS_PARSE_PER_ROW, seconds / num_rows)
+            self.__adapt_size()
+
+    def record_write(self, num_rows: int, num_facts: int, seconds: float):
+        """
+        Records the number of observation facts created from a chunk of num_rows rows
+        and the time needed to convert and upload them
+        """
+        if num_rows:
+            self.SECONDS_WRITE_PER_ROW = self.__smooth(self.SECONDS_WRITE_PER_ROW, seconds / num_rows)
+            self.FACTS_PER_ROW = self.__smooth(self.FACTS_PER_ROW, num_facts / num_rows)
+            self.__adapt_size()
+
+    def __smooth(self, value_old: float | None, value_new: float) -> float:
+        if value_old is None:
+            return value_new
+        return self.WEIGHT_MEASUREMENT * value_new + (1 - self.WEIGHT_MEASUREMENT) * value_old
+
+    def __adapt_size(self):
+        seconds_per_row = (self.SECONDS_PARSE_PER_ROW or 0) + (self.SECONDS_WRITE_PER_ROW or 0)
+        size = self.SECONDS_TARGET / seconds_per_row if seconds_per_row > 0 else self.SIZE_MAX
+        bytes_available = self.get_available_memory()
+        if bytes_available is not None:
+            size = min(size, bytes_available * self.FRACTION_MEMORY / (self.BYTES_PER_FACT * max(self.FACTS_PER_ROW or 1, 1)))
+        size = min(max(size, self.SIZE / self.FACTOR_STEP), self.SIZE * self.FACTOR_STEP)
+        self.SIZE = self.__clamp(int(size))
+
+    def __clamp(self, size: int) -> int:
+        return min(max(size, self.SIZE_MIN), self.SIZE_MAX)
+
+    @staticmethod
+    def get_available_memory() -> int | None:
+        """
+        Returns the available memory of the host in bytes or None, if it can not be
+        determined. MemAvailable of /proc/meminfo includes reclaimable caches and is
+        preferred over the free physical pages
+        """
+        try:
+            with open('/proc/meminfo', 'r') as meminfo:
+                for line in meminfo:
+                    if line.startswith('MemAvailable:'):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError, IndexError):
+            pass
+        try:
+            return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+        except (AttributeError, OSError, ValueError):
+            return None
+
+
+class ProgressReporter:
+    """
+    Helper class to print the progress of a pass over a csv file with the current rows
+    and facts per second and the estimated remaining time. At most one line is printed
+    per INTERVAL seconds (environment variable 'p21_progress_interval', 0 disables the
+    output), so the overhead per chunk is a single read of the clock.
+    """
+    INTERVAL: float = 30.0
+
+    def __init__(self, name: str):
+        self.NAME = name
+        self.INTERVAL = float(os.environ.get('p21_progress_interval', self.INTERVAL))
+        self.start(0)
+
+    def is_enabled(self) -> bool:
+        return self.INTERVAL > 0
+
+    def start(self, num_rows_total: int):
+        self.NUM_ROWS_TOTAL = num_rows_total
+        self.NUM_ROWS = 0
+        self.NUM_FACTS = 0
+        self.__time_start = time.monotonic()
+        self.__time_next = self.__time_start + self.INTERVAL
+
+    def add_rows(self, num_rows: int):
+        self.NUM_ROWS += num_rows
+        self.__print_if_due()
+
+    def add_facts(self, num_facts: int):
+        """
+        Facts are only printed with the next rows, which are counted after their facts
+        """
+        self.NUM_FACTS += num_facts
+
+    def __print_if_due(self):
+        if not self.is_enabled():
+            return
+        time_now = time.monotonic()
+        if time_now < self.__time_next:
+            return
+        self.__time_next = time_now + self.INTERVAL
+        print(self.format_progress(time_now - self.__time_start))
+
+    def format_progress(self, seconds: float) -> str:
+        rate_rows = self.NUM_ROWS / seconds if seconds > 0 else 0.0
+        list_parts = ['{0} Zeilen'.format(self.NUM_ROWS)]
+        if self.NUM_ROWS_TOTAL:
+            list_parts[0] = '{0} von {1} Zeilen ({2:.1f} %)'.format(self.NUM_ROWS, self.NUM_ROWS_TOTAL, 100 * min(self.NUM_ROWS / self.NUM_ROWS_TOTAL, 1.0))
+        list_parts.append('{0:.0f} Zeilen/s'.format(rate_rows))
+        if self.NUM_FACTS:
+            list_parts.append('{0:.0f} Fakten/s'.format(self.NUM_FACTS / seconds if seconds > 0 else 0.0))
+        if self.NUM_ROWS_TOTAL and rate_rows > 0:
+            seconds_remaining = max(self.NUM_ROWS_TOTAL - self.NUM_ROWS, 0) / rate_rows
+            list_parts.append('verbleibend ca. {0}'.format(timedelta(seconds=round(seconds_remaining))))
+        return '{0}: {1}'.format(self.NAME, ', '.join(list_parts))
+
+
 class CSVReader(ABC):
     """
     Provides configuration for reading a csv file of given path.
@@ -206,6 +1039,8 @@ class CSVReader(ABC):
     SIZE_CHUNKS: int = 10000
     CSV_SEPARATOR: str = ';'
     CSV_NAME: str
+    NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                 '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
 
     def __init__(self, path_folder: str):
         self.PATH_CSV = os.path.join(path_folder, self.CSV_NAME)
@@ -214,8 +1049,11 @@ class CSVReader(ABC):
     def get_csv_encoding() -> str:
         return 'utf-8'
 
-    def save_df_as_csv(self, df_input: pd.DataFrame, path_output: str, encoding: str):
-        df_input.to_csv(path_output, sep=self.CSV_SEPARATOR, encoding=encoding, index=False)
+    def save_df_as_csv(self, df_input: pd.DataFrame, path_output: str, encoding: str, mode: str = 'w'):
+        """
+        With mode 'a', the dataframe is appended to the csv file without header
+        """
+        df_input.to_csv(path_output, sep=self.CSV_SEPARATOR, encoding=encoding, index=False, mode=mode, header=mode == 'w')
 
 
 class CSVPreprocessor(CSVReader, ABC):
@@ -228,10 +1066,35 @@ class CSVPreprocessor(CSVReader, ABC):
     def preprocess(self):
         header = self._get_csv_file_header_in_lowercase()
         header = self._remove_dashes_from_header(header)
+        header = self._adjust_header(header)
         header += '\n'
         self._write_header_to_csv(header)
         self._append_zeros_to_internal_id()
 
+    def _get_path_dummy(self) -> str:
+        """
+        Each csv file gets its own dummy file, as the csv files are preprocessed concurrently
+        """
+        path_parent = os.path.dirname(self.PATH_CSV)
+        return os.path.sep.join([path_parent, '_'.join(['dummy', self.CSV_NAME])])
+
+    def _adjust_header(self, header: str) -> str:
+        """
+        Hook for file specific adjustments of the lowercased header without dashes
+        """
+        return header
+
+    def adjust_row(self, dict_row: dict) -> dict:
+        """
+        Applies the value adjustments of preprocess() to a single row. Used by
+        StreamingCSVReader, which does not rewrite the csv file.
+        """
+        dict_row['khinterneskennzeichen'] = self._append_zeros_to_value(dict_row['khinterneskennzeichen'])
+        return dict_row
+
+    def _append_zeros_to_value(self, value: str) -> str:
+        return ''.join([str('0' * self.LEADING_ZEROS), value])
+
     def _get_csv_file_header_in_lowercase(self) -> str:
         df = pd.read_csv(self.PATH_CSV, nrows=0, index_col=None, sep=self.CSV_SEPARATOR, encoding=self.get_csv_encoding(), dtype=str)
         df.rename(columns=str.lower, inplace=True)
@@ -242,15 +1105,7 @@ class CSVPreprocessor(CSVReader, ABC):
         return header.replace('-', '')
 
     def _write_header_to_csv(self, header: str):
-        path_parent = os.path.dirname(self.PATH_CSV)
-        path_dummy = os.path.sep.join([path_parent, 'dummy.csv'])
-        encoding = self.get_csv_encoding()
-        with open(self.PATH_CSV, 'r+', encoding=encoding) as f1, open(path_dummy, 'w+', encoding=encoding) as f2:
-            f1.readline()
-            f2.write(header)
-            shutil.copyfileobj(f1, f2)
-        os.remove(self.PATH_CSV)
-        os.rename(path_dummy, self.PATH_CSV)
+        MemoryMappedCSVFile(self.PATH_CSV).replace_header(header.encode(self.get_csv_encoding()))
 
     def _rename_column_in_header(self, header: str, column_old: str, column_new: str) -> str:
         list_header = header.split(self.CSV_SEPARATOR)
@@ -263,52 +1118,60 @@ class CSVPreprocessor(CSVReader, ABC):
         list_header[idx_match[0]] = column_new
         return self.CSV_SEPARATOR.join(list_header)
 
-    def _append_zeros_to_internal_id(self):
-        path_parent = os.path.dirname(self.PATH_CSV)
-        path_dummy = os.path.sep.join([path_parent, 'dummy.csv'])
+    def _rewrite_csv_chunkwise(self, adjust_chunk: Callable[[pd.DataFrame], pd.DataFrame]):
+        """
+        Adjusts the csv file chunk by chunk. Each adjusted chunk is appended to the
+        dummy file right away, so that only a single chunk is held in memory
+        """
+        path_dummy = self._get_path_dummy()
         encoding = self.get_csv_encoding()
-        df_tmp = pd.DataFrame()
+        mode = 'w'
         for chunk in pd.read_csv(self.PATH_CSV, chunksize=self.SIZE_CHUNKS, sep=self.CSV_SEPARATOR, encoding=encoding, dtype=str):
-            chunk['khinterneskennzeichen'] = chunk['khinterneskennzeichen'].fillna('')
-            chunk['khinterneskennzeichen'] = chunk['khinterneskennzeichen'].apply(lambda x: ''.join([str('0' * self.LEADING_ZEROS), x]))
-            df_tmp = pd.concat([df_tmp, chunk])
-        self.save_df_as_csv(df_tmp, path_dummy, encoding)
+            self.save_df_as_csv(adjust_chunk(chunk), path_dummy, encoding, mode)
+            mode = 'a'
         os.remove(self.PATH_CSV)
         os.rename(path_dummy, self.PATH_CSV)
 
+    def _append_zeros_to_internal_id(self):
+        def adjust_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+            chunk['khinterneskennzeichen'] = chunk['khinterneskennzeichen'].fillna('')
+            chunk['khinterneskennzeichen'] = chunk['khinterneskennzeichen'].apply(self._append_zeros_to_value)
+            return chunk
+        self._rewrite_csv_chunkwise(adjust_chunk)
+
 
 class FALLPreprocessor(CSVPreprocessor):
     CSV_NAME = 'fall.csv'
+    DICT_COLUMN_LENGTH = {'plz': 5, 'aufnahmegrund': 4}
 
     def preprocess(self):
         super().preprocess()
-        self.__append_zero_to_column_if_length_below_requirement('plz', 5)
-        self.__append_zero_to_column_if_length_below_requirement('aufnahmegrund', 4)
+        for column, length_required in self.DICT_COLUMN_LENGTH.items():
+            self.__append_zero_to_column_if_length_below_requirement(column, length_required)
+
+    def adjust_row(self, dict_row: dict) -> dict:
+        dict_row = super().adjust_row(dict_row)
+        for column, length_required in self.DICT_COLUMN_LENGTH.items():
+            dict_row[column] = self._append_zero_if_length_below_requirement(dict_row[column], length_required)
+        return dict_row
+
+    @staticmethod
+    def _append_zero_if_length_below_requirement(value: str, length_required: int) -> str:
+        return value.rjust(length_required, '0') if len(value) == length_required - 1 else value
 
     def __append_zero_to_column_if_length_below_requirement(self, column: str, length_required: int):
-        path_parent = os.path.dirname(self.PATH_CSV)
-        path_dummy = os.path.sep.join([path_parent, 'dummy.csv'])
-        encoding = self.get_csv_encoding()
-        df_tmp = pd.DataFrame()
-        for chunk in pd.read_csv(self.PATH_CSV, chunksize=self.SIZE_CHUNKS, sep=self.CSV_SEPARATOR, encoding=encoding, dtype=str):
+        def adjust_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
             chunk[column] = chunk[column].fillna('')
-            chunk[column] = chunk[column].apply(lambda x: x.rjust(length_required, '0') if len(x) == length_required - 1 else x)
-            df_tmp = pd.concat([df_tmp, chunk])
-        self.save_df_as_csv(df_tmp, path_dummy, encoding)
-        os.remove(self.PATH_CSV)
-        os.rename(path_dummy, self.PATH_CSV)
+            chunk[column] = chunk[column].apply(self._append_zero_if_length_below_requirement, args=(length_required,))
+            return chunk
+        self._rewrite_csv_chunkwise(adjust_chunk)
 
 
 class FABPreprocessor(CSVPreprocessor):
     CSV_NAME = 'fab.csv'
 
-    def preprocess(self):
-        header = self._get_csv_file_header_in_lowercase()
-        header = self._remove_dashes_from_header(header)
-        header = self._rename_column_in_header(header, 'fab', 'fachabteilung')
-        header += '\n'
-        self._write_header_to_csv(header)
-        self._append_zeros_to_internal_id()
+    def _adjust_header(self, header: str) -> str:
+        return self._rename_column_in_header(header, 'fab', 'fachabteilung')
 
 
 class ICDPreprocessor(CSVPreprocessor):
@@ -323,13 +1186,22 @@ class ICDPreprocessor(CSVPreprocessor):
         header = self._get_csv_file_header_in_lowercase()
         header = self._remove_dashes_from_header(header)
         if 'sekundärkode' in header:
-            header = self.__adjust_columns_for_secondary_diagnoses(header)
+            header = self._adjust_header(header)
             header += '\n'
             self._write_header_to_csv(header)
         else:
             self.__write_header_with_secondary_diagnoses_columns_to_csv(header)
         self._append_zeros_to_internal_id()
 
+    def _adjust_header(self, header: str) -> str:
+        """
+        Missing columns for secondary diagnoses are not added to the header, as they
+        are treated as empty by StreamingCSVReader anyway
+        """
+        if 'sekundärkode' in header:
+            header = self.__adjust_columns_for_secondary_diagnoses(header)
+        return header
+
     def __adjust_columns_for_secondary_diagnoses(self, header: str) -> str:
         index_sec = header.index('sekundärkode')
         header_sub = header[index_sec:]
@@ -339,12 +1211,14 @@ class ICDPreprocessor(CSVPreprocessor):
 
     def __write_header_with_secondary_diagnoses_columns_to_csv(self, header: str):
         list_header = header.split(self.CSV_SEPARATOR)
-        df = pd.read_csv(self.PATH_CSV, sep=self.CSV_SEPARATOR, encoding=self.get_csv_encoding(), dtype=str)
-        df.columns = list_header
-        df['sekundärkode'] = ''
-        df['sekundärlokalisation'] = ''
-        df['sekundärdiagnosensicherheit'] = ''
-        df.to_csv(self.PATH_CSV, index=False, sep=self.CSV_SEPARATOR)
+
+        def adjust_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+            chunk.columns = list_header
+            chunk['sekundärkode'] = ''
+            chunk['sekundärlokalisation'] = ''
+            chunk['sekundärdiagnosensicherheit'] = ''
+            return chunk
+        self._rewrite_csv_chunkwise(adjust_chunk)
 
 
 class OPSPreprocessor(CSVPreprocessor):
@@ -368,6 +1242,14 @@ class CSVFileVerifier(CSVReader, ABC):
 
     DICT_COLUMN_PATTERN: dict
     MANDATORY_COLUMN_VALUES: list
+    CATEGORICAL_COLUMNS: list = []
+
+    def __init__(self, path_folder: str):
+        super().__init__(path_folder)
+        self.SCHEMA = CSVColumnSchema(list(self.DICT_COLUMN_PATTERN.keys()), self.CATEGORICAL_COLUMNS)
+        self.BACKEND = CSVBackend.create()
+        self.CHUNK_SIZER = AdaptiveChunkSizer(self.SIZE_CHUNKS)
+        self.PROGRESS = ProgressReporter(self.CSV_NAME)
 
     def is_csv_in_folder(self) -> bool:
         if not os.path.isfile(self.PATH_CSV):
@@ -377,18 +1259,47 @@ class CSVFileVerifier(CSVReader, ABC):
 
     def check_column_names_of_csv(self):
         df = pd.read_csv(self.PATH_CSV, nrows=0, index_col=None, sep=self.CSV_SEPARATOR, encoding=self.get_csv_encoding(), dtype=str)
+        self.check_column_names(list(df.columns))
+
+    def check_column_names(self, list_columns: list):
         set_required_columns = set(self.DICT_COLUMN_PATTERN.keys())
-        set_matched_columns = set_required_columns.intersection(set(df.columns))
+        set_matched_columns = set_required_columns.intersection(set(list_columns))
         if set_matched_columns != set_required_columns:
             raise SystemExit('following columns are missing in {0}: {1}'.format(self.CSV_NAME, set_required_columns.difference(set_matched_columns)))
 
+    def read_csv_in_chunks(self):
+        """
+        Reads only the columns of DICT_COLUMN_PATTERN chunkwise. Empty fields are
+        filled with an empty string. The size of each chunk is taken from CHUNK_SIZER
+        and the parse time of each chunk is reported back to it. The rows of each chunk
+        are counted by PROGRESS once the chunk is processed, the total rows of the file
+        are only counted if its output is enabled.
+        """
+        self.PROGRESS.start(MemoryMappedCSVFile(self.PATH_CSV).count_records() - 1 if self.PROGRESS.is_enabled() else 0)
+        with pd.read_csv(self.PATH_CSV, iterator=True, sep=self.CSV_SEPARATOR, encoding=self.get_csv_encoding(),
+                         usecols=self.SCHEMA.COLUMNS, dtype=self.SCHEMA.get_dtypes()) as reader:
+            while True:
+                time_start = time.perf_counter()
+                try:
+                    chunk = reader.get_chunk(self.CHUNK_SIZER.get_size())
+                except StopIteration:
+                    break
+                chunk = self.SCHEMA.fill_empty_fields(chunk[self.SCHEMA.COLUMNS])
+                self.CHUNK_SIZER.record_parse(len(chunk.index), time.perf_counter() - time_start)
+                yield chunk
+                self.PROGRESS.add_rows(len(chunk.index))
+
+    def read_valid_chunks(self, list_ids: list = None):
+        """
+        Reads the csv file chunkwise using the selected CSVBackend. Each chunk is
+        cleared of invalid data (see clear_invalid_column_fields_in_chunk()). If
+        list_ids is given, only rows with these encounter ids are returned.
+        """
+        return self.BACKEND.read_valid_chunks(self, list_ids)
+
     def get_unique_ids_of_valid_encounter(self) -> list:
         set_valid_ids = set()
-        for chunk in pd.read_csv(self.PATH_CSV, chunksize=self.SIZE_CHUNKS, sep=self.CSV_SEPARATOR, encoding=self.get_csv_encoding(), dtype=str):
-            chunk = chunk[list(self.DICT_COLUMN_PATTERN.keys())]
-            chunk = chunk.fillna('')
-            for column in chunk.columns.values:
-                chunk = self.clear_invalid_column_fields_in_chunk(chunk, column)
+        for chunk in self.read_valid_chunks():
             set_valid_ids.update(chunk['khinterneskennzeichen'].unique())
         return list(set_valid_ids)
 
@@ -442,6 +1353,7 @@ class FALLVerifier(CSVFileVerifier):
                            'behandlungsendenachstationär':  r'^\d{8}$',
                            'behandlungstagenachstationär':  r'^\d{0,4}$'}
     MANDATORY_COLUMN_VALUES = ['khinterneskennzeichen', 'aufnahmedatum', 'aufnahmegrund', 'aufnahmeanlass']
+    CATEGORICAL_COLUMNS = ['geschlecht', 'aufnahmeanlass', 'fallzusammenführung', 'fallzusammenführungsgrund']
 
     def is_csv_in_folder(self) -> bool:
         if not os.path.isfile(self.PATH_CSV):
@@ -455,9 +1367,7 @@ class FALLVerifier(CSVFileVerifier):
         return list_valid_ids
 
     def count_total_encounter(self) -> int:
-        with open(self.PATH_CSV, encoding=self.get_csv_encoding()) as csv:
-            total = sum(1 for _ in csv)
-        return total - 1
+        return MemoryMappedCSVFile(self.PATH_CSV).count_records() - 1
 
     def get_unique_ids_of_valid_encounter_with_admission_dates(self) -> dict:
         """
@@ -466,11 +1376,7 @@ class FALLVerifier(CSVFileVerifier):
         to create the mapping dataframe required by CSVObservationFactUploadManager
         """
         dict_case_admissions = {}
-        for chunk in pd.read_csv(self.PATH_CSV, chunksize=self.SIZE_CHUNKS, sep=self.CSV_SEPARATOR, encoding=self.get_csv_encoding(), dtype=str):
-            chunk = chunk[list(self.DICT_COLUMN_PATTERN.keys())]
-            chunk = chunk.fillna('')
-            for column in chunk.columns.values:
-                chunk = self.clear_invalid_column_fields_in_chunk(chunk, column)
+        for chunk in self.read_valid_chunks():
             dict_chunk = dict(zip(chunk['khinterneskennzeichen'], chunk['aufnahmedatum']))
             dict_case_admissions = {**dict_case_admissions, **dict_chunk}
         if not dict_case_admissions:
@@ -486,6 +1392,7 @@ class FABVerifier(CSVFileVerifier):
                            'fabentlassungsdatum':   r'^\d{12}$',
                            'kennungintensivbett':   r'^(J|N)$'}
     MANDATORY_COLUMN_VALUES = ['khinterneskennzeichen', 'fachabteilung', 'fabaufnahmedatum', 'kennungintensivbett']
+    CATEGORICAL_COLUMNS = ['fachabteilung', 'kennungintensivbett']
 
 
 class ICDVerifier(CSVFileVerifier):
@@ -500,6 +1407,7 @@ class ICDVerifier(CSVFileVerifier):
                            'sekundärlokalisation':        r'^[BLR]$',
                            'sekundärdiagnosensicherheit': r'^[AVZG]$'}
     MANDATORY_COLUMN_VALUES = ['khinterneskennzeichen', 'diagnoseart', 'icdversion', 'icdkode']
+    CATEGORICAL_COLUMNS = ['diagnoseart', 'icdversion', 'lokalisation', 'diagnosensicherheit', 'sekundärlokalisation', 'sekundärdiagnosensicherheit']
 
 
 class OPSVerifier(CSVFileVerifier):
@@ -510,6 +1418,409 @@ class OPSVerifier(CSVFileVerifier):
                            'opsdatum':              r'^\d{12}$',
                            'lokalisation':          r'^[BLR]$'}
     MANDATORY_COLUMN_VALUES = ['khinterneskennzeichen', 'opsversion', 'opskode', 'opsdatum']
+    CATEGORICAL_COLUMNS = ['opsversion', 'lokalisation']
+
+
+class CSVColumnSchema:
+    """
+    Helper class for CSVFileVerifier.
+    Derives the arguments for pd.read_csv() from the required columns of a csv file, so
+    that all other columns of the csv file are skipped by the parser. Columns with only
+    a few distinct values (COLUMNS_CATEGORICAL) are parsed as categoricals, all other
+    columns as strings.
+    """
+
+    def __init__(self, columns: list, columns_categorical: list):
+        self.COLUMNS = columns
+        self.COLUMNS_CATEGORICAL = [column for column in columns_categorical if column in columns]
+
+    def get_dtypes(self) -> dict:
+        return {column: 'category' if column in self.COLUMNS_CATEGORICAL else str for column in self.COLUMNS}
+
+    def fill_empty_fields(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """
+        Categoricals only accept values of their categories, so an empty string is
+        added as a category before empty fields are filled
+        """
+        for column in self.COLUMNS_CATEGORICAL:
+            if '' not in chunk[column].cat.categories:
+                chunk[column] = chunk[column].cat.add_categories([''])
+        return chunk.fillna('')
+
+
+class CSVBackend(ABC):
+    """
+    Reads the csv file of a CSVFileVerifier chunkwise and clears each chunk of invalid
+    data. The backend is selected by the environment variable 'p21_csv_backend'
+    ('pandas' or 'arrow'). pandas is used by default and as a fallback if pyarrow is
+    not installed.
+    """
+
+    @staticmethod
+    def create() -> 'CSVBackend':
+        name_backend = os.environ.get('p21_csv_backend', 'pandas')
+        if name_backend == 'arrow':
+            if pa.is_available():
+                return ArrowCSVBackend()
+            print('pyarrow could not be found. falling back to pandas')
+        elif name_backend != 'pandas':
+            raise SystemExit('invalid csv backend {0}'.format(name_backend))
+        return PandasCSVBackend()
+
+    @abstractmethod
+    def read_valid_chunks(self, verifier: 'CSVFileVerifier', list_ids: list = None):
+        pass
+
+
+class PandasCSVBackend(CSVBackend):
+    """
+    The encounter ids are looked up in a set, which is built once per file. isin()
+    with a list rebuilds its hash table on every chunk
+    """
+
+    def read_valid_chunks(self, verifier: 'CSVFileVerifier', list_ids: list = None):
+        set_ids = set(list_ids) if list_ids is not None else None
+        for chunk in verifier.read_csv_in_chunks():
+            if set_ids is not None:
+                chunk = chunk[chunk['khinterneskennzeichen'].map(set_ids.__contains__).astype(bool)]
+            for column in chunk.columns.values:
+                chunk = verifier.clear_invalid_column_fields_in_chunk(chunk, column)
+            yield chunk
+
+
+class ArrowCSVBackend(CSVBackend):
+    """
+    Parses the csv file with the streaming csv reader of pyarrow and checks the
+    column values with the string kernels of pyarrow.compute. Only valid rows are
+    converted to pandas chunks.
+
+    The file is read in record batches of SIZE_BLOCK bytes, which are validated one
+    after another. Valid rows are collected until a chunk of the size of CHUNK_SIZER
+    is complete, so at most one chunk and one batch are held in memory.
+
+    Values in CSVReader.NA_VALUES are treated as empty fields, like in pd.read_csv().
+    The regex patterns of DICT_COLUMN_PATTERN are translated to RE2 to match like
+    str.match() (see translate_pattern_to_re2()).
+    """
+    SIZE_BLOCK: int = 1 << 20
+
+    def read_valid_chunks(self, verifier: 'CSVFileVerifier', list_ids: list = None):
+        verifier.PROGRESS.start(MemoryMappedCSVFile(verifier.PATH_CSV).count_records() - 1 if verifier.PROGRESS.is_enabled() else 0)
+        value_set = pa.array(list(set(list_ids)), type=pa.string()) if list_ids is not None else None
+        table_pending = None
+        time_start = time.perf_counter()
+        for table in self.__read_valid_tables(verifier, value_set):
+            table_pending = table if table_pending is None else pa.concat_tables([table_pending, table])
+            while table_pending.num_rows >= verifier.CHUNK_SIZER.get_size():
+                chunk = table_pending.slice(0, verifier.CHUNK_SIZER.get_size()).to_pandas()
+                table_pending = table_pending.slice(len(chunk.index))
+                verifier.CHUNK_SIZER.record_parse(len(chunk.index), time.perf_counter() - time_start)
+                yield chunk
+                time_start = time.perf_counter()
+        if table_pending is not None and table_pending.num_rows:
+            chunk = table_pending.to_pandas()
+            verifier.CHUNK_SIZER.record_parse(len(chunk.index), time.perf_counter() - time_start)
+            yield chunk
+
+    def __read_valid_tables(self, verifier: 'CSVFileVerifier', value_set: 'pa.Array' = None):
+        """
+        Yields the valid rows of each record batch of the csv file as table. The rows
+        of each batch are counted by PROGRESS once the batch is validated
+        """
+        columns = verifier.SCHEMA.COLUMNS
+        read_options = pa_csv.ReadOptions(encoding=verifier.get_csv_encoding(), use_threads=True, block_size=self.SIZE_BLOCK)
+        parse_options = pa_csv.ParseOptions(delimiter=verifier.CSV_SEPARATOR, newlines_in_values=True)
+        convert_options = pa_csv.ConvertOptions(include_columns=columns, column_types={column: pa.string() for column in columns},
+                                                null_values=verifier.NA_VALUES, strings_can_be_null=True, quoted_strings_can_be_null=True)
+        with pa_csv.open_csv(verifier.PATH_CSV, read_options=read_options, parse_options=parse_options, convert_options=convert_options) as reader:
+            for batch in reader:
+                table = pa.Table.from_batches([batch])
+                if value_set is not None:
+                    table = table.filter(pc.is_in(table['khinterneskennzeichen'], value_set=value_set))
+                yield self.__clear_invalid_fields_in_table(verifier, table)
+                verifier.PROGRESS.add_rows(batch.num_rows)
+
+    def __clear_invalid_fields_in_table(self, verifier: 'CSVFileVerifier', table: 'pa.Table') -> 'pa.Table':
+        """
+        Same rules as CSVFileVerifier.clear_invalid_column_fields_in_chunk(), applied
+        to all columns at once
+        """
+        dict_columns = {}
+        mask_valid_rows = None
+        for column in verifier.SCHEMA.COLUMNS:
+            values = pc.fill_null(table[column], '')
+            is_empty = pc.equal(values, '')
+            is_valid = pc.or_(is_empty, pc.match_substring_regex(values, self.translate_pattern_to_re2(verifier.DICT_COLUMN_PATTERN[column])))
+            if column in verifier.MANDATORY_COLUMN_VALUES:
+                mask_column = pc.and_(is_valid, pc.invert(is_empty))
+                mask_valid_rows = mask_column if mask_valid_rows is None else pc.and_(mask_valid_rows, mask_column)
+            else:
+                values = pc.if_else(is_valid, values, '')
+            dict_columns[column] = values
+        table = pa.table(dict_columns)
+        if mask_valid_rows is not None:
+            table = table.filter(mask_valid_rows)
+        return table
+
+    @staticmethod
+    def translate_pattern_to_re2(pattern: str) -> str:
+        """
+        str.match() anchors a pattern at the start of the value, while RE2 searches the
+        whole value. Unicode classes are used for \\d and \\w, as RE2 only matches ASCII
+        characters with them.
+        """
+        pattern = re.sub(r'(?<!\\)\\d', r'\\p{Nd}', pattern)
+        pattern = re.sub(r'(?<!\\)\\w', r'[\\p{L}\\p{N}_]', pattern)
+        return ''.join(['^(?:', pattern, ')'])
+
+
+class I2b2DateConverter:
+    """
+    Helper class to convert dates of the csv files (%Y%m%d%H%M) to the date format of
+    i2b2crcdata.observation_fact. Whole columns are converted at once by convert_series(),
+    single dates are served from a bounded LRU cache by convert().
+    """
+
+    FORMAT_CSV: str = '%Y%m%d%H%M'
+    FORMAT_I2B2: str = '%Y-%m-%d %H:%M'
+    PATTERN_DATE: str = r'^\d{12}$'
+    SIZE_CACHE: int = 100000
+
+    def __init__(self):
+        self.CACHE = collections.OrderedDict()
+
+    def convert(self, date: str) -> str:
+        date_i2b2 = self.CACHE.get(date)
+        if date_i2b2 is None:
+            date_i2b2 = self.convert_single_date(date)
+            self.__add_to_cache(date, date_i2b2)
+        else:
+            self.CACHE.move_to_end(date)
+        return date_i2b2
+
+    @staticmethod
+    def convert_single_date(date: str) -> str:
+        if date[8:10] == '24':
+            date = ''.join([date[:8], '2359'])
+        return datetime.strptime(str(date), I2b2DateConverter.FORMAT_CSV).strftime(I2b2DateConverter.FORMAT_I2B2)
+
+    def convert_series(self, series: pd.Series) -> pd.Series:
+        """
+        Dates without hours and minutes (like in 'behandlungsbeginnvorstationär') get
+        '0000' appended. Empty or invalid dates are converted to None. Dates which
+        to_datetime() could not convert are converted again by convert(), as dates
+        before 1677 or after 2262 are out of range of datetime64[ns] in older pandas
+        versions
+        """
+        dates = series.astype(object).fillna('').astype(str)
+        dates = dates.mask(dates.str.len() == 8, dates + '0000')
+        dates = dates.mask(dates.str.slice(8, 10) == '24', dates.str.slice(0, 8) + '2359')
+        dates = dates.where(dates.str.match(self.PATTERN_DATE), None)
+        dates_i2b2 = pd.to_datetime(dates, format=self.FORMAT_CSV, errors='coerce').dt.strftime(self.FORMAT_I2B2)
+        is_missed = dates.notna() & dates_i2b2.isna()
+        if is_missed.any():
+            dates_i2b2 = dates_i2b2.astype(object)
+            dates_i2b2[is_missed] = dates[is_missed].map(self.__convert_or_none)
+        return dates_i2b2.astype(object).where(dates_i2b2.notna(), None)
+
+    def __convert_or_none(self, date: str) -> str:
+        try:
+            return self.convert(date)
+        except ValueError:
+            return None
+
+    def __add_to_cache(self, date: str, date_i2b2: str):
+        self.CACHE[date] = date_i2b2
+        if len(self.CACHE) > self.SIZE_CACHE:
+            self.CACHE.popitem(last=False)
+
+
+class ConceptCodeNormalizer(ABC):
+    """
+    Helper class to convert codes of the csv files to concept_cd of i2b2crcdata.observation_fact
+    (like 'ICD10GM:F24.24'). Each distinct code is converted only once and the resulting
+    concept is interned, as the same few thousand codes are repeated throughout the csv files.
+    Distinct codes of whole columns are converted at once by cache_series(). The concepts
+    are kept in a bounded LRU cache, as the normalizers of the converters live as long as
+    the process (like a P21ImportWorker).
+    """
+
+    PREFIX: str
+    SIZE_CACHE: int = 100000
+
+    def __init__(self):
+        self.CACHE = collections.OrderedDict()
+
+    def get_concept(self, code: str) -> str:
+        concept = self.CACHE.get(code)
+        if concept is None:
+            concept = sys.intern(':'.join([self.PREFIX, self.normalize_code(code)]))
+            self.__add_to_cache(code, concept)
+        else:
+            self.CACHE.move_to_end(code)
+        return concept
+
+    def cache_series(self, series: pd.Series) -> dict:
+        """
+        Returns { code : concept } of the distinct codes of given series. Codes which
+        are not cached yet are converted at once
+        """
+        dict_concepts = {}
+        list_missing = []
+        for code in series.dropna().unique().tolist():
+            concept = self.CACHE.get(code)
+            if concept is not None:
+                dict_concepts[code] = concept
+                self.CACHE.move_to_end(code)
+            elif code != '':
+                list_missing.append(code)
+        if list_missing:
+            concepts = ':'.join([self.PREFIX, '']) + self.normalize_series(pd.Series(list_missing, dtype=object))
+            for code, concept in zip(list_missing, concepts):
+                dict_concepts[code] = sys.intern(concept)
+                self.__add_to_cache(code, dict_concepts[code])
+        return dict_concepts
+
+    def convert_series(self, series: pd.Series) -> pd.Series:
+        """
+        Maps each code of given series to its concept. Empty codes are mapped to None
+        """
+        dict_concepts = self.cache_series(series)
+        return series.astype(object).map(dict_concepts).astype(object).where(series.astype(object) != '', None)
+
+    def __add_to_cache(self, code: str, concept: str):
+        self.CACHE[code] = concept
+        if len(self.CACHE) > self.SIZE_CACHE:
+            self.CACHE.popitem(last=False)
+
+    @staticmethod
+    @abstractmethod
+    def normalize_code(code: str) -> str:
+        pass
+
+    @staticmethod
+    @abstractmethod
+    def normalize_series(codes: pd.Series) -> pd.Series:
+        pass
+
+
+class ICDCodeNormalizer(ConceptCodeNormalizer):
+    PREFIX = 'ICD10GM'
+
+    @staticmethod
+    def normalize_code(code: str) -> str:
+        """
+        Converts icd code to i2b2crcdata.observation_fact format. Example:
+        F2424 -> F24.24
+        F24.24 -> F24.24
+        J90 -> J90
+        J21. -> J21.
+        """
+        if len(code) > 3:
+            code = ''.join([code[:3], '.', code[3:]] if code[3] != '.' else code)
+        return code
+
+    @staticmethod
+    def normalize_series(codes: pd.Series) -> pd.Series:
+        is_without_dot = (codes.str.len() > 3) & (codes.str.slice(3, 4) != '.')
+        return codes.mask(is_without_dot, codes.str.slice(0, 3) + '.' + codes.str.slice(3))
+
+
+class OPSCodeNormalizer(ConceptCodeNormalizer):
+    PREFIX = 'OPS'
+
+    @staticmethod
+    def normalize_code(code: str) -> str:
+        """
+        Converts ops code to i2b2crcdata.observation_fact format. Example:
+        964922 -> 9-649.22
+        9-64922 -> 9-649.22
+        9649.22 -> 9-649.22
+        9-649.22 -> 9-649.22
+        1-5020 -> 1-502.0
+        1-501 -> 1-501
+        1051 -> 1-501
+        """
+        code = ''.join([code[:1], '-', code[1:]] if code[1] != '-' else code)
+        if len(code) > 5:
+            code = ''.join([code[:5], '.', code[5:]] if code[5] != '.' else code)
+        return code
+
+    @staticmethod
+    def normalize_series(codes: pd.Series) -> pd.Series:
+        codes = codes.mask(codes.str.slice(1, 2) != '-', codes.str.slice(0, 1) + '-' + codes.str.slice(1))
+        is_without_dot = (codes.str.len() > 5) & (codes.str.slice(5, 6) != '.')
+        return codes.mask(is_without_dot, codes.str.slice(0, 5) + '.' + codes.str.slice(5))
+
+
+class ObservationFactStaticColumns:
+    """
+    Helper class for CSVObservationFactConverter and the observation_fact table handlers.
+    Static columns are the same for all facts of an import (including a single timestamp
+    of the import) and are applied as constants when the facts are written. Optional
+    columns are defaulted, if the converter did not set them.
+    """
+
+    DEFAULTS: dict = {'instance_num': 1, 'tval_char': None, 'nval_num': None, 'valueflag_cd': None, 'units_cd': '@', 'end_date': None}
+    DATE_IMPORT: str = None
+
+    @classmethod
+    def begin_import(cls):
+        cls.DATE_IMPORT = datetime.now(tz=None).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+    @classmethod
+    def create_static_columns(cls, code_source: str) -> dict:
+        if cls.DATE_IMPORT is None:
+            cls.begin_import()
+        return {'provider_id': 'P21', 'location_cd': '@', 'import_date': cls.DATE_IMPORT, 'update_date': cls.DATE_IMPORT,
+                'download_date': cls.DATE_IMPORT, 'sourcesystem_cd': code_source}
+
+
+class ObservationFactBuffer:
+    """
+    Struct-of-arrays container for observation facts, shared by the converters and the
+    observation_fact table handlers. Instead of one dict per fact, one list per column is
+    kept in the fixed column order of COLUMNS. Static columns are not part of the buffer,
+    but applied by the table handler (see ObservationFactStaticColumns).
+    """
+
+    COLUMNS: tuple = ('encounter_num', 'patient_num', 'concept_cd', 'start_date', 'modifier_cd', 'instance_num', 'valtype_cd', 'tval_char',
+                      'nval_num', 'valueflag_cd', 'units_cd', 'end_date')
+
+    def __init__(self):
+        self.ARRAYS = tuple([] for _ in self.COLUMNS)
+
+    def __len__(self) -> int:
+        return len(self.ARRAYS[0])
+
+    def append_fact(self, dict_fact: dict):
+        for column, array in zip(self.COLUMNS, self.ARRAYS):
+            array.append(dict_fact[column])
+
+    def add_facts(self, chunk: pd.DataFrame, **columns):
+        """
+        Adds one fact for each row of given chunk. Values are either series/arrays aligned with
+        the chunk or constants for all rows. Encounter and patient number are taken from the
+        chunk. Missing columns get their default value (see ObservationFactStaticColumns.DEFAULTS)
+        and 'start_date' defaults to the admission date of the encounter
+        """
+        num_rows = len(chunk.index)
+        if not num_rows:
+            return
+        columns = {**ObservationFactStaticColumns.DEFAULTS, 'start_date': chunk['date_admission'], **columns,
+                   'encounter_num': chunk['encounter_num'], 'patient_num': chunk['patient_num']}
+        for column, array in zip(self.COLUMNS, self.ARRAYS):
+            value = columns[column]
+            if isinstance(value, (pd.Series, np.ndarray)):
+                array.extend(value.tolist())
+            else:
+                array.extend([value] * num_rows)
+
+    def iter_rows(self):
+        return zip(*self.ARRAYS)
+
+    def to_dicts(self) -> list:
+        return [dict(zip(self.COLUMNS, row)) for row in self.iter_rows()]
 
 
 class CSVObservationFactConverter(ABC):
@@ -521,51 +1832,80 @@ class CSVObservationFactConverter(ABC):
     as a row in the csv file may need multiple rows in the database.
 
     Only mandatory database row values shall be added in create_observation_facts_from_row().
-    Default values (like provider_id or sourcesystem_cd) shall be added through
-    add_static_values_to_row_dict().
+    Encounter specific and default values shall be added through add_encounter_values_to_row_dict().
+    Static values (like provider_id or sourcesystem_cd) are applied by the table handler on upload
+    or shall be added through add_static_values_to_row_dict().
+
+    create_observation_facts_from_chunk() converts a whole chunk column-wise into an
+    ObservationFactBuffer and is used for the upload of larger csv files.
     """
 
+    DATE_CONVERTER: I2b2DateConverter = I2b2DateConverter()
+    MAX_FACTS_PER_ROW: int = 1
+
     def __init__(self):
         self.SCRIPT_ID = os.environ['script_id']
         self.ZIP_UUID = os.environ['uuid']
         self.CODE_SOURCE = '_'.join([self.SCRIPT_ID, self.ZIP_UUID])
+        self.STATIC_COLUMNS = ObservationFactStaticColumns.create_static_columns(self.CODE_SOURCE)
 
     @abstractmethod
     def create_observation_facts_from_row(self, row_csv: pd.Series) -> list:
         pass
 
+    @abstractmethod
+    def create_observation_facts_from_chunk(self, chunk: pd.DataFrame) -> ObservationFactBuffer:
+        """
+        Chunk-wise counterpart of create_observation_facts_from_row() and add_encounter_values_to_row_dict().
+        Given chunk must additionally contain the columns 'encounter_num', 'patient_num' and 'date_admission'
+        (in i2b2 format) of the matched encounters
+        """
+        pass
+
+    def iter_observation_fact_batches(self, chunk: pd.DataFrame, size_batch: int) -> Iterator[ObservationFactBuffer]:
+        """
+        Converts given chunk in slices of rows, so that each yielded batch holds at most
+        size_batch facts and can be uploaded before the next slice is converted
+        """
+        num_rows = max(1, size_batch // self.MAX_FACTS_PER_ROW)
+        for index_start in range(0, len(chunk.index), num_rows):
+            yield self.create_observation_facts_from_chunk(chunk.iloc[index_start:index_start + num_rows])
+
+    def convert_dates_of_series(self, dates: pd.Series) -> pd.Series:
+        """
+        Empty dates are converted to None. Dates which convert_series() could not convert
+        are converted row-wise, so that invalid dates raise the same error as in the
+        row-wise conversion
+        """
+        dates_i2b2 = self.DATE_CONVERTER.convert_series(dates)
+        is_invalid = (dates.astype(object).fillna('') != '') & dates_i2b2.isna()
+        if is_invalid.any():
+            dates_i2b2[is_invalid] = dates[is_invalid].map(self.DATE_CONVERTER.convert)
+        return dates_i2b2
+
+    @staticmethod
+    def _get_rows_with_values(chunk: pd.DataFrame, *columns: str) -> pd.DataFrame:
+        is_filled = True
+        for column in columns:
+            is_filled = is_filled & (chunk[column] != '')
+        return chunk[is_filled]
+
+    @staticmethod
+    def _concat_upper(prefix: str, values: pd.Series) -> pd.Series:
+        return prefix + values.astype(str).str.upper()
+
+    def add_encounter_values_to_row_dict(self, dict_row: dict, num_enc: str, num_pat: str, date_admission: str) -> dict:
+        return {**ObservationFactStaticColumns.DEFAULTS, 'start_date': self._convert_date_to_i2b2_format(date_admission), **dict_row,
+                'encounter_num': num_enc, 'patient_num': num_pat}
+
     def add_static_values_to_row_dict(self, dict_row: dict, num_enc: str, num_pat: str, date_admission: str) -> dict:
-        date_import = datetime.now(tz=None).strftime('%Y-%m-%d %H:%M:%S.%f')
-        date_admission = self._convert_date_to_i2b2_format(date_admission)
-        dict_row['encounter_num'] = num_enc
-        dict_row['patient_num'] = num_pat
-        dict_row['provider_id'] = 'P21'
-        if 'start_date' not in dict_row:
-            dict_row['start_date'] = date_admission
-        if 'instance_num' not in dict_row:
-            dict_row['instance_num'] = 1
-        if 'tval_char' not in dict_row:
-            dict_row['tval_char'] = None
-        if 'nval_num' not in dict_row:
-            dict_row['nval_num'] = None
-        if 'valueflag_cd' not in dict_row:
-            dict_row['valueflag_cd'] = None
-        if 'units_cd' not in dict_row:
-            dict_row['units_cd'] = '@'
-        if 'end_date' not in dict_row:
-            dict_row['end_date'] = None
-        dict_row['location_cd'] = '@'
-        dict_row['import_date'] = date_import
-        dict_row['update_date'] = date_import
-        dict_row['download_date'] = date_import
-        dict_row['sourcesystem_cd'] = self.CODE_SOURCE
+        dict_row = self.add_encounter_values_to_row_dict(dict_row, num_enc, num_pat, date_admission)
+        dict_row.update(self.STATIC_COLUMNS)
         return dict_row
 
-    @staticmethod
-    def _convert_date_to_i2b2_format(date: str) -> str:
-        if date[8:10] == '24':
-            date = ''.join([date[:8], '2359'])
-        return datetime.strptime(str(date), '%Y%m%d%H%M').strftime('%Y-%m-%d %H:%M')
+    @classmethod
+    def _convert_date_to_i2b2_format(cls, date: str) -> str:
+        return cls.DATE_CONVERTER.convert(date)
 
 
 class FALLObservationFactConverter(CSVObservationFactConverter):
@@ -587,6 +1927,8 @@ class FALLObservationFactConverter(CSVObservationFactConverter):
     Additionally, contains a method to add metdata of this script as observation facts.
     """
 
+    MAX_FACTS_PER_ROW = 16
+
     def __init__(self):
         super().__init__()
         self.SCRIPT_VERSION = os.environ['script_version']
@@ -689,6 +2031,48 @@ class FALLObservationFactConverter(CSVObservationFactConverter):
                 {'concept_cd': 'P21:SCRIPT', 'modifier_cd': 'scriptVer', 'valtype_cd': 'T', 'tval_char': self.SCRIPT_VERSION},
                 {'concept_cd': 'P21:SCRIPT', 'modifier_cd': 'scriptId', 'valtype_cd': 'T', 'tval_char': self.SCRIPT_ID}]
 
+    def create_observation_facts_from_chunk(self, chunk: pd.DataFrame) -> ObservationFactBuffer:
+        """
+        Includes the script rows for each encounter
+        """
+        facts = ObservationFactBuffer()
+        facts.add_facts(chunk, concept_cd=self._concat_upper('P21:ADMC:', chunk['aufnahmeanlass']), modifier_cd='@', valtype_cd='@', valueflag_cd='@')
+        facts.add_facts(chunk, concept_cd=self._concat_upper('P21:ADMR:', chunk['aufnahmegrund']), modifier_cd='@', valtype_cd='@', valueflag_cd='@')
+        rows = self._get_rows_with_values(chunk, 'ikderkrankenkasse')
+        facts.add_facts(rows, concept_cd='AKTIN:IKNR', modifier_cd='@', valtype_cd='T', tval_char=rows['ikderkrankenkasse'])
+        rows = self._get_rows_with_values(chunk, 'geburtsjahr')
+        facts.add_facts(rows, concept_cd='LOINC:80904-6', modifier_cd='@', valtype_cd='N', nval_num=rows['geburtsjahr'], units_cd='yyyy')
+        facts.add_facts(rows, concept_cd='LOINC:80904-6', modifier_cd='effectiveTime', valtype_cd='T', tval_char=rows['aufnahmedatum'])
+        rows = self._get_rows_with_values(chunk, 'geschlecht')
+        facts.add_facts(rows, concept_cd=self._concat_upper('P21:SEX:', rows['geschlecht']), modifier_cd='@', valtype_cd='@', valueflag_cd='@')
+        rows = self._get_rows_with_values(chunk, 'plz')
+        facts.add_facts(rows, concept_cd='AKTIN:ZIPCODE', modifier_cd='@', valtype_cd='T', tval_char=rows['plz'])
+        rows = self._get_rows_with_values(chunk[chunk['fallzusammenführung'] == 'J'], 'fallzusammenführungsgrund')
+        facts.add_facts(rows, concept_cd=self._concat_upper('P21:MERGE:', rows['fallzusammenführungsgrund']), modifier_cd='@', valtype_cd='@', valueflag_cd='@')
+        rows = self._get_rows_with_values(chunk, 'verweildauerintensiv')
+        facts.add_facts(rows, concept_cd='P21:DCC', modifier_cd='@', valtype_cd='N', nval_num=rows['verweildauerintensiv'].str.replace(',', '.'), units_cd='d')
+        rows = self._get_rows_with_values(chunk, 'entlassungsdatum', 'entlassungsgrund')
+        facts.add_facts(rows, concept_cd=self._concat_upper('P21:DISR:', rows['entlassungsgrund']), start_date=self.convert_dates_of_series(rows['entlassungsdatum']),
+                        modifier_cd='@', valtype_cd='@', valueflag_cd='@')
+        rows = self._get_rows_with_values(chunk, 'beatmungsstunden')
+        facts.add_facts(rows, concept_cd='P21:DV', modifier_cd='@', valtype_cd='N', nval_num=rows['beatmungsstunden'].str.replace(',', '.'), units_cd='h')
+        self.__add_therapy_facts(facts, chunk, 'P21:PREADM', 'behandlungsbeginnvorstationär', 'behandlungstagevorstationär')
+        self.__add_therapy_facts(facts, chunk, 'P21:POSTDIS', 'behandlungsendenachstationär', 'behandlungstagenachstationär')
+        facts.add_facts(chunk, concept_cd='P21:SCRIPT', modifier_cd='@', valtype_cd='@', valueflag_cd='@')
+        facts.add_facts(chunk, concept_cd='P21:SCRIPT', modifier_cd='scriptVer', valtype_cd='T', tval_char=self.SCRIPT_VERSION)
+        facts.add_facts(chunk, concept_cd='P21:SCRIPT', modifier_cd='scriptId', valtype_cd='T', tval_char=self.SCRIPT_ID)
+        return facts
+
+    def __add_therapy_facts(self, facts: ObservationFactBuffer, chunk: pd.DataFrame, concept: str, column_date: str, column_days: str):
+        """
+        Date information in csv is missing hours and minutes, so dummy values are added
+        """
+        rows = self._get_rows_with_values(chunk, column_date)
+        dates = self.convert_dates_of_series(rows[column_date] + '0000')
+        has_days = (rows[column_days] != '').to_numpy()
+        facts.add_facts(rows[has_days], concept_cd=concept, start_date=dates[has_days], modifier_cd='@', valtype_cd='N', nval_num=rows.loc[has_days, column_days], units_cd='d')
+        facts.add_facts(rows[~has_days], concept_cd=concept, start_date=dates[~has_days], modifier_cd='@', valtype_cd='@', valueflag_cd='@')
+
 
 class FABObservationFactConverter(CSVObservationFactConverter):
     """
@@ -698,6 +2082,7 @@ class FABObservationFactConverter(CSVObservationFactConverter):
     def __init__(self):
         super().__init__()
         self.COUNTER_INSTANCE = ObservationFactInstanceCounter()
+        self.NUMERATOR_INSTANCE = ObservationFactInstanceNumerator()
 
     def create_observation_facts_from_row(self, row_csv: pd.Series) -> list:
         id_case = row_csv['khinterneskennzeichen']
@@ -711,6 +2096,14 @@ class FABObservationFactConverter(CSVObservationFactConverter):
         concept = 'P21:DEP:CC' if intensive == 'J' else 'P21:DEP'
         return {'concept_cd': concept, 'start_date': date_start, 'modifier_cd': '@', 'instance_num': num_instance, 'valtype_cd': 'T', 'tval_char': department, 'end_date': date_end}
 
+    def create_observation_facts_from_chunk(self, chunk: pd.DataFrame) -> ObservationFactBuffer:
+        facts = ObservationFactBuffer()
+        instances = self.NUMERATOR_INSTANCE.add_chunk_instance_counts(chunk['khinterneskennzeichen'])
+        concepts = np.where((chunk['kennungintensivbett'] == 'J').to_numpy(), 'P21:DEP:CC', 'P21:DEP')
+        facts.add_facts(chunk, concept_cd=concepts, start_date=self.convert_dates_of_series(chunk['fabaufnahmedatum']), modifier_cd='@', instance_num=instances,
+                        valtype_cd='T', tval_char=chunk['fachabteilung'], end_date=self.convert_dates_of_series(chunk['fabentlassungsdatum']))
+        return facts
+
 
 class ICDObservationFactConverter(CSVObservationFactConverter):
     """
@@ -718,9 +2111,13 @@ class ICDObservationFactConverter(CSVObservationFactConverter):
     Other columns may be empty and are only added, if the columns contains a value.
     """
 
+    CODE_NORMALIZER: ConceptCodeNormalizer = ICDCodeNormalizer()
+    MAX_FACTS_PER_ROW = 11
+
     def __init__(self):
         super().__init__()
         self.COUNTER_INSTANCE = ObservationFactInstanceCounter()
+        self.NUMERATOR_INSTANCE = ObservationFactInstanceNumerator()
 
     def create_observation_facts_from_row(self, row_csv: pd.Series) -> list:
         facts = []
@@ -734,7 +2131,7 @@ class ICDObservationFactConverter(CSVObservationFactConverter):
         return facts
 
     def __create_icd_dicts(self, num_instance: str, code: str, type_diag: str, version: str, localisation: str, certainty: str) -> list:
-        concept = ':'.join(['ICD10GM', self.__convert_icd_code_to_i2b2_format(code)])
+        concept = self.CODE_NORMALIZER.get_concept(code)
         list_facts = [{'concept_cd': concept, 'modifier_cd': '@', 'instance_num': num_instance, 'valtype_cd': '@', 'valueflag_cd': '@'},
                       {'concept_cd': concept, 'modifier_cd': 'diagType', 'instance_num': num_instance, 'valtype_cd': 'T', 'tval_char': type_diag},
                       {'concept_cd': concept, 'modifier_cd': 'cdVersion', 'instance_num': num_instance, 'valtype_cd': 'N', 'nval_num': version, 'units_cd': 'yyyy'}]
@@ -746,23 +2143,36 @@ class ICDObservationFactConverter(CSVObservationFactConverter):
 
     def __create_icd_sek_dicts(self, num_instance: str, code: str, code_parent: str, version: str, localisation: str, certainty: str) -> list:
         list_facts = self.__create_icd_dicts(num_instance, code, 'SD', version, localisation, certainty)
-        concept_parent = ':'.join(['ICD10GM', self.__convert_icd_code_to_i2b2_format(code_parent)])
-        concept_icd = ':'.join(['ICD10GM', self.__convert_icd_code_to_i2b2_format(code)])
+        concept_parent = self.CODE_NORMALIZER.get_concept(code_parent)
+        concept_icd = self.CODE_NORMALIZER.get_concept(code)
         list_facts.append({'concept_cd': concept_icd, 'modifier_cd': 'sdFrom', 'instance_num': num_instance, 'valtype_cd': 'T', 'tval_char': concept_parent})
         return list_facts
 
-    @staticmethod
-    def __convert_icd_code_to_i2b2_format(code) -> str:
+    def create_observation_facts_from_chunk(self, chunk: pd.DataFrame) -> ObservationFactBuffer:
         """
-        Converts icd code to i2b2crcdata.observation_fact format. Example:
-        F2424 -> F24.24
-        F24.24 -> F24.24
-        J90 -> J90
-        J21. -> J21.
+        Secondary diagnoses get the instance number following their primary diagnosis
         """
-        if len(code) > 3:
-            code = ''.join([code[:3], '.', code[3:]] if code[3] != '.' else code)
-        return code
+        facts = ObservationFactBuffer()
+        has_sek = (chunk['sekundärkode'] != '').to_numpy()
+        instances = self.NUMERATOR_INSTANCE.add_chunk_instance_counts(chunk['khinterneskennzeichen'], pd.Series(1 + has_sek))
+        concepts = self.CODE_NORMALIZER.convert_series(chunk['icdkode']).to_numpy()
+        self.__add_icd_facts(facts, chunk, instances, concepts, chunk['diagnoseart'], 'lokalisation', 'diagnosensicherheit')
+        rows = chunk[has_sek]
+        instances_sek = instances[has_sek] + 1
+        concepts_sek = self.CODE_NORMALIZER.convert_series(rows['sekundärkode']).to_numpy()
+        self.__add_icd_facts(facts, rows, instances_sek, concepts_sek, 'SD', 'sekundärlokalisation', 'sekundärdiagnosensicherheit')
+        facts.add_facts(rows, concept_cd=concepts_sek, modifier_cd='sdFrom', instance_num=instances_sek, valtype_cd='T', tval_char=concepts[has_sek])
+        return facts
+
+    @staticmethod
+    def __add_icd_facts(facts: ObservationFactBuffer, chunk: pd.DataFrame, instances: np.ndarray, concepts: np.ndarray, type_diag, column_localisation: str, column_certainty: str):
+        facts.add_facts(chunk, concept_cd=concepts, modifier_cd='@', instance_num=instances, valtype_cd='@', valueflag_cd='@')
+        facts.add_facts(chunk, concept_cd=concepts, modifier_cd='diagType', instance_num=instances, valtype_cd='T', tval_char=type_diag)
+        facts.add_facts(chunk, concept_cd=concepts, modifier_cd='cdVersion', instance_num=instances, valtype_cd='N', nval_num=chunk['icdversion'], units_cd='yyyy')
+        for modifier, column in [('localisation', column_localisation), ('certainty', column_certainty)]:
+            is_filled = (chunk[column] != '').to_numpy()
+            facts.add_facts(chunk[is_filled], concept_cd=concepts[is_filled], modifier_cd=modifier, instance_num=instances[is_filled], valtype_cd='T',
+                            tval_char=chunk.loc[is_filled, column])
 
 
 class OPSObservationFactConverter(CSVObservationFactConverter):
@@ -770,9 +2180,13 @@ class OPSObservationFactConverter(CSVObservationFactConverter):
     In ops.csv, all columns but 'lokalisation' are mandatory.
     """
 
+    CODE_NORMALIZER: ConceptCodeNormalizer = OPSCodeNormalizer()
+    MAX_FACTS_PER_ROW = 3
+
     def __init__(self):
         super().__init__()
         self.COUNTER_INSTANCE = ObservationFactInstanceCounter()
+        self.NUMERATOR_INSTANCE = ObservationFactInstanceNumerator()
 
     def create_observation_facts_from_row(self, row_csv: pd.Series) -> list:
         id_case = row_csv['khinterneskennzeichen']
@@ -781,29 +2195,24 @@ class OPSObservationFactConverter(CSVObservationFactConverter):
 
     def __create_ops_dicts(self, num_instance: str, code, version, localisation, date: str) -> list:
         date = self._convert_date_to_i2b2_format(date)
-        concept = ':'.join(['OPS', self.__convert_ops_code_to_i2b2_format(code)])
+        concept = self.CODE_NORMALIZER.get_concept(code)
         list_facts = [{'concept_cd': concept, 'start_date': date, 'modifier_cd': '@', 'instance_num': num_instance, 'valtype_cd': '@', 'valueflag_cd': '@'},
                       {'concept_cd': concept, 'start_date': date, 'modifier_cd': 'cdVersion', 'instance_num': num_instance, 'valtype_cd': 'N', 'nval_num': version, 'units_cd': 'yyyy'}]
         if localisation:
             list_facts.append({'concept_cd': concept, 'start_date': date, 'modifier_cd': 'localisation', 'instance_num': num_instance, 'valtype_cd': 'T', 'tval_char': localisation})
         return list_facts
 
-    @staticmethod
-    def __convert_ops_code_to_i2b2_format(code) -> str:
-        """
-        Converts ops code to i2b2crcdata.observation_fact format. Example:
-        964922 -> 9-649.22
-        9-64922 -> 9-649.22
-        9649.22 -> 9-649.22
-        9-649.22 -> 9-649.22
-        1-5020 -> 1-502.0
-        1-501 -> 1-501
-        1051 -> 1-501
-        """
-        code = ''.join([code[:1], '-', code[1:]] if code[1] != '-' else code)
-        if len(code) > 5:
-            code = ''.join([code[:5], '.', code[5:]] if code[5] != '.' else code)
-        return code
+    def create_observation_facts_from_chunk(self, chunk: pd.DataFrame) -> ObservationFactBuffer:
+        facts = ObservationFactBuffer()
+        instances = self.NUMERATOR_INSTANCE.add_chunk_instance_counts(chunk['khinterneskennzeichen'])
+        concepts = self.CODE_NORMALIZER.convert_series(chunk['opskode']).to_numpy()
+        dates = self.convert_dates_of_series(chunk['opsdatum']).to_numpy()
+        facts.add_facts(chunk, concept_cd=concepts, start_date=dates, modifier_cd='@', instance_num=instances, valtype_cd='@', valueflag_cd='@')
+        facts.add_facts(chunk, concept_cd=concepts, start_date=dates, modifier_cd='cdVersion', instance_num=instances, valtype_cd='N', nval_num=chunk['opsversion'], units_cd='yyyy')
+        is_filled = (chunk['lokalisation'] != '').to_numpy()
+        facts.add_facts(chunk[is_filled], concept_cd=concepts[is_filled], start_date=dates[is_filled], modifier_cd='localisation', instance_num=instances[is_filled],
+                        valtype_cd='T', tval_char=chunk.loc[is_filled, 'lokalisation'])
+        return facts
 
 
 class ObservationFactInstanceCounter:
@@ -823,8 +2232,203 @@ class ObservationFactInstanceCounter:
         return self.DICT_NUM_INSTANCES.get(id_case)
 
 
+class ObservationFactInstanceNumerator:
+    """
+    Helper class for CSVObservationFactConverter.
+    Chunk-wise counterpart of ObservationFactInstanceCounter. Assigns the instance numbers
+    of a whole chunk at once with a grouped cumulative count. The counts of all encounters
+    seen so far are carried over to following chunks in a compact array.
+    """
+
+    def __init__(self):
+        self.INDEX_ENCOUNTER = None
+        self.COUNTS = None
+
+    def add_chunk_instance_counts(self, ids_case: pd.Series, weights: pd.Series = None) -> np.ndarray:
+        """
+        Returns the instance number of each row in given chunk. A weight above one
+        reserves further instance numbers for a row (like for secondary diagnoses),
+        which are following the returned number
+        """
+        if self.INDEX_ENCOUNTER is None:
+            self.INDEX_ENCOUNTER = pd.Index([], dtype=object)
+            self.COUNTS = np.zeros(0, dtype=np.int64)
+        ids_case = ids_case.astype(object)
+        ids_new = pd.Index(ids_case.unique()).difference(self.INDEX_ENCOUNTER)
+        if len(ids_new):
+            self.INDEX_ENCOUNTER = self.INDEX_ENCOUNTER.append(ids_new)
+            self.COUNTS = np.concatenate([self.COUNTS, np.zeros(len(ids_new), dtype=np.int64)])
+        positions = self.INDEX_ENCOUNTER.get_indexer(ids_case)
+        weights = np.ones(len(positions), dtype=np.int64) if weights is None else weights.to_numpy(dtype=np.int64)
+        sum_weights = pd.Series(weights).groupby(positions).cumsum().to_numpy()
+        instances = self.COUNTS[positions] + sum_weights - weights + 1
+        self.COUNTS += np.bincount(positions, weights=weights, minlength=len(self.COUNTS)).astype(np.int64)
+        return instances
+
+
+class SQLStatementMonitor:
+    """
+    Helper class to count, time and rank the SQL statements of an import by kind
+    (select, insert, update, delete). The listeners are registered once on each engine
+    of DatabaseConnection and record into the monitor of the running import (see start()
+    and stop()); the PsycopgConnection of the LightweightImporter records through
+    measure(). Statements are grouped by their text, inserts of several rows by their
+    column list. Statements executed at least once per imported encounter are reported
+    as repeated per encounter, which points to a lookup that should be done in bulk.
+    If the environment variable 'p21_sql_explain' is 'true', the plans of the
+    TOP_STATEMENTS slowest select statements are captured with EXPLAIN (ANALYZE, BUFFERS)
+    when the monitor is stopped.
+    """
+    ACTIVE: SQLStatementMonitor = None
+    KINDS: tuple = ('select', 'insert', 'update', 'delete')
+    TOP_STATEMENTS: int = 5
+    KEY_START: str = 'p21_statement_start'
+
+    def __init__(self):
+        self.STATEMENTS = {}
+        self.IS_EXPLAIN = os.environ.get('p21_sql_explain', '').lower() == 'true'
+        self.PLANS = {}
+        self.__slowest = {}
+
+    def start(self):
+        SQLStatementMonitor.ACTIVE = self
+
+    def stop(self):
+        if SQLStatementMonitor.ACTIVE is self:
+            SQLStatementMonitor.ACTIVE = None
+        if self.IS_EXPLAIN:
+            self.__explain_slowest_selects()
+
+    @classmethod
+    def register(cls, engine: db.engine.Engine):
+        db.event.listen(engine, 'before_cursor_execute', cls.__before_cursor_execute)
+        db.event.listen(engine, 'after_cursor_execute', cls.__after_cursor_execute)
+        db.event.listen(engine, 'handle_error', cls.__handle_error)
+
+    @classmethod
+    def __before_cursor_execute(cls, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(cls.KEY_START, []).append(time.perf_counter())
+
+    @classmethod
+    def __after_cursor_execute(cls, conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info[cls.KEY_START].pop()
+        monitor = cls.ACTIVE
+        if monitor is not None:
+            num_rows = cursor.rowcount
+            if num_rows < 0 and executemany:
+                num_rows = len(parameters)
+            monitor.record(statement, seconds, max(num_rows, 0), None if executemany else parameters, conn.engine)
+
+    @classmethod
+    def __handle_error(cls, context):
+        if context.connection is not None and context.connection.info.get(cls.KEY_START):
+            context.connection.info[cls.KEY_START].pop()
+
+    @classmethod
+    @contextlib.contextmanager
+    def measure(cls, statement: str, parameters=None, source=None) -> Iterator[list]:
+        """
+        Records a statement executed without SQLAlchemy. Yields a list, to which the
+        number of affected rows can be appended
+        """
+        list_rows = []
+        time_start = time.perf_counter()
+        yield list_rows
+        monitor = cls.ACTIVE
+        if monitor is not None:
+            monitor.record(statement, time.perf_counter() - time_start, sum(list_rows), parameters, source)
+
+    def record(self, statement: str, seconds: float, num_rows: int, parameters=None, source=None):
+        """
+        Parameters and source (engine or PsycopgConnection) are kept for the slowest
+        execution of each statement, so that its plan can be explained on a new
+        connection after the import
+        """
+        kind = self.get_kind(statement)
+        if kind == 'insert':
+            statement = re.sub(r'\)\s+VALUES\s.*', ') VALUES ...', statement, flags=re.IGNORECASE | re.DOTALL)
+        entry = self.STATEMENTS.get(statement)
+        if entry is None:
+            entry = self.STATEMENTS[statement] = {'kind': kind, 'statement': statement, 'count': 0, 'rows': 0, 'seconds': 0.0, 'seconds_max': 0.0}
+        entry['count'] += 1
+        entry['rows'] += num_rows
+        entry['seconds'] += seconds
+        if seconds >= entry['seconds_max']:
+            entry['seconds_max'] = seconds
+            self.__slowest[statement] = (parameters, source)
+
+    def get_kind(self, statement: str) -> str:
+        words = statement.lstrip().split(None, 1)
+        kind = words[0].lower() if words else ''
+        return kind if kind in self.KINDS else 'other'
+
+    def get_slowest_statements(self, kind: str = None) -> list:
+        list_entries = [entry for entry in self.STATEMENTS.values() if kind is None or entry['kind'] == kind]
+        return sorted(list_entries, key=lambda entry: entry['seconds'], reverse=True)[:self.TOP_STATEMENTS]
+
+    def get_statements_repeated_per_encounter(self, num_encounters: int) -> list:
+        if num_encounters < 2:
+            return []
+        return [entry for entry in self.STATEMENTS.values() if entry['count'] >= num_encounters]
+
+    def __explain_slowest_selects(self):
+        for entry in self.get_slowest_statements('select'):
+            parameters, source = self.__slowest[entry['statement']]
+            if source is None:
+                continue
+            query = 'EXPLAIN (ANALYZE, BUFFERS) ' + entry['statement']
+            try:
+                if isinstance(source, PsycopgConnection):
+                    connection = PsycopgConnection()
+                    try:
+                        list_rows = connection.fetch_all(query, parameters)
+                    finally:
+                        connection.close()
+                else:
+                    with source.connect() as conn:
+                        list_rows = conn.exec_driver_sql(query, parameters).fetchall()
+                self.PLANS[entry['statement']] = '\n'.join(str(row[0]) for row in list_rows)
+            except Exception as error:
+                self.PLANS[entry['statement']] = 'EXPLAIN failed: {0}'.format(error)
+
+    def to_dict(self, num_encounters: int = 0) -> dict:
+        dict_kinds = {}
+        for entry in self.STATEMENTS.values():
+            summary = dict_kinds.setdefault(entry['kind'], {'count': 0, 'rows': 0, 'seconds': 0.0})
+            summary['count'] += entry['count']
+            summary['rows'] += entry['rows']
+            summary['seconds'] += entry['seconds']
+        for summary in dict_kinds.values():
+            summary['seconds'] = round(summary['seconds'], 3)
+        num_statements = sum(entry['count'] for entry in self.STATEMENTS.values())
+        result = {'statements': num_statements, 'kinds': dict_kinds,
+                  'slowest': [self.__entry_to_dict(entry, num_encounters) for entry in self.get_slowest_statements()],
+                  'repeated_per_encounter': [self.__entry_to_dict(entry, num_encounters) for entry in self.get_statements_repeated_per_encounter(num_encounters)]}
+        if num_encounters:
+            result['statements_per_encounter'] = round(num_statements / num_encounters, 2)
+        return result
+
+    def __entry_to_dict(self, entry: dict, num_encounters: int) -> dict:
+        entry = dict(entry, seconds=round(entry['seconds'], 3), seconds_max=round(entry['seconds_max'], 3))
+        if num_encounters:
+            entry['count_per_encounter'] = round(entry['count'] / num_encounters, 2)
+        if entry['statement'] in self.PLANS:
+            entry['plan'] = self.PLANS[entry['statement']]
+        return entry
+
+
 class DatabaseConnection(ABC):
+    """
+    Engines and reflected tables are created once per connection url and shared by
+    all instances of the process, so that the extractors and table handlers of one
+    or several imports use the same connection pool (see dispose_engines()).
+    The environment variable 'p21_database_url' replaces the url created from
+    'connection-url' by any SQLAlchemy url (like a local sqlite database for the
+    benchmarks in test/benchmark)
+    """
     ENGINE: db.engine.Engine = None
+    ENGINES: dict = {}
+    TABLES: dict = {}
 
     def __init__(self):
         self.USERNAME = os.environ['username']
@@ -835,14 +2439,27 @@ class DatabaseConnection(ABC):
     def __init_engine(self):
         pattern = r'jdbc:postgresql://(.*?)(\?searchPath=.*)?$'
         connection = re.search(pattern, self.I2B2_CONNECTION_URL).group(1)
-        self.ENGINE = db.create_engine(f"postgresql+psycopg2://{self.USERNAME}:{self.PASSWORD}@{connection}", pool_pre_ping=True)
+        url = os.environ.get('p21_database_url') or f"postgresql+psycopg2://{self.USERNAME}:{self.PASSWORD}@{connection}"
+        if url not in DatabaseConnection.ENGINES:
+            DatabaseConnection.ENGINES[url] = db.create_engine(url, pool_pre_ping=True)
+            SQLStatementMonitor.register(DatabaseConnection.ENGINES[url])
+        self.ENGINE = DatabaseConnection.ENGINES[url]
 
     def open_connection(self):
       return self.ENGINE.connect()
 
-    def __del__(self):
-      if self.ENGINE is not None:
-        self.ENGINE.dispose()
+    def _get_reflected_table(self, name: str) -> db.schema.Table:
+        key = (self.ENGINE, name)
+        if key not in DatabaseConnection.TABLES:
+            DatabaseConnection.TABLES[key] = db.Table(name, db.MetaData(), autoload_with=self.ENGINE)
+        return DatabaseConnection.TABLES[key]
+
+    @staticmethod
+    def dispose_engines():
+        for engine in DatabaseConnection.ENGINES.values():
+            engine.dispose()
+        DatabaseConnection.ENGINES.clear()
+        DatabaseConnection.TABLES.clear()
 
 
 class DatabaseExtractor(DatabaseConnection, ABC):
@@ -853,21 +2470,24 @@ class DatabaseExtractor(DatabaseConnection, ABC):
         pass
 
     def _stream_query_into_df(self, query: db.sql.expression) -> pd.DataFrame:
-        df = pd.DataFrame()
+        """
+        Fetches the result rows in chunks sized by an AdaptiveChunkSizer and creates the dataframe
+        once after all rows are fetched
+        """
+        sizer = AdaptiveChunkSizer(self.SIZE_CHUNKS)
+        list_rows = []
         with self.open_connection() as conn:
           result = conn.execution_options(stream_results=True).execute(query)
           while True:
-            chunk = result.fetchmany(self.SIZE_CHUNKS)
+            time_start = time.perf_counter()
+            chunk = result.fetchmany(sizer.get_size())
             if not chunk:
               break
-            if df.empty:
-              df = pd.DataFrame(chunk)
-            else:
-              df = df.append(chunk, ignore_index=True)
-          if df.empty:
+            sizer.record_parse(len(chunk), time.perf_counter() - time_start)
+            list_rows.extend(chunk)
+          if not list_rows:
             raise ValueError("No entries for database query was found")
-          df.columns = result.keys()
-          return df
+          return pd.DataFrame(list_rows, columns=list(result.keys()))
 
 
 class EncounterInfoExtractorWithEncounterId(DatabaseExtractor):
@@ -878,13 +2498,9 @@ class EncounterInfoExtractorWithEncounterId(DatabaseExtractor):
     """
 
     def extract(self) -> pd.DataFrame:
-          enc = db.Table(
-              "encounter_mapping", db.MetaData(), autoload_with=self.ENGINE
-          )
-          pat = db.Table("patient_mapping", db.MetaData(), autoload_with=self.ENGINE)
-          opt = db.Table(
-              "optinout_patients", db.MetaData(), autoload_with=self.ENGINE
-          )
+          enc = self._get_reflected_table("encounter_mapping")
+          pat = self._get_reflected_table("patient_mapping")
+          opt = self._get_reflected_table("optinout_patients")
           query = (
               db.select(
                   enc.c["encounter_ide"],
@@ -911,13 +2527,9 @@ class EncounterInfoExtractorWithBillingId(DatabaseExtractor):
     """
 
     def extract(self) -> pd.DataFrame:
-          fact = db.Table(
-              "observation_fact", db.MetaData(), autoload_with=self.ENGINE
-          )
-          pat = db.Table("patient_mapping", db.MetaData(), autoload_with=self.ENGINE)
-          opt = db.Table(
-              "optinout_patients", db.MetaData(), autoload_with=self.ENGINE
-          )
+          fact = self._get_reflected_table("observation_fact")
+          pat = self._get_reflected_table("patient_mapping")
+          opt = self._get_reflected_table("optinout_patients")
           query = (
               db.select(
                   fact.c["tval_char"],
@@ -950,11 +2562,13 @@ class DatabaseEncounterMatcher:
     of DatabaseExtractor (encounter id or billing id).
     """
 
-    def __init__(self, extractor: DatabaseExtractor):
+    def __init__(self, extractor: DatabaseExtractor, cache: EncounterMatchingCache = None, report: ImportStageReport = None):
         self.READER = AktinPropertiesReader()
         algorithm = self.READER.get_property('pseudonym.algorithm')
         self.ANONYMIZER = OneWayAnonymizer(algorithm)
         self.EXTRACTOR = extractor
+        self.CACHE = cache if cache is not None else EncounterMatchingCache()
+        self.REPORT = report if report is not None else ImportStageReport()
 
     def get_matched_df(self, list_csv_ids: list) -> pd.DataFrame:
         """
@@ -966,8 +2580,12 @@ class DatabaseEncounterMatcher:
         """
         salt = self.__get_salt_property()
         root = self.__get_extractor_type_root()
-        df_db = self.EXTRACTOR.extract()
-        list_csv_ide = self.ANONYMIZER.anonymize_list(root, list_csv_ids, salt)
+        with self.REPORT.measure('matching_extract') as stage:
+            df_db = self.CACHE.get_encounter_info(type(self.EXTRACTOR).__name__, self.EXTRACTOR.extract)
+            stage['rows_out'] += len(df_db.index)
+        with self.REPORT.measure('matching_hashing') as stage:
+            list_csv_ide = self.CACHE.anonymize_list(self.ANONYMIZER, root, list_csv_ids, salt)
+            stage['rows_in'] += len(list_csv_ids)
         df_csv = pd.DataFrame(list(zip(list_csv_ids, list_csv_ide)), columns=['encounter_id', 'match_id'])
         df_merged = pd.merge(df_db, df_csv, on=['match_id'])
         df_merged = df_merged.drop(['match_id'], axis=1)
@@ -988,6 +2606,10 @@ class DatabaseEncounterMatcher:
 
 
 class AktinPropertiesReader:
+    """
+    The properties file is parsed once and read again only if it was modified
+    """
+    CACHE: dict = {}
 
     def __init__(self):
         self.PATH_AKTIN_PROPERTIES = os.environ['path_aktin_properties']
@@ -995,13 +2617,52 @@ class AktinPropertiesReader:
             raise SystemExit('file path for aktin.properties is not valid')
 
     def get_property(self, prop: str) -> str:
-        with open(self.PATH_AKTIN_PROPERTIES) as properties:
-            for line in properties:
-                if '=' in line:
-                    key, value = line.split('=', 1)
-                    if key == prop:
-                        return value.strip()
-            return ''
+        return self.__get_properties().get(prop, '')
+
+    def __get_properties(self) -> dict:
+        key = (self.PATH_AKTIN_PROPERTIES, os.stat(self.PATH_AKTIN_PROPERTIES).st_mtime_ns)
+        if key not in AktinPropertiesReader.CACHE:
+            dict_properties = {}
+            with open(self.PATH_AKTIN_PROPERTIES) as properties:
+                for line in properties:
+                    if '=' in line:
+                        key_prop, value = line.split('=', 1)
+                        dict_properties.setdefault(key_prop, value.strip())
+            AktinPropertiesReader.CACHE[key] = dict_properties
+        return AktinPropertiesReader.CACHE[key]
+
+
+class EncounterMatchingCache:
+    """
+    Helper class to share the encounter info extracted from the database and the
+    created pseudonyms between the imports of a P21BatchImporter. The import of p21
+    data changes neither the encounter mapping nor the billing ids in the database,
+    so each type of matching is extracted only once. A failed extraction is cached
+    as well and raised again.
+    """
+
+    def __init__(self):
+        self.ENCOUNTER_INFO = {}
+        self.PSEUDONYMS = {}
+
+    def get_encounter_info(self, key: str, extract: Callable):
+        if key not in self.ENCOUNTER_INFO:
+            try:
+                self.ENCOUNTER_INFO[key] = extract()
+            except ValueError as error:
+                self.ENCOUNTER_INFO[key] = error
+        if isinstance(self.ENCOUNTER_INFO[key], ValueError):
+            raise self.ENCOUNTER_INFO[key]
+        return self.ENCOUNTER_INFO[key]
+
+    def anonymize_list(self, anonymizer: OneWayAnonymizer, root: str, list_ext: list, salt: str) -> list:
+        """
+        Same as OneWayAnonymizer.anonymize_list(), but each id is hashed only once
+        """
+        dict_pseudonyms = self.PSEUDONYMS.setdefault((anonymizer.ALGORITHM, root, salt), {})
+        list_missing = [ext for ext in dict.fromkeys(list_ext) if ext not in dict_pseudonyms]
+        dict_pseudonyms.update(zip(list_missing, anonymizer.anonymize_list(root, list_missing, salt)))
+        return [dict_pseudonyms[ext] for ext in list_ext]
 
 
 class OneWayAnonymizer:
@@ -1044,7 +2705,11 @@ class TableHandler(DatabaseConnection, ABC):
         pass
 
     @abstractmethod
-    def upload_data(self, list_dicts: list):
+    def upload_data(self, facts: ObservationFactBuffer, dict_constants: dict):
+        pass
+
+    @abstractmethod
+    def upload_batches(self, batches: Iterable[ObservationFactBuffer], dict_constants: dict) -> int:
         pass
 
     @abstractmethod
@@ -1058,17 +2723,32 @@ class ObservationFactTableHandler(TableHandler):
     """
 
     def reflect_table(self):
-        self.TABLE = db.Table('observation_fact', db.MetaData(), autoload_with=self.ENGINE)
+        self.TABLE = self._get_reflected_table('observation_fact')
+
+    def upload_data(self, facts: ObservationFactBuffer, dict_constants: dict):
+        self.upload_batches([facts], dict_constants)
 
-    def upload_data(self, list_dicts: list):
+    def upload_batches(self, batches: Iterable[ObservationFactBuffer], dict_constants: dict) -> int:
+        """
+        Uploads all batches within one transaction. Each batch is sent as soon as it is
+        yielded, so the facts of a chunk are never held completely in memory.
+        Columns in dict_constants are the same for all rows and are set once as
+        values of the insert statement. Returns the number of uploaded facts
+        """
+        statement_insert = self.TABLE.insert().values(dict_constants)
+        num_facts = 0
         with self.open_connection() as conn:
             with conn.begin() as transaction:
                 try:
-                    conn.execute(self.TABLE.insert(), list_dicts)
+                    for facts in batches:
+                        if len(facts):
+                            conn.execute(statement_insert, facts.to_dicts())
+                            num_facts += len(facts)
                 except exc.SQLAlchemyError:
                     transaction.rollback()
                     traceback.print_exc()
                     raise SystemExit("Upload operation failed")
+        return num_facts
 
     def delete_data(self, identifier: str):
       sourcesystem = self.__get_sourcesystem_of_encounter(identifier)
@@ -1123,13 +2803,16 @@ class CSVObservationFactUploadManager(ABC):
     Uploads all valid encounter data of a given csv file as observation facts to i2b2crcdata.observation_fact.
     Needs a mapping table to map the unhashed ids of the csv file with the patient_num and encounter_num in
     database. Values for 'aufnahmedatum' are also needed as a default value for 'start_date' in i2b2 table
-    (see CSVObservationFactConverter.add_static_values_to_row_dict()).
+    (see CSVObservationFactConverter.add_encounter_values_to_row_dict()).
     """
     VERIFIER: CSVFileVerifier
     CONVERTER: CSVObservationFactConverter
+    SIZE_BATCH: int = 10000
 
-    def __init__(self, matched_encounter_info: pd.DataFrame):
+    def __init__(self, matched_encounter_info: pd.DataFrame, report: ImportStageReport = None):
         self.TABLEHANDLER: ObservationFactTableHandler = ObservationFactTableHandler()
+        self.REPORT = report if report is not None else ImportStageReport()
+        self.SIZE_BATCH = int(os.environ.get('p21_fact_batch_size', self.SIZE_BATCH))
         self.DF_MAPPING = matched_encounter_info
         if self.DF_MAPPING.empty:
             raise SystemExit('given encounter mapping dataframe is empty')
@@ -1137,102 +2820,458 @@ class CSVObservationFactUploadManager(ABC):
             raise SystemExit('invalid encounter mapping dataframe supplied')
 
     def upload_csv(self):
+      """
+      Reading, conversion and upload of the chunks are measured as separate stages
+      of the report, although the conversion of a chunk is interleaved with its upload
+      """
+      name_csv = self.VERIFIER.CSV_NAME
       self.TABLEHANDLER.reflect_table()
-      for chunk in pd.read_csv(
-          self.VERIFIER.PATH_CSV,
-          chunksize=self.VERIFIER.SIZE_CHUNKS,
-          sep=self.VERIFIER.CSV_SEPARATOR,
-          encoding=self.VERIFIER.get_csv_encoding(),
-          dtype=str,
-      ):
-        chunk = self._clear_chunk_from_invalid_data(chunk)
+      list_ids = self.DF_MAPPING['encounter_id'].tolist()
+      df_encounter_info = self._get_encounter_info()
+      for chunk in self.REPORT.measure_iterator('reading', self.VERIFIER.read_valid_chunks(list_ids), name_csv):
         if chunk.empty:
           continue
-        list_observation_fact_dicts = self._convert_chunk_to_uploadable_facts(
-            chunk
-        )
-        self.TABLEHANDLER.upload_data(list_observation_fact_dicts)
-
-    def _clear_chunk_from_invalid_data(self, chunk: pd.Series) -> pd.Series:
-        chunk = chunk[list(self.VERIFIER.DICT_COLUMN_PATTERN.keys())]
-        chunk = chunk[chunk['khinterneskennzeichen'].isin(self.DF_MAPPING['encounter_id'])]
-        chunk = chunk.fillna('')
-        for column in chunk.columns.values:
-            chunk = self.VERIFIER.clear_invalid_column_fields_in_chunk(chunk, column)
-        return chunk
+        time_start = time.perf_counter()
+        with self.REPORT.measure('conversion', name_csv) as stage:
+          stage['rows_in'] += len(chunk.index)
+          chunk = chunk.join(df_encounter_info, on='khinterneskennzeichen')
+          batches = self._convert_chunk_to_uploadable_fact_batches(chunk)
+        with self.REPORT.measure('upload', name_csv) as stage:
+          batches = self.REPORT.measure_iterator('conversion', batches, name_csv, 'facts')
+          num_facts = self.TABLEHANDLER.upload_batches(batches, self.CONVERTER.STATIC_COLUMNS)
+          stage['facts'] += num_facts
+        self.VERIFIER.PROGRESS.add_facts(num_facts)
+        self.VERIFIER.CHUNK_SIZER.record_write(len(chunk.index), num_facts, time.perf_counter() - time_start)
+
+    def _get_encounter_info(self) -> pd.DataFrame:
+        """
+        Returns encounter_num, patient_num and the admission date (in i2b2 format)
+        of each matched encounter, indexed by the encounter id of the csv files
+        """
+        df_mapping = self.DF_MAPPING.drop_duplicates('encounter_id').set_index('encounter_id')
+        return pd.DataFrame({'encounter_num': df_mapping['encounter_num'].astype(str),
+                             'patient_num': df_mapping['patient_num'].astype(str),
+                             'date_admission': self.CONVERTER.convert_dates_of_series(df_mapping['aufnahmedatum'])},
+                            index=df_mapping.index)
 
-    def _convert_chunk_to_uploadable_facts(self, chunk: pd.Series) -> list:
-        list_observation_fact_dicts = []
-        for row_csv in chunk.iterrows():
-            row_csv = row_csv[1]
-            list_converted_row = self.CONVERTER.create_observation_facts_from_row(row_csv)
-            list_converted_row = self._add_static_observation_facts(list_converted_row, row_csv['khinterneskennzeichen'])
-            list_observation_fact_dicts.extend(list_converted_row)
-        return list_observation_fact_dicts
-
-    def _add_static_observation_facts(self, list_facts: list, id_case: str) -> list:
-        row_case = self.DF_MAPPING.loc[self.DF_MAPPING['encounter_id'] == id_case]
-        num_enc = str(row_case['encounter_num'].values[0])
-        num_pat = str(row_case['patient_num'].values[0])
-        date_admission = row_case['aufnahmedatum'].values[0]
-        for index, row in enumerate(list_facts):
-            list_facts[index] = self.CONVERTER.add_static_values_to_row_dict(row, num_enc, num_pat, date_admission)
-        return list_facts
+    def _convert_chunk_to_uploadable_fact_batches(self, chunk: pd.DataFrame) -> Iterator[ObservationFactBuffer]:
+        return self.CONVERTER.iter_observation_fact_batches(chunk, self.SIZE_BATCH)
 
 
 class FALLObservationFactUploadManager(CSVObservationFactUploadManager):
     """
-    Overrides _convert_chunk_to_uploadable_facts() to check and delete all p21 data of an encounter
+    Overrides _convert_chunk_to_uploadable_fact_batches() to check and delete all p21 data of an encounter
     if it was already uploaded using this script.
     """
 
-    def __init__(self, df_mapping: pd.DataFrame, path_folder: str):
-        super().__init__(df_mapping)
+    def __init__(self, df_mapping: pd.DataFrame, path_folder: str, report: ImportStageReport = None):
+        super().__init__(df_mapping, report)
         self.VERIFIER = FALLVerifier(path_folder)
         self.CONVERTER = FALLObservationFactConverter()
         self.NUM_IMPORTS = 0
         self.NUM_UPDATES = 0
 
-    def _convert_chunk_to_uploadable_facts(self, chunk: pd.Series) -> list:
-        list_observation_fact_dicts = []
-        for row_csv in chunk.iterrows():
-            row_csv = row_csv[1]
-            num_enc = str(self.DF_MAPPING.loc[self.DF_MAPPING['encounter_id'] == row_csv['khinterneskennzeichen']]['encounter_num'].values[0])
-            if self.TABLEHANDLER.check_if_encounter_is_imported(num_enc):
-                self.TABLEHANDLER.delete_data(num_enc)
-                self.NUM_UPDATES += 1
-            else:
-                self.NUM_IMPORTS += 1
-            list_converted_row = self.CONVERTER.create_observation_facts_from_row(row_csv)
-            list_converted_row.extend(self.CONVERTER.create_script_rows())
-            list_converted_row = self._add_static_observation_facts(list_converted_row, row_csv['khinterneskennzeichen'])
-            list_observation_fact_dicts.extend(list_converted_row)
-        return list_observation_fact_dicts
+    def _convert_chunk_to_uploadable_fact_batches(self, chunk: pd.DataFrame) -> Iterator[ObservationFactBuffer]:
+        with self.REPORT.measure('check_and_delete', self.VERIFIER.CSV_NAME) as stage:
+            for num_enc in chunk['encounter_num']:
+                if self.TABLEHANDLER.check_if_encounter_is_imported(num_enc):
+                    self.TABLEHANDLER.delete_data(num_enc)
+                    self.NUM_UPDATES += 1
+                else:
+                    self.NUM_IMPORTS += 1
+            stage['rows_in'] += len(chunk.index)
+        return self.CONVERTER.iter_observation_fact_batches(chunk, self.SIZE_BATCH)
 
 
 class FABObservationFactUploadManager(CSVObservationFactUploadManager):
-    def __init__(self, df_mapping: pd.DataFrame, path_folder: str):
-        super().__init__(df_mapping)
+    def __init__(self, df_mapping: pd.DataFrame, path_folder: str, report: ImportStageReport = None):
+        super().__init__(df_mapping, report)
         self.VERIFIER = FABVerifier(path_folder)
         self.CONVERTER = FABObservationFactConverter()
 
 
 class ICDObservationFactUploadManager(CSVObservationFactUploadManager):
-    def __init__(self, df_mapping: pd.DataFrame, path_folder: str):
-        super().__init__(df_mapping)
+    def __init__(self, df_mapping: pd.DataFrame, path_folder: str, report: ImportStageReport = None):
+        super().__init__(df_mapping, report)
         self.VERIFIER = ICDVerifier(path_folder)
         self.CONVERTER = ICDObservationFactConverter()
 
 
 class OPSObservationFactUploadManager(CSVObservationFactUploadManager):
-    def __init__(self, df_mapping: pd.DataFrame, path_folder: str):
-        super().__init__(df_mapping)
+    def __init__(self, df_mapping: pd.DataFrame, path_folder: str, report: ImportStageReport = None):
+        super().__init__(df_mapping, report)
         self.VERIFIER = OPSVerifier(path_folder)
         self.CONVERTER = OPSObservationFactConverter()
 
 
+class StreamingCSVReader:
+    """
+    Pandas-free counterpart of CSVPreprocessor and CSVFileVerifier for the
+    LightweightImporter. The raw csv file is read with the csv module and the header
+    and value adjustments of the given CSVPreprocessor are applied on the fly, so the
+    csv file is never rewritten. Rows are checked by the same rules as
+    CSVFileVerifier.clear_invalid_column_fields_in_chunk().
+    """
+
+    def __init__(self, verifier: CSVFileVerifier, preprocessor: CSVPreprocessor):
+        self.VERIFIER = verifier
+        self.PREPROCESSOR = preprocessor
+        self.DICT_PATTERN = {column: re.compile(pattern) for column, pattern in verifier.DICT_COLUMN_PATTERN.items()}
+        self.SET_NA_VALUES = set(verifier.NA_VALUES)
+
+    def __open_csv(self):
+        return open(self.VERIFIER.PATH_CSV, newline='', encoding=self.VERIFIER.get_csv_encoding())
+
+    def read_header(self) -> list:
+        """
+        Returns the header like it is written by CSVPreprocessor.preprocess()
+        """
+        with self.__open_csv() as file_csv:
+            list_header = next(csv.reader(file_csv, delimiter=self.VERIFIER.CSV_SEPARATOR), [])
+        if list_header:
+            list_header[0] = list_header[0].lstrip('\ufeff')
+        list_header = [column if column else 'Unnamed: {0}'.format(i) for i, column in enumerate(list_header)]
+        header = self.PREPROCESSOR.CSV_SEPARATOR.join(self.deduplicate_column_names(list_header)).lower()
+        header = self.PREPROCESSOR._remove_dashes_from_header(header)
+        header = self.PREPROCESSOR._adjust_header(header)
+        return self.deduplicate_column_names(header.split(self.PREPROCESSOR.CSV_SEPARATOR))
+
+    @staticmethod
+    def deduplicate_column_names(list_columns: list) -> list:
+        """
+        Renames duplicate column names the same way as pd.read_csv() (X, X.1, X.2, ...)
+        """
+        dict_counts = {}
+        list_deduplicated = []
+        for column in list_columns:
+            count = dict_counts.get(column, 0)
+            while count > 0:
+                dict_counts[column] = count + 1
+                column = '{0}.{1}'.format(column, count)
+                count = dict_counts.get(column, 0)
+            list_deduplicated.append(column)
+            dict_counts[column] = count + 1
+        return list_deduplicated
+
+    def check_column_names(self):
+        self.VERIFIER.check_column_names(self.read_header())
+
+    def read_valid_rows(self, set_ids: set = None):
+        """
+        Yields all valid rows of the csv file as dicts with the columns of
+        DICT_COLUMN_PATTERN. If set_ids is given, only rows with these encounter ids
+        are returned.
+        """
+        list_header = self.read_header()
+        list_columns = list(self.DICT_PATTERN.keys())
+        with self.__open_csv() as file_csv:
+            reader = csv.reader(file_csv, delimiter=self.VERIFIER.CSV_SEPARATOR)
+            next(reader, None)
+            for record in reader:
+                if not record:
+                    continue
+                dict_record = dict(zip(list_header, record))
+                dict_row = {}
+                for column in list_columns:
+                    value = dict_record.get(column, '')
+                    dict_row[column] = '' if value in self.SET_NA_VALUES else value
+                dict_row = self.__clear_invalid_fields_in_row(self.PREPROCESSOR.adjust_row(dict_row))
+                if dict_row is None:
+                    continue
+                if set_ids is not None and dict_row['khinterneskennzeichen'] not in set_ids:
+                    continue
+                yield dict_row
+
+    def __clear_invalid_fields_in_row(self, dict_row: dict):
+        """
+        Returns None if a mandatory value is empty or invalid
+        """
+        for column, pattern in self.DICT_PATTERN.items():
+            value = dict_row[column]
+            if value and pattern.match(value):
+                continue
+            if column in self.VERIFIER.MANDATORY_COLUMN_VALUES:
+                return None
+            dict_row[column] = ''
+        return dict_row
+
+
+class PsycopgConnection:
+    """
+    Plain psycopg2 connection to the i2b2 database for the LightweightImporter. Uses
+    the same environment variables as DatabaseConnection, a SQLAlchemy url in
+    'p21_database_url' is passed to psycopg2 without its driver. The queries for the
+    encounter matching correspond to the ones of EncounterInfoExtractorWithBillingId
+    and EncounterInfoExtractorWithEncounterId.
+    """
+
+    QUERY_BILLING_ID = ("SELECT observation_fact.tval_char, observation_fact.encounter_num, observation_fact.patient_num "
+                        "FROM observation_fact JOIN patient_mapping ON observation_fact.patient_num = patient_mapping.patient_num "
+                        "LEFT OUTER JOIN optinout_patients ON patient_mapping.patient_ide = optinout_patients.pat_psn "
+                        "WHERE (optinout_patients.study_id != 'AKTIN' OR optinout_patients.pat_psn IS NULL) "
+                        "AND observation_fact.concept_cd = 'AKTIN:Fallkennzeichen'")
+    QUERY_ENCOUNTER_ID = ("SELECT encounter_mapping.encounter_ide, encounter_mapping.encounter_num, patient_mapping.patient_num "
+                          "FROM encounter_mapping JOIN patient_mapping ON encounter_mapping.patient_ide = patient_mapping.patient_ide "
+                          "LEFT OUTER JOIN optinout_patients ON patient_mapping.patient_ide = optinout_patients.pat_psn "
+                          "WHERE optinout_patients.study_id != 'AKTIN' OR optinout_patients.pat_psn IS NULL")
+
+    def __init__(self):
+        self.USERNAME = os.environ['username']
+        self.PASSWORD = os.environ['password']
+        self.I2B2_CONNECTION_URL = os.environ['connection-url']
+        url = os.environ.get('p21_database_url')
+        if url:
+            self.CONNECTION = psycopg2.connect(re.sub(r'^postgresql\+\w+://', 'postgresql://', url))
+        else:
+            pattern = r'jdbc:postgresql://(.*?)(\?searchPath=.*)?$'
+            connection = re.search(pattern, self.I2B2_CONNECTION_URL).group(1)
+            self.CONNECTION = psycopg2.connect(''.join(['postgresql://', connection]), user=self.USERNAME, password=self.PASSWORD)
+
+    def fetch_all(self, query: str, parameters: tuple = None) -> list:
+        with self.CONNECTION.cursor() as cursor, SQLStatementMonitor.measure(query, parameters, self) as list_counts:
+            cursor.execute(query, parameters)
+            list_rows = cursor.fetchall()
+            list_counts.append(len(list_rows))
+        self.CONNECTION.commit()
+        return list_rows
+
+    def extract_encounter_info(self, query: str) -> list:
+        list_rows = self.fetch_all(query)
+        if not list_rows:
+            raise ValueError("No entries for database query was found")
+        return list_rows
+
+    def close(self):
+        self.CONNECTION.close()
+
+
+class PsycopgObservationFactTableHandler:
+    """
+    Pandas- and SQLAlchemy-free counterpart of ObservationFactTableHandler for the
+    LightweightImporter
+    """
+
+    def __init__(self, connection: PsycopgConnection):
+        self.CONNECTION = connection
+
+    def upload_data(self, facts: ObservationFactBuffer, dict_constants: dict):
+        """
+        Columns in dict_constants are the same for all rows and are inserted as
+        literals of the values template instead of being sent for each row
+        """
+        conn = self.CONNECTION.CONNECTION
+        try:
+            with conn.cursor() as cursor:
+                statement, template = self.__create_insert_statement(cursor, list(facts.COLUMNS), dict_constants)
+                with SQLStatementMonitor.measure(statement) as list_counts:
+                    psycopg2_extras.execute_values(cursor, statement, list(facts.iter_rows()), template=template)
+                    list_counts.append(len(facts))
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+            traceback.print_exc()
+            raise SystemExit("Upload operation failed")
+
+    @staticmethod
+    def __create_insert_statement(cursor, columns: list, dict_constants: dict) -> tuple:
+        statement = 'INSERT INTO observation_fact ({0}) VALUES %s'.format(', '.join(columns + list(dict_constants.keys())))
+        literals = cursor.mogrify(', '.join(['%s'] * len(dict_constants)), tuple(dict_constants.values())).decode()
+        placeholders = ['%s'] * len(columns) + [literals.replace('%', '%%')]
+        return statement, '({0})'.format(', '.join(placeholders))
+
+    def delete_data(self, identifier: str):
+        sourcesystem = self.__get_sourcesystem_of_encounter(identifier)
+        if self.__is_sourcesystem_valid(sourcesystem):
+            conn = self.CONNECTION.CONNECTION
+            try:
+                statement = 'DELETE FROM observation_fact WHERE encounter_num = %s AND sourcesystem_cd = %s'
+                with conn.cursor() as cursor, SQLStatementMonitor.measure(statement) as list_counts:
+                    cursor.execute(statement, (str(identifier), sourcesystem[0][0]))
+                    list_counts.append(max(cursor.rowcount, 0))
+                conn.commit()
+            except psycopg2.Error:
+                conn.rollback()
+                traceback.print_exc()
+                raise SystemExit("delete operation for encounter failed")
+
+    def check_if_encounter_is_imported(self, num_enc: str) -> bool:
+        sourcesystem = self.__get_sourcesystem_of_encounter(num_enc)
+        return self.__is_sourcesystem_valid(sourcesystem)
+
+    def __get_sourcesystem_of_encounter(self, num_enc: str) -> list:
+        query = ("SELECT sourcesystem_cd FROM observation_fact WHERE encounter_num = %s AND concept_cd = 'P21:SCRIPT' "
+                 "AND modifier_cd = 'scriptId' AND provider_id = 'P21'")
+        return self.CONNECTION.fetch_all(query, (str(num_enc),))
+
+    @staticmethod
+    def __is_sourcesystem_valid(sourcesystem: list) -> bool:
+        if sourcesystem:
+            if len(sourcesystem) != 1:
+                raise SystemExit('invalid number of sourcesystems for encounter found')
+            return True
+        return False
+
+
+class LightweightImporter:
+    """
+    Streaming engine for small imports, which implements the preprocessing,
+    verification, matching and upload steps of P21Importer with the csv module and
+    plain psycopg2 (see StreamingCSVReader and PsycopgObservationFactTableHandler).
+    Neither pandas nor SQLAlchemy is loaded. Uses the same converters as the
+    CSVObservationFactUploadManager, so the same observation facts are created.
+    """
+
+    LIST_CSV_CLASSES = [(FALLVerifier, FALLPreprocessor, FALLObservationFactConverter),
+                        (FABVerifier, FABPreprocessor, FABObservationFactConverter),
+                        (ICDVerifier, ICDPreprocessor, ICDObservationFactConverter),
+                        (OPSVerifier, OPSPreprocessor, OPSObservationFactConverter)]
+
+    def __init__(self, path_folder: str, cache: EncounterMatchingCache = None, report: ImportStageReport = None):
+        self.PATH_FOLDER = path_folder
+        self.CACHE = cache if cache is not None else EncounterMatchingCache()
+        self.REPORT = report if report is not None else ImportStageReport()
+        self.READERS = [StreamingCSVReader(v(path_folder), p(path_folder)) for v, p, _ in self.LIST_CSV_CLASSES]
+        self.READER_FALL = self.READERS[0]
+        self.SIZE_BATCH = int(os.environ.get('p21_fact_batch_size', CSVObservationFactUploadManager.SIZE_BATCH))
+        self.NUM_IMPORTS = 0
+        self.NUM_UPDATES = 0
+
+    @staticmethod
+    def count_csv_rows(path_folder: str) -> int:
+        """
+        Counts the records of all importable csv files in given folder without their headers
+        """
+        num_rows = 0
+        for verifier, _, _ in LightweightImporter.LIST_CSV_CLASSES:
+            path_csv = os.path.join(path_folder, verifier.CSV_NAME)
+            if os.path.isfile(path_csv):
+                num_rows += max(MemoryMappedCSVFile(path_csv).count_records() - 1, 0)
+        return num_rows
+
+    def check_csv_files(self):
+        for reader in self.READERS:
+            if reader.VERIFIER.is_csv_in_folder():
+                reader.check_column_names()
+
+    def count_total_encounter(self) -> int:
+        return self.READER_FALL.VERIFIER.count_total_encounter()
+
+    def get_valid_encounter_with_admission_dates(self) -> dict:
+        """
+        Same as FALLVerifier.get_unique_ids_of_valid_encounter_with_admission_dates()
+        """
+        dict_admission_dates = {row['khinterneskennzeichen']: row['aufnahmedatum'] for row in self.READER_FALL.read_valid_rows()}
+        if not dict_admission_dates:
+            raise SystemExit('no valid encounter found in fall.csv')
+        return dict_admission_dates
+
+    def get_matched_encounters(self, list_ids: list) -> dict:
+        """
+        Same as DatabaseEncounterMatcher.get_matched_df(), but returns a dict with
+        { encounter_id : list of (encounter_num, patient_num) }
+        """
+        connection = PsycopgConnection()
+        try:
+            try:
+                return self.__match_encounters(connection, list_ids, connection.QUERY_BILLING_ID, 'cda.billing.root.preset')
+            except ValueError:
+                print("Matching by billing id failed. trying matching by encounter id...")
+                return self.__match_encounters(connection, list_ids, connection.QUERY_ENCOUNTER_ID, 'cda.encounter.root.preset')
+        finally:
+            connection.close()
+
+    def __match_encounters(self, connection: PsycopgConnection, list_ids: list, query: str, property_root: str) -> dict:
+        reader = AktinPropertiesReader()
+        anonymizer = OneWayAnonymizer(reader.get_property('pseudonym.algorithm'))
+        salt = reader.get_property('pseudonym.salt')
+        root = reader.get_property(property_root)
+        with self.REPORT.measure('matching_extract') as stage:
+            dict_db = self.CACHE.get_encounter_info(query, lambda: self.__group_encounter_info(connection.extract_encounter_info(query)))
+            stage['rows_out'] += len(dict_db)
+        with self.REPORT.measure('matching_hashing') as stage:
+            list_ide = self.CACHE.anonymize_list(anonymizer, root, list_ids, salt)
+            stage['rows_in'] += len(list_ids)
+        dict_mapping = {id_csv: dict_db[ide] for id_csv, ide in zip(list_ids, list_ide) if ide in dict_db}
+        if not dict_mapping:
+            raise SystemExit('no encounter could be matched with database')
+        return dict_mapping
+
+    @staticmethod
+    def __group_encounter_info(list_rows: list) -> dict:
+        dict_db = {}
+        for match_id, num_enc, num_pat in list_rows:
+            dict_db.setdefault(match_id, []).append((str(num_enc), str(num_pat)))
+        return dict_db
+
+    def upload_csv_files(self, dict_mapping: dict, dict_admission_dates: dict):
+        connection = PsycopgConnection()
+        try:
+            handler = PsycopgObservationFactTableHandler(connection)
+            for reader, (_, _, converter_class) in zip(self.READERS, self.LIST_CSV_CLASSES):
+                if reader.VERIFIER.is_csv_in_folder():
+                    self.__upload_csv(reader, converter_class(), handler, dict_mapping, dict_admission_dates)
+        finally:
+            connection.close()
+
+    def __upload_csv(self, reader: StreamingCSVReader, converter: CSVObservationFactConverter, handler: PsycopgObservationFactTableHandler,
+                     dict_mapping: dict, dict_admission_dates: dict):
+        is_fall = isinstance(converter, FALLObservationFactConverter)
+        name_csv = reader.VERIFIER.CSV_NAME
+        facts = ObservationFactBuffer()
+        with self.REPORT.measure('conversion', name_csv) as stage_conversion:
+            rows = reader.read_valid_rows(set(dict_mapping.keys()))
+            for row in self.REPORT.measure_iterator('reading', rows, name_csv, get_size=lambda _: 1):
+                id_case = row['khinterneskennzeichen']
+                num_enc, num_pat = dict_mapping[id_case][0]
+                list_converted_row = converter.create_observation_facts_from_row(row)
+                if is_fall:
+                    with self.REPORT.measure('check_and_delete', name_csv) as stage:
+                        if handler.check_if_encounter_is_imported(num_enc):
+                            handler.delete_data(num_enc)
+                            self.NUM_UPDATES += 1
+                        else:
+                            self.NUM_IMPORTS += 1
+                        stage['rows_in'] += 1
+                    list_converted_row.extend(converter.create_script_rows())
+                date_admission = dict_admission_dates[id_case]
+                for fact in list_converted_row:
+                    facts.append_fact(converter.add_encounter_values_to_row_dict(fact, num_enc, num_pat, date_admission))
+                stage_conversion['rows_in'] += 1
+                stage_conversion['facts'] += len(list_converted_row)
+                if len(facts) >= self.SIZE_BATCH:
+                    self.__upload_facts(handler, facts, converter, name_csv)
+                    facts = ObservationFactBuffer()
+            if len(facts):
+                self.__upload_facts(handler, facts, converter, name_csv)
+
+    def __upload_facts(self, handler: PsycopgObservationFactTableHandler, facts: ObservationFactBuffer, converter: CSVObservationFactConverter, name_csv: str):
+        with self.REPORT.measure('upload', name_csv) as stage:
+            handler.upload_data(facts, converter.STATIC_COLUMNS)
+            stage['facts'] += len(facts)
+
+
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
+    parser = argparse.ArgumentParser(description='Verifies and imports p21 data into the AKTIN DWH')
+    parser.add_argument('list_path_zip', nargs='*', metavar='path_zip', help='zip file(s) with the p21 csv files')
+    parser.add_argument('--worker', metavar='path_socket', help='run as warm import worker listening on given unix socket')
+    parser.add_argument('--check-only', action='store_true', help='only check the zip file(s) and the column names of the csv files')
+    parser.add_argument('--profile', metavar='path_folder', help='profile each stage of the import and write the results to given folder')
+    args = parser.parse_args()
+    if args.profile:
+        os.environ['p21_profile_dir'] = args.profile
+    if args.worker:
+        P21ImportWorker(args.worker).serve_forever()
+    elif not args.list_path_zip:
         raise SystemExit('Sys.argv don\'t match')
-    p21 = P21Importer(sys.argv[1])
-    p21.import_file()
+    elif args.check_only:
+        for path_zip in args.list_path_zip:
+            P21Importer(path_zip).check_file()
+    elif len(args.list_path_zip) == 1:
+        path_socket = os.environ.get('p21_worker_socket')
+        code_exit = P21ImportWorkerClient(path_socket).submit(args.list_path_zip[0]) if path_socket else None
+        if code_exit is not None:
+            sys.exit(code_exit)
+        p21 = P21Importer(args.list_path_zip[0])
+        p21.import_file()
+    elif not P21BatchImporter(args.list_path_zip).import_files():
+        raise SystemExit('import of at least one zip file failed')
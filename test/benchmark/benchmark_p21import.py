@@ -0,0 +1,209 @@
+"""
+Scaling benchmark of the pandas engine of P21Importer. For each size, a zip file with
+the given number of encounters is generated with test/resources/generate_p21_data.py
+and imported into a local sqlite database, which stands in for the i2b2 database (see
+'p21_database_url'). Wall time and throughput of each stage are taken from the import
+report and compared against baseline.json. A stage fails the comparison, if it is slower
+than its baseline by more than the tolerance. Stages faster than SECONDS_MIN are not
+compared, as they are dominated by noise. For consecutive sizes, the growth exponent
+of each stage is printed (1 for linear, 2 for quadratic stages).
+
+Run from the root of the repository:
+  PYTHONPATH=. python test/benchmark/benchmark_p21import.py --sizes 1000 10000
+  PYTHONPATH=. python test/benchmark/benchmark_p21import.py --update-baseline
+
+baseline.json depends on the machine and is therefore not part of the repository. It has
+to be recorded with --update-baseline on the machine the benchmark is run on, preferably
+a host with several cores, as the csv files are only preprocessed in a process pool with
+more than one core. Each size of the baseline stores the machine it was recorded on
+(host, platform, python version and number of cores) and is only compared on the same
+machine.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+
+from src.p21import import AktinPropertiesReader, DatabaseConnection, OneWayAnonymizer, P21Importer
+
+PATH_BENCHMARK = os.path.dirname(os.path.abspath(__file__))
+PATH_RESOURCES = os.path.join(os.path.dirname(PATH_BENCHMARK), 'resources')
+PATH_BASELINE = os.path.join(PATH_BENCHMARK, 'baseline.json')
+sys.path.insert(0, PATH_RESOURCES)
+import generate_p21_data  # noqa: E402
+
+SIZES = [1000, 10000, 100000, 1000000]
+TOLERANCE = 0.25
+SECONDS_MIN = 0.1
+FRACTION_UPDATES = 0.1
+
+SCHEMA_DATABASE = '''
+CREATE TABLE observation_fact (encounter_num INTEGER, patient_num INTEGER, concept_cd TEXT, provider_id TEXT, start_date TEXT, modifier_cd TEXT,
+                               instance_num INTEGER, valtype_cd TEXT, tval_char TEXT, nval_num NUMERIC, valueflag_cd TEXT, quantity_num NUMERIC,
+                               units_cd TEXT, end_date TEXT, location_cd TEXT, observation_blob TEXT, confidence_num NUMERIC, update_date TEXT,
+                               download_date TEXT, import_date TEXT, sourcesystem_cd TEXT, upload_id INTEGER, text_search_index INTEGER);
+CREATE TABLE patient_mapping (patient_ide TEXT, patient_num INTEGER);
+CREATE TABLE encounter_mapping (encounter_ide TEXT, encounter_num INTEGER, patient_ide TEXT);
+CREATE TABLE optinout_patients (study_id TEXT, pat_psn TEXT);
+CREATE INDEX of_idx_encounter ON observation_fact (encounter_num);
+'''
+
+
+def set_environment():
+    os.environ.update({'username': 'benchmark', 'password': 'benchmark', 'connection-url': 'jdbc:postgresql://localhost:5432/i2b2',
+                       'uuid': 'benchmark', 'script_id': 'p21import', 'script_version': '1.0',
+                       'path_aktin_properties': os.path.join(PATH_RESOURCES, 'aktin.properties'),
+                       'p21_lightweight_threshold': '0', 'p21_progress_interval': '0'})
+
+
+def create_database(path_db: str, num_encounters: int):
+    """
+    Every encounter of the zip file can be matched by its billing id. FRACTION_UPDATES of
+    the encounters were already imported by an older version of the script and are updated
+    """
+    reader = AktinPropertiesReader()
+    anonymizer = OneWayAnonymizer(reader.get_property('pseudonym.algorithm'))
+    root = reader.get_property('cda.billing.root.preset')
+    salt = reader.get_property('pseudonym.salt')
+    list_ids = [str(id_encounter) for id_encounter in range(1000, 1000 + num_encounters)]
+    list_hashes = anonymizer.anonymize_list(root, list_ids, salt)
+    num_updates = int(num_encounters * FRACTION_UPDATES)
+    with contextlib.closing(sqlite3.connect(path_db)) as connection:
+        connection.executescript(SCHEMA_DATABASE)
+        connection.executemany('INSERT INTO patient_mapping VALUES (?, ?)', ((f'patient{i}', i) for i in range(num_encounters)))
+        connection.executemany("INSERT INTO observation_fact (encounter_num, patient_num, concept_cd, tval_char, provider_id, modifier_cd, instance_num, start_date) "
+                               "VALUES (?, ?, 'AKTIN:Fallkennzeichen', ?, '@', '@', 1, '2020-01-01')",
+                               ((i, i, hash_id) for i, hash_id in enumerate(list_hashes)))
+        connection.executemany("INSERT INTO observation_fact (encounter_num, patient_num, concept_cd, modifier_cd, provider_id, sourcesystem_cd, instance_num, start_date) "
+                               "VALUES (?, ?, 'P21:SCRIPT', 'scriptId', 'P21', 'p21import_old', 1, '2020-01-01')",
+                               ((i, i) for i in range(num_updates)))
+        connection.commit()
+
+
+def run_benchmark(num_encounters: int, path_folder: str) -> dict:
+    path_zip = os.path.join(path_folder, 'p21_{0}.zip'.format(num_encounters))
+    path_db = os.path.join(path_folder, 'p21_{0}.sqlite'.format(num_encounters))
+    path_report = os.path.join(path_folder, 'report_{0}.jsonl'.format(num_encounters))
+    generate_p21_data.write_p21_zip(path_zip, num_encounters)
+    create_database(path_db, num_encounters)
+    os.environ['p21_database_url'] = 'sqlite:///{0}'.format(path_db)
+    os.environ['p21_report_path'] = path_report
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            P21Importer(path_zip).import_file()
+    finally:
+        DatabaseConnection.dispose_engines()
+        os.remove(path_zip)
+        os.remove(path_db)
+    with open(path_report, encoding='utf-8') as file_report:
+        dict_report = json.loads(file_report.readline())
+    return summarize_report(dict_report)
+
+
+def summarize_report(dict_report: dict) -> dict:
+    num_facts = sum(dict_report['facts'].values())
+    dict_stages = {}
+    for stage in dict_report['stages']:
+        name_stage = stage['stage'] if stage['file'] is None else ':'.join([stage['stage'], stage['file']])
+        dict_stages[name_stage] = {key: stage[key] for key in ['seconds_wall', 'rows_per_second', 'facts_per_second'] if key in stage}
+    return {'seconds_wall': dict_report['seconds_wall'], 'facts': num_facts, 'facts_per_second': round(num_facts / dict_report['seconds_wall'], 1),
+            'peak_rss_mb': dict_report['peak_rss_mb'], 'stages': dict_stages}
+
+
+def get_machine() -> dict:
+    return {'node': platform.node(), 'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()}
+
+
+def compare_with_baseline(dict_results: dict, dict_baseline: dict, tolerance: float) -> list:
+    """
+    Sizes of the baseline, which were recorded on another machine, are not compared
+    """
+    list_regressions = []
+    for size, result in dict_results.items():
+        baseline = dict_baseline.get(size)
+        if baseline is None:
+            continue
+        if baseline.get('machine') != get_machine():
+            print('{0} encounters: baseline was recorded on another machine ({1}), not compared'.format(size, baseline.get('machine')))
+            continue
+        list_pairs = [('total', result['seconds_wall'], baseline['seconds_wall'])]
+        list_pairs.extend((name, stage['seconds_wall'], baseline['stages'][name]['seconds_wall'])
+                          for name, stage in result['stages'].items() if name in baseline['stages'])
+        for name, seconds, seconds_baseline in list_pairs:
+            if seconds_baseline >= SECONDS_MIN and seconds > seconds_baseline * (1 + tolerance):
+                list_regressions.append('{0} encounters, {1}: {2:.2f} s instead of {3:.2f} s (+{4:.0%})'.format(
+                    size, name, seconds, seconds_baseline, seconds / seconds_baseline - 1))
+    return list_regressions
+
+
+def print_results(dict_results: dict):
+    list_sizes = list(dict_results.keys())
+    for size in list_sizes:
+        result = dict_results[size]
+        print('{0} encounters: {1:.2f} s, {2} facts, {3:.0f} facts/s, peak rss {4} MB'.format(
+            size, result['seconds_wall'], result['facts'], result['facts_per_second'], result['peak_rss_mb']))
+    for size_small, size_large in zip(list_sizes, list_sizes[1:]):
+        print('growth exponent of stages from {0} to {1} encounters:'.format(size_small, size_large))
+        stages_small, stages_large = dict_results[size_small]['stages'], dict_results[size_large]['stages']
+        for name, stage in stages_large.items():
+            if name in stages_small and stages_small[name]['seconds_wall'] > 0 and stage['seconds_wall'] >= SECONDS_MIN:
+                exponent = math.log(stage['seconds_wall'] / stages_small[name]['seconds_wall']) / math.log(int(size_large) / int(size_small))
+                print('  {0:<45} {1:>8.2f} s  {2:>5.2f}'.format(name, stage['seconds_wall'], exponent))
+
+
+def write_baseline(dict_results: dict):
+    """
+    Each size of the baseline keeps the machine and the date it was recorded on. Sizes
+    recorded on another machine are dropped, so that they are not mixed with the results
+    of this machine
+    """
+    dict_baseline = {}
+    if os.path.isfile(PATH_BASELINE):
+        with open(PATH_BASELINE, encoding='utf-8') as file_baseline:
+            dict_baseline = json.load(file_baseline)
+    machine = get_machine()
+    dict_baseline = {size: baseline for size, baseline in dict_baseline.items() if baseline.get('machine') == machine}
+    for size, result in dict_results.items():
+        dict_baseline[size] = {**result, 'machine': machine, 'date': time.strftime('%Y-%m-%d')}
+    with open(PATH_BASELINE, 'w', encoding='utf-8') as file_baseline:
+        json.dump(dict_baseline, file_baseline, indent=2, sort_keys=True)
+        file_baseline.write('\n')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scaling benchmark of the p21 import')
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES, help='numbers of encounters to benchmark')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='allowed slowdown of a stage relative to the baseline')
+    parser.add_argument('--update-baseline', action='store_true', help='store the results as new baseline instead of comparing them')
+    args = parser.parse_args()
+    set_environment()
+    dict_results = {}
+    with tempfile.TemporaryDirectory() as path_tmp:
+        for size in args.sizes:
+            dict_results[str(size)] = run_benchmark(size, path_tmp)
+    print_results(dict_results)
+    if args.update_baseline:
+        if os.cpu_count() == 1:
+            print('warning: recording the baseline on a single core, the process pool of the preprocessing is not measured')
+        write_baseline(dict_results)
+        print('baseline updated')
+    elif not os.path.isfile(PATH_BASELINE):
+        raise SystemExit('no baseline found. run with --update-baseline first')
+    else:
+        with open(PATH_BASELINE, encoding='utf-8') as file_baseline:
+            dict_baseline = json.load(file_baseline)
+        if not any(dict_baseline.get(size, {}).get('machine') == get_machine() for size in dict_results):
+            raise SystemExit('no baseline of this machine found for the given sizes. run with --update-baseline first')
+        list_regressions = compare_with_baseline(dict_results, dict_baseline, args.tolerance)
+        for regression in list_regressions:
+            print('regression: ' + regression)
+        if list_regressions:
+            raise SystemExit(1)
+        print('no regression against baseline')
@@ -0,0 +1,234 @@
+"""
+Peak memory regression test of the stages of the pandas engine of P21Importer. A zip
+file with the given number of encounters is generated with
+test/resources/generate_p21_data.py and each stage (preprocessing, verification,
+matching, conversion, upload) is run in a fresh process against a local sqlite database
+(see benchmark_p21import.py). The stages before it are run in the same process as setup.
+
+Each stage is run twice: once to measure the growth of the anonymous resident set size
+(sampled, as the peak RSS of the process includes the pages of memory-mapped csv
+files) and once with tracemalloc to measure the peak of traced memory. tracemalloc
+does not see memory allocated by pyarrow (like the string columns of pandas 3), which
+is covered by the RSS. Both are compared against budgets, which grow with the rows per
+chunk (p21_chunk_size_max is pinned to --size-chunks) and not with the size of the csv
+files. Stages which keep one entry per encounter by design (the valid ids, the
+encounter mapping) get an additional budget per encounter. A stage holding a whole csv
+file in memory exceeds its budget from about 50k encounters on.
+
+The stages reading the csv files are measured with each of the given csv backends
+(see 'p21_csv_backend'). Preprocessing does not depend on the backend and is only
+measured once.
+
+Run from the root of the repository:
+  PYTHONPATH=. python test/benchmark/memory_benchmark_p21import.py [--encounters 100000] [--size-chunks 10000] [--stages preprocessing upload] [--backends arrow]
+"""
+import argparse
+import gc
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import tracemalloc
+import zipfile
+from collections.abc import Callable
+
+import pandas as pd
+
+from src.p21import import (CSVReader, DatabaseConnection, DatabaseEncounterMatcher, DatabaseExtractor, EncounterInfoExtractorWithBillingId,
+                           FABObservationFactUploadManager, FABPreprocessor, FALLObservationFactUploadManager, FALLPreprocessor, FALLVerifier,
+                           ICDObservationFactUploadManager, ICDPreprocessor, ObservationFactStaticColumns, OPSObservationFactUploadManager,
+                           OPSPreprocessor)
+
+PATH_BENCHMARK = os.path.dirname(os.path.abspath(__file__))
+PATH_RESOURCES = os.path.join(os.path.dirname(PATH_BENCHMARK), 'resources')
+sys.path.insert(0, PATH_RESOURCES)
+sys.path.insert(0, PATH_BENCHMARK)
+import generate_p21_data  # noqa: E402
+from benchmark_p21import import create_database, set_environment  # noqa: E402
+
+NUM_ENCOUNTERS = 100000
+SIZE_CHUNKS = 10000
+SEED = 42
+SECONDS_SAMPLING = 0.005
+BACKENDS = ['pandas', 'arrow']
+PREPROCESSORS = [FALLPreprocessor, FABPreprocessor, ICDPreprocessor, OPSPreprocessor]
+UPLOADERS = [FALLObservationFactUploadManager, FABObservationFactUploadManager, ICDObservationFactUploadManager, OPSObservationFactUploadManager]
+
+# stage -> (MB base, KB per row of a chunk, bytes per encounter)
+BUDGETS_RSS = {
+    'preprocessing': (15, 3, 0),
+    'verification': (10, 1, 500),
+    'matching': (10, 0, 1500),
+    'conversion': (15, 1, 1500),
+    'upload': (20, 2, 1000),
+}
+BUDGETS_TRACED = {
+    'preprocessing': (5, 1, 0),
+    'verification': (5, 1, 400),
+    'matching': (15, 0, 800),
+    'conversion': (10, 1, 600),
+    'upload': (15, 1, 800),
+}
+
+
+def get_budget_mb(budget: tuple, size_chunks: int, num_encounters: int) -> float:
+    mb_base, kb_per_row, bytes_per_encounter = budget
+    return mb_base + kb_per_row * size_chunks / 1024 + bytes_per_encounter * num_encounters / 1024 / 1024
+
+
+def get_anonymous_rss_mb() -> float:
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1]) / 1024
+    raise SystemExit('RssAnon not found in /proc/self/status')
+
+
+def measure_peak_anonymous_rss_mb(function: Callable) -> float:
+    """
+    Samples the anonymous RSS every SECONDS_SAMPLING while function runs and returns
+    its growth. Pages of memory-mapped csv files are part of the RSS as well, but
+    they can be dropped by the kernel at any time and are not counted
+    """
+    rss_start = get_anonymous_rss_mb()
+    list_peak = [rss_start]
+    is_done = threading.Event()
+
+    def sample():
+        while not is_done.wait(SECONDS_SAMPLING):
+            list_peak[0] = max(list_peak[0], get_anonymous_rss_mb())
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        function()
+    finally:
+        is_done.set()
+        sampler.join()
+    return max(list_peak[0], get_anonymous_rss_mb()) - rss_start
+
+
+def create_test_folder(path_folder: str, num_encounters: int) -> str:
+    path_zip = os.path.join(path_folder, 'p21.zip')
+    generate_p21_data.write_p21_zip(path_zip, num_encounters, SEED)
+    path_raw = os.path.join(path_folder, 'raw')
+    with zipfile.ZipFile(path_zip) as file_zip:
+        for name in file_zip.namelist():
+            file_zip.extract(name, path_raw)
+            os.rename(os.path.join(path_raw, name), os.path.join(path_raw, name.lower()))
+    os.remove(path_zip)
+    return path_raw
+
+
+def get_mapping(path_folder: str) -> pd.DataFrame:
+    verifier = FALLVerifier(path_folder)
+    list_ids = verifier.get_unique_ids_of_valid_encounter()
+    df_mapping = DatabaseEncounterMatcher(EncounterInfoExtractorWithBillingId()).get_matched_df(list_ids)
+    dict_dates = verifier.get_unique_ids_of_valid_encounter_with_admission_dates()
+    df_dates = pd.DataFrame({'encounter_id': list(dict_dates.keys()), 'aufnahmedatum': list(dict_dates.values())})
+    return pd.merge(df_mapping, df_dates, on=['encounter_id'])
+
+
+def setup_stage(stage: str, path_raw: str, path_work: str, num_encounters: int):
+    """
+    Runs the stages before the given one and returns the function running the stage
+    """
+    shutil.copytree(path_raw, path_work)
+    if stage == 'preprocessing':
+        return lambda: [preprocessor(path_work).preprocess() for preprocessor in PREPROCESSORS]
+    for preprocessor in PREPROCESSORS:
+        preprocessor(path_work).preprocess()
+    if stage == 'verification':
+        verifier = FALLVerifier(path_work)
+        return lambda: (verifier.get_unique_ids_of_valid_encounter(), verifier.get_unique_ids_of_valid_encounter_with_admission_dates(),
+                        verifier.count_total_encounter())
+    path_db = os.path.join(os.path.dirname(path_work), 'p21.sqlite')
+    create_database(path_db, num_encounters)
+    os.environ['p21_database_url'] = 'sqlite:///{0}'.format(path_db)
+    if stage == 'matching':
+        list_ids = FALLVerifier(path_work).get_unique_ids_of_valid_encounter()
+        return lambda: DatabaseEncounterMatcher(EncounterInfoExtractorWithBillingId()).get_matched_df(list_ids)
+    df_mapping = get_mapping(path_work)
+    if stage == 'conversion':
+        return lambda: [convert_csv(uploader(df_mapping, path_work)) for uploader in UPLOADERS]
+    if stage == 'upload':
+        return lambda: [uploader(df_mapping, path_work).upload_csv() for uploader in UPLOADERS]
+    raise SystemExit('unknown stage {0}'.format(stage))
+
+
+def convert_csv(uploader) -> int:
+    """
+    Converts all valid rows of the csv file of the uploader into observation facts
+    without uploading them
+    """
+    num_facts = 0
+    list_ids = uploader.DF_MAPPING['encounter_id'].tolist()
+    df_encounter_info = uploader._get_encounter_info()
+    for chunk in uploader.VERIFIER.read_valid_chunks(list_ids):
+        chunk = chunk.join(df_encounter_info, on='khinterneskennzeichen')
+        for batch in uploader.CONVERTER.iter_observation_fact_batches(chunk, uploader.SIZE_BATCH):
+            num_facts += len(batch)
+    return num_facts
+
+
+def measure_stage(stage: str, backend: str, path_raw: str, path_work: str, num_encounters: int, size_chunks: int, is_traced: bool) -> float:
+    """
+    Runs in a fresh process. Returns the peak memory of the stage in MB
+    """
+    set_environment()
+    os.environ.update({'p21_chunk_size_max': str(size_chunks), 'p21_chunk_size_min': str(min(size_chunks, 1000)), 'p21_csv_backend': backend})
+    CSVReader.SIZE_CHUNKS = DatabaseExtractor.SIZE_CHUNKS = size_chunks
+    ObservationFactStaticColumns.begin_import()
+    run_stage = setup_stage(stage, path_raw, path_work, num_encounters)
+    gc.collect()
+    if is_traced:
+        tracemalloc.start()
+        run_stage()
+        _, size_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        DatabaseConnection.dispose_engines()
+        return size_peak / 1024 / 1024
+    mb_peak = measure_peak_anonymous_rss_mb(run_stage)
+    DatabaseConnection.dispose_engines()
+    return mb_peak
+
+
+def run_stage_in_process(stage: str, backend: str, path_raw: str, path_folder: str, num_encounters: int, size_chunks: int, is_traced: bool) -> float:
+    path_work = tempfile.mkdtemp(dir=path_folder)
+    os.rmdir(path_work)
+    try:
+        with multiprocessing.get_context('spawn').Pool(1) as pool:
+            return pool.apply(measure_stage, (stage, backend, path_raw, os.path.join(path_work, 'csv'), num_encounters, size_chunks, is_traced))
+    finally:
+        shutil.rmtree(path_work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Peak memory regression test of the stages of the p21 import')
+    parser.add_argument('--encounters', type=int, default=NUM_ENCOUNTERS, help='number of encounters of the generated data')
+    parser.add_argument('--size-chunks', type=int, default=SIZE_CHUNKS, help='rows per chunk, the budgets are scaled by it')
+    parser.add_argument('--stages', nargs='+', default=list(BUDGETS_RSS.keys()), choices=list(BUDGETS_RSS.keys()), help='stages to measure')
+    parser.add_argument('--backends', nargs='+', default=BACKENDS, choices=BACKENDS, help='csv backends to read the csv files with')
+    args = parser.parse_args()
+    set_environment()
+    list_violations = []
+    with tempfile.TemporaryDirectory() as path_tmp:
+        path_raw = create_test_folder(path_tmp, args.encounters)
+        print('{0:<23} {1:>10} {2:>10} {3:>10} {4:>10}'.format('stage', 'rss MB', 'budget', 'traced MB', 'budget'))
+        for stage in args.stages:
+            for backend in args.backends if stage != 'preprocessing' else args.backends[:1]:
+                name = '{0} ({1})'.format(stage, backend) if stage != 'preprocessing' else stage
+                mb_rss = run_stage_in_process(stage, backend, path_raw, path_tmp, args.encounters, args.size_chunks, False)
+                mb_traced = run_stage_in_process(stage, backend, path_raw, path_tmp, args.encounters, args.size_chunks, True)
+                budget_rss = get_budget_mb(BUDGETS_RSS[stage], args.size_chunks, args.encounters)
+                budget_traced = get_budget_mb(BUDGETS_TRACED[stage], args.size_chunks, args.encounters)
+                print('{0:<23} {1:>10.1f} {2:>10.1f} {3:>10.1f} {4:>10.1f}'.format(name, mb_rss, budget_rss, mb_traced, budget_traced))
+                for name_value, value, budget in [('peak rss', mb_rss, budget_rss), ('traced peak', mb_traced, budget_traced)]:
+                    if value > budget:
+                        list_violations.append('{0}: {1} of {2:.1f} MB exceeds budget of {3:.1f} MB'.format(name, name_value, value, budget))
+    for violation in list_violations:
+        print('budget exceeded: ' + violation)
+    if list_violations:
+        raise SystemExit(1)
+    print('all stages within their memory budgets')
@@ -0,0 +1,136 @@
+"""
+Microbenchmarks of the per-row hot functions of p21import.py. The rows are generated
+with test/resources/generate_p21_data.py and preprocessed and verified like in an
+import, so that codes, dates and empty fields follow the distributions of the test data.
+
+Each benchmark is run REPEAT times and the fastest run is reported as ns/row. Caches of
+the converters (dates, concepts) are warm after the first run, like in an import with
+repeated values; the uncached conversion is measured separately. Memory is measured in
+an additional run with tracemalloc as peak of traced bytes per row and as blocks still
+allocated after the run per row (the objects created and kept per row, like fact dicts).
+tracemalloc does not count freed blocks, so short-lived temporaries only show up in the
+peak.
+
+Run from the root of the repository:
+  PYTHONPATH=. python test/benchmark/microbenchmark_p21import.py [--rows 10000] [--filter fall] [--output results.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+from src.p21import import (FALLObservationFactConverter, FALLPreprocessor, FALLVerifier, I2b2DateConverter, ICDCodeNormalizer,
+                           ICDObservationFactConverter, ICDPreprocessor, ICDVerifier, OneWayAnonymizer, OPSCodeNormalizer,
+                           OPSObservationFactConverter, OPSPreprocessor, OPSVerifier)
+
+PATH_BENCHMARK = os.path.dirname(os.path.abspath(__file__))
+PATH_RESOURCES = os.path.join(os.path.dirname(PATH_BENCHMARK), 'resources')
+sys.path.insert(0, PATH_RESOURCES)
+import generate_p21_data  # noqa: E402
+
+NUM_ROWS = 10000
+REPEAT = 5
+SEED = 42
+
+
+def set_environment():
+    os.environ.update({'uuid': 'benchmark', 'script_id': 'p21import', 'script_version': '1.0', 'p21_progress_interval': '0'})
+
+
+def create_chunks(path_folder: str, num_rows: int) -> dict:
+    """
+    Returns the first chunk of valid rows of fall.csv, icd.csv and ops.csv
+    """
+    path_zip = os.path.join(path_folder, 'p21.zip')
+    generate_p21_data.write_p21_zip(path_zip, num_rows, SEED)
+    with zipfile.ZipFile(path_zip) as file_zip:
+        for name in file_zip.namelist():
+            with open(os.path.join(path_folder, name.lower()), 'wb') as file_csv:
+                file_csv.write(file_zip.read(name))
+    dict_chunks = {}
+    for preprocessor_class, verifier_class in [(FALLPreprocessor, FALLVerifier), (ICDPreprocessor, ICDVerifier), (OPSPreprocessor, OPSVerifier)]:
+        preprocessor_class(path_folder).preprocess()
+        verifier = verifier_class(path_folder)
+        verifier.CHUNK_SIZER.SIZE_MIN = verifier.CHUNK_SIZER.SIZE = num_rows * 2
+        dict_chunks[verifier.CSV_NAME] = next(iter(verifier.read_valid_chunks()))
+    return dict_chunks
+
+
+def measure(name: str, function, num_rows: int, repeat: int) -> dict:
+    list_ns = []
+    for _ in range(repeat):
+        time_start = time.perf_counter_ns()
+        function()
+        list_ns.append(time.perf_counter_ns() - time_start)
+    tracemalloc.start()
+    blocks_start = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    result = function()
+    _, size_peak = tracemalloc.get_traced_memory()
+    blocks_end = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    tracemalloc.stop()
+    del result
+    return {'benchmark': name, 'rows': num_rows, 'ns_per_row': round(min(list_ns) / num_rows, 1),
+            'bytes_peak_per_row': round(size_peak / num_rows, 1), 'blocks_per_row': round((blocks_end - blocks_start) / num_rows, 2)}
+
+
+def create_benchmarks(dict_chunks: dict) -> list:
+    """
+    Returns tuples of name, function and number of rows. Each function returns its
+    results, so that the objects it creates are kept until the memory is measured
+    """
+    fall, icd, ops = dict_chunks['fall.csv'], dict_chunks['icd.csv'], dict_chunks['ops.csv']
+    rows_fall, rows_icd, rows_ops = fall.to_dict('records'), icd.to_dict('records'), ops.to_dict('records')
+    converter_fall, converter_icd, converter_ops = FALLObservationFactConverter(), ICDObservationFactConverter(), OPSObservationFactConverter()
+    list_facts = [fact for row in rows_fall for fact in converter_fall.create_observation_facts_from_row(row)]
+    list_dates = fall['aufnahmedatum'].tolist()
+    codes_icd, codes_ops = icd['icdkode'].tolist(), ops['opskode'].tolist()
+    normalizer_icd, normalizer_ops = ICDCodeNormalizer(), OPSCodeNormalizer()
+    converter_dates = I2b2DateConverter()
+    list_ids = fall['khinterneskennzeichen'].tolist()
+    anonymizer = OneWayAnonymizer('SHA-1')
+    list_benchmarks = [
+        ('fall_create_observation_facts_from_row', lambda: [converter_fall.create_observation_facts_from_row(row) for row in rows_fall], len(rows_fall)),
+        ('icd_create_observation_facts_from_row', lambda: [converter_icd.create_observation_facts_from_row(row) for row in rows_icd], len(rows_icd)),
+        ('ops_create_observation_facts_from_row', lambda: [converter_ops.create_observation_facts_from_row(row) for row in rows_ops], len(rows_ops)),
+        ('icd_get_concept', lambda: [normalizer_icd.get_concept(code) for code in codes_icd], len(codes_icd)),
+        ('icd_normalize_code_uncached', lambda: [ICDCodeNormalizer.normalize_code(code) for code in codes_icd], len(codes_icd)),
+        ('ops_get_concept', lambda: [normalizer_ops.get_concept(code) for code in codes_ops], len(codes_ops)),
+        ('ops_normalize_code_uncached', lambda: [OPSCodeNormalizer.normalize_code(code) for code in codes_ops], len(codes_ops)),
+        ('convert_date_to_i2b2_format', lambda: [converter_dates.convert(date) for date in list_dates], len(list_dates)),
+        ('convert_date_to_i2b2_format_uncached', lambda: [I2b2DateConverter.convert_single_date(date) for date in list_dates], len(list_dates)),
+        ('add_static_values_to_row_dict', lambda: [converter_fall.add_static_values_to_row_dict(fact, '1', '1', '202001010000') for fact in list_facts], len(list_facts)),
+        ('anonymize_list', lambda: anonymizer.anonymize_list('1.2.276.0.76.3.87686.1.45', list_ids, ''), len(list_ids)),
+    ]
+    for name_csv, verifier_class, chunk in [('fall.csv', FALLVerifier, fall), ('icd.csv', ICDVerifier, icd), ('ops.csv', OPSVerifier, ops)]:
+        verifier = verifier_class(PATH_BENCHMARK)
+        for column in verifier.DICT_COLUMN_PATTERN:
+            list_benchmarks.append(('clear_invalid_column_fields:{0}:{1}'.format(name_csv, column),
+                                    lambda verifier=verifier, column=column, chunk=chunk: verifier.clear_invalid_column_fields_in_chunk(chunk.copy(), column),
+                                    len(chunk.index)))
+    return list_benchmarks
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Microbenchmarks of the hot functions of the p21 import')
+    parser.add_argument('--rows', type=int, default=NUM_ROWS, help='number of encounters of the generated data')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='runs of each benchmark, the fastest is reported')
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains given text')
+    parser.add_argument('--output', help='json file to write the results to')
+    args = parser.parse_args()
+    set_environment()
+    with tempfile.TemporaryDirectory() as path_tmp:
+        dict_chunks = create_chunks(path_tmp, args.rows)
+    list_results = []
+    print('{0:<70} {1:>10} {2:>14} {3:>12}'.format('benchmark', 'ns/row', 'peak bytes/row', 'blocks/row'))
+    for name, function, num_rows in create_benchmarks(dict_chunks):
+        if args.filter in name:
+            result = measure(name, function, num_rows, args.repeat)
+            list_results.append(result)
+            print('{benchmark:<70} {ns_per_row:>10.1f} {bytes_peak_per_row:>14.1f} {blocks_per_row:>12.2f}'.format(**result))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file_output:
+            json.dump(list_results, file_output, indent=2)
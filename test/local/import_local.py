@@ -16,6 +16,7 @@ path_resources = os.path.join(path_parent, "resources")
 path_aktin_properties = os.path.join(path_resources, "aktin.properties")
 path_zip = os.path.join(path_resources, "p21_verification.zip")
 os.environ["path_aktin_properties"] =  path_aktin_properties
+os.environ["p21_report_path"] = "-"
 
 start_time = time.time()
 p21 = P21Importer(path_zip)
@@ -3,12 +3,11 @@
 import csv
 import os
 import random
-from datetime import timedelta
+from datetime import datetime, timedelta
 from random import randrange
 from zipfile import ZipFile
 
 import numpy as np
-from dateutil import parser
 
 NUM_PATIENTS = 4000
 NUM_FACTS = NUM_PATIENTS * 2
@@ -109,15 +108,23 @@ CODES_OPS = ['5452a0', '3990', '593243', '81521', '584435', '8837m9', '57281', '
              '3207', '85602', '546702']
 
 
+DATE_START = datetime(2019, 1, 1)
+SECONDS_DATE_RANGE = int((datetime(2022, 1, 1) - DATE_START).total_seconds())
+
+
 def generate_random_date(dateformat='%Y%m%d%H%M') -> str:
-  start = parser.parse('20190101')
-  end = parser.parse('20220101')
-  delta = end - start
-  int_delta = (delta.days * 24 * 60 * 60) + delta.seconds
-  random_date = start + timedelta(seconds=randrange(int_delta))
+  random_date = DATE_START + timedelta(seconds=randrange(SECONDS_DATE_RANGE))
   return random_date.strftime(dateformat)
 
 
+def generate_random_internal_ids() -> np.ndarray:
+  """
+  Encounter ids of the fab, icd and ops facts. Like in the default data set, only the
+  first three quarters of the encounters in fall.csv get facts
+  """
+  return np.random.randint(1000, 1000 + NUM_PATIENTS * 3 // 4, NUM_FACTS)
+
+
 def add_missing_values(dict_csv: dict, column: str, index: int) -> dict:
   indeces = np.where(np.asarray(dict_csv['KH-internes-Kennzeichen']) == index)
   for i in indeces[0].tolist():
@@ -130,9 +137,13 @@ def add_missing_values(dict_csv: dict, column: str, index: int) -> dict:
 def save_test_data_as_csv_to_local_folder(name_csv: str, dict_csv: dict):
   path = os.path.join(os.getcwd(), name_csv)
   with open(path, 'w', newline='\n') as output:
-    writer = csv.writer(output, delimiter=';')
-    writer.writerow(dict_csv.keys())
-    writer.writerows(zip(*[dict_csv[key] for key in dict_csv.keys()]))
+    write_test_data_as_csv(output, dict_csv)
+
+
+def write_test_data_as_csv(output, dict_csv: dict):
+  writer = csv.writer(output, delimiter=';')
+  writer.writerow(dict_csv.keys())
+  writer.writerows(zip(*[dict_csv[key] for key in dict_csv.keys()]))
 
 
 def create_test_FALL_max() -> dict:
@@ -255,7 +266,7 @@ def create_test_FAB_max() -> dict:
   fab_max = {'IK':                            ['261700001' for _ in range(NUM_FACTS)],
              'Entlassender-Standort':         ['770001000' for _ in range(NUM_FACTS)],
              'Entgeltbereich':                random.choices(['DRG', 'PSY'], weights=[0.75, 0.25], k=NUM_FACTS),
-             'KH-internes-Kennzeichen':       np.random.randint(1000, 4000, NUM_FACTS),
+             'KH-internes-Kennzeichen':       generate_random_internal_ids(),
              'Standortnummer-Behandlungsort': ['770001000' for _ in range(NUM_FACTS)],
              'Fachabteilung':                 [random.choice(['HA', 'BA', 'BE']) + str(np.random.randint(1000, 9999)) for _ in range(NUM_FACTS)],
              'FAB-Aufnahmedatum':             [generate_random_date() for _ in range(NUM_FACTS)],
@@ -309,7 +320,7 @@ def create_test_ICD_max() -> dict:
   icd_max = {'IK':                      ['261700001' for _ in range(NUM_FACTS)],
              'Entlassender-Standort':   ['770001000' for _ in range(NUM_FACTS)],
              'Entgeltbereich':          random.choices(['DRG', 'PSY'], weights=[0.75, 0.25], k=NUM_FACTS),
-             'KH-internes-Kennzeichen': np.random.randint(1000, 4000, NUM_FACTS),
+             'KH-internes-Kennzeichen': generate_random_internal_ids(),
              'Diagnoseart':             random.choices(['HD', 'ND'], k=NUM_FACTS),
              'ICD-Version':             ['2019' for _ in range(NUM_FACTS)],
              'ICD-Kode':                random.choices(CODES_ICD, k=NUM_FACTS),
@@ -388,7 +399,7 @@ def create_test_OPS_max() -> dict:
   ops_max = {'IK':                      ['261700001' for _ in range(NUM_FACTS)],
              'Entlassender-Standort':   ['770001000' for _ in range(NUM_FACTS)],
              'Entgeltbereich':          random.choices(['DRG', 'PSY'], weights=[0.66, 0.3], k=NUM_FACTS),
-             'KH-internes-Kennzeichen': np.random.randint(1000, 4000, NUM_FACTS),
+             'KH-internes-Kennzeichen': generate_random_internal_ids(),
              'OPS-Version':             ['2019' for _ in range(NUM_FACTS)],
              'OPS-Kode':                random.choices(CODES_OPS, k=NUM_FACTS),
              'Lokalisation':            random.choices(['R', 'L', 'B', ''], k=NUM_FACTS),
@@ -0,0 +1,345 @@
+# -*- coding: UTF-8 -*-.
+"""
+Vectorized generator of synthetic p21 data with production-like distributions, e.g. for
+the benchmarks. Unlike create_p21_test_data.py, which creates the small fixtures of the
+unit tests, it writes FALL.csv, FAB.csv, ICD.csv and OPS.csv for millions of encounters
+directly into a zip file.
+
+* each encounter has one main diagnosis and a poisson distributed number of secondary
+  diagnoses, some of them with a secondary code (cross/star codes)
+* most encounters stay in one department, some are transferred (FAB.csv)
+* a part of the encounters has no procedures, codes follow a zipf-like distribution
+* optional fields are empty with the fractions of FRACTIONS_EMPTY
+* a fraction of the validated fields (rate_invalid) gets an invalid value
+* the case and the dashes of the headers vary between the files (vary_headers)
+
+The encounters are generated in blocks of SIZE_BLOCK. Each block has its own random
+generator derived from the seed, so the output only depends on the seed and the
+arguments.
+
+Needs pyarrow, which is part of the optional dependencies 'arrow' of pyproject.toml.
+
+Usage: python generate_p21_data.py path_zip num_encounters [--seed 42] [--rate-invalid 0.001] [--no-header-variations]
+"""
+
+import argparse
+import zipfile
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+from create_p21_test_data import CODES_ICD, CODES_OPS
+
+SIZE_BLOCK = 100000
+SEED = 42
+RATE_INVALID = 0.001
+ID_FIRST = 1000
+
+DATE_START = np.datetime64('2019-01-01T00:00', 'm')
+MINUTES_DATE_RANGE = int((np.datetime64('2022-01-01T00:00', 'm') - DATE_START).astype(int))
+MEAN_DAYS_STAY = {'DRG': 6, 'PSY': 35}
+WEIGHTS_GESCHLECHT = {'m': 0.49, 'w': 0.5, 'd': 0.005, 'x': 0.005}
+WEIGHTS_AUFNAHMEANLASS = {'E': 0.55, 'N': 0.3, 'V': 0.07, 'Z': 0.02, 'R': 0.02, 'A': 0.02, 'G': 0.01, 'B': 0.01}
+WEIGHTS_AUFNAHMEGRUND = {'0101': 0.75, '0107': 0.1, '0301': 0.05, '0201': 0.04, '0401': 0.03, '0501': 0.02, '1001': 0.01}
+WEIGHTS_ENTLASSUNGSGRUND = {'019': 0.6, '011': 0.1, '039': 0.1, '079': 0.05, '069': 0.05, '049': 0.05, '229': 0.05}
+WEIGHTS_FALLZUSAMMENFUEHRUNGSGRUND = {'OG': 0.4, 'MD': 0.2, 'KO': 0.2, 'RU': 0.1, 'WR': 0.1}
+WEIGHTS_FACHABTEILUNG = {'HA0100': 0.3, 'HA1500': 0.25, 'HA0300': 0.1, 'HA2400': 0.1, 'HA2900': 0.1, 'HA3600': 0.1, 'BA2200': 0.05}
+WEIGHTS_DIAGNOSENSICHERHEIT = {'': 0.9, 'V': 0.04, 'Z': 0.04, 'A': 0.02}
+WEIGHTS_LOKALISATION = {'': 0.85, 'R': 0.06, 'L': 0.06, 'B': 0.03}
+
+FRACTION_PSY = 0.1
+FRACTION_NEWBORNS = 0.05
+FRACTION_VENTILATED = 0.03
+FRACTION_INTENSIVE = 0.1
+FRACTION_MERGED = 0.03
+FRACTION_SECONDARY_CODES = 0.1
+FRACTION_WITHOUT_PROCEDURES = 0.35
+PROBABILITY_TRANSFER = 0.2
+MEAN_SECONDARY_DIAGNOSES = 5
+MEAN_ADDITIONAL_PROCEDURES = 2
+EXPONENT_ZIPF = 1.1
+
+FRACTIONS_EMPTY = {'Vertragskennzeichen-64b-Modellvorhaben': 0.99, 'IK-der-Krankenkasse': 0.01, 'Geburtsmonat': 0.1, 'PLZ': 0.01,
+                   'Wohnort': 0.01, 'Versicherten-ID': 0.02, 'Interkurrente-Dialysen': 0.98, 'IK-Verlegungs-KH': 0.95,
+                   'Kennung-Besonderer-Fall-Modellvorhaben': 0.99, 'Behandlungsbeginn-vorstationär': 0.85, 'Behandlungsende-nachstationär': 0.9,
+                   'Standortnummer-Behandlungsort': 0.1}
+
+VALUES_INVALID = {'Geburtsjahr': '0', 'Geschlecht': 'u', 'PLZ': 'D-12345', 'Aufnahmedatum': '01.01.2020', 'Entlassungsdatum': '01.01.2020',
+                  'Aufnahmegrund': '9901', 'Aufnahmeanlass': 'X', 'Fallzusammenführung': 'Y', 'Fallzusammenführungsgrund': 'XX',
+                  'Verweildauer-Intensiv': '1.5', 'Beatmungsstunden': '1.5', 'Entlassungsgrund': '1', 'Behandlungsbeginn-vorstationär': '2020-01-01',
+                  'Behandlungstage-vorstationär': 'eins', 'Behandlungsende-nachstationär': '2020-01-01', 'Behandlungstage-nachstationär': 'eins',
+                  'IK-der-Krankenkasse': '16155-6856', 'Fachabteilung': 'XA0100', 'FAB-Aufnahmedatum': '01.01.2020', 'FAB-Entlassungsdatum': '01.01.2020',
+                  'Kennung-Intensivbett': 'Y', 'Diagnoseart': 'XD', 'ICD-Version': '19', 'ICD-Kode': 'i10', 'Lokalisation': 'X',
+                  'Diagnosensicherheit': 'X', 'Sekundär-Kode': 'i10', 'OPS-Version': '19', 'OPS-Kode': 'A-123', 'OPS-Datum': '01.01.2020'}
+
+
+def get_zipf_weights(num_values: int) -> np.ndarray:
+  weights = 1 / np.arange(1, num_values + 1) ** EXPONENT_ZIPF
+  return weights / weights.sum()
+
+
+def pick(rng: np.random.Generator, values: list, size: int, weights: np.ndarray = None) -> pa.DictionaryArray:
+  """
+  Random values as dictionary array, so that only the indices are generated per row
+  """
+  indices = rng.choice(len(values), size, p=weights).astype(np.int32)
+  return pa.DictionaryArray.from_arrays(indices, values)
+
+
+def choose(rng: np.random.Generator, dict_weights: dict, size: int) -> pa.DictionaryArray:
+  weights = np.array(list(dict_weights.values()))
+  return pick(rng, list(dict_weights.keys()), size, weights / weights.sum())
+
+
+def constant(value: str, size: int) -> pa.DictionaryArray:
+  return pa.DictionaryArray.from_arrays(np.zeros(size, dtype=np.int32), [value])
+
+
+def to_strings(values) -> pa.Array:
+  if isinstance(values, pa.DictionaryArray):
+    return values.dictionary_decode()
+  return pc.cast(pa.array(values), pa.string())
+
+
+def where(mask: np.ndarray, value: str, values) -> pa.Array:
+  return pc.if_else(pa.array(mask), value, to_strings(values))
+
+
+def set_empty(rng: np.random.Generator, values, fraction: float) -> pa.Array:
+  return where(rng.random(len(values)) < fraction, '', values)
+
+
+def set_empty_where(values, mask: np.ndarray) -> pa.Array:
+  return where(mask, '', values)
+
+
+def pad_with_zeros(values: np.ndarray, width: int) -> pa.Array:
+  return pc.utf8_lpad(to_strings(values), width, '0')
+
+
+def format_decimals(values: np.ndarray) -> pa.Array:
+  """
+  Formats numbers with two decimal places and a decimal comma, e.g. 12,50
+  """
+  cents = np.round(values * 100).astype(np.int64)
+  return pc.binary_join_element_wise(to_strings(cents // 100), pad_with_zeros(cents % 100, 2), ',')
+
+
+def format_dates(minutes: np.ndarray, with_time: bool = True) -> np.ndarray:
+  """
+  Converts minutes since DATE_START to integers of the format %Y%m%d%H%M (or %Y%m%d)
+  """
+  dates = DATE_START + minutes.astype('timedelta64[m]')
+  years = dates.astype('datetime64[Y]')
+  months = dates.astype('datetime64[M]')
+  days = dates.astype('datetime64[D]')
+  value = ((years.astype(np.int64) + 1970) * 10000 + (months - years).astype(np.int64) * 100 + 100 + (days - months).astype(np.int64) + 1)
+  if not with_time:
+    return value
+  minutes_of_day = (dates - days).astype(np.int64)
+  return value * 10000 + minutes_of_day // 60 * 100 + minutes_of_day % 60
+
+
+def get_position_in_group(counts: np.ndarray) -> np.ndarray:
+  """
+  Returns the position of each row inside the rows of its encounter, e.g. [0, 1, 0, 0, 1, 2]
+  for counts [2, 1, 3]
+  """
+  starts = np.repeat(np.cumsum(counts) - counts, counts)
+  return np.arange(counts.sum()) - starts
+
+
+def generate_encounters(rng: np.random.Generator, index_first: int, num_encounters: int) -> dict:
+  """
+  Values of the encounters of a block, which are shared by all csv files
+  """
+  is_psy = rng.random(num_encounters) < FRACTION_PSY
+  mean_days = np.where(is_psy, MEAN_DAYS_STAY['PSY'], MEAN_DAYS_STAY['DRG'])
+  minutes_stay = (rng.geometric(1 / mean_days) - 1) * 1440 + rng.integers(60, 1440, num_encounters)
+  minutes_admission = rng.integers(0, MINUTES_DATE_RANGE, num_encounters)
+  return {'ids': np.arange(ID_FIRST + index_first, ID_FIRST + index_first + num_encounters),
+          'is_psy': is_psy,
+          'minutes_admission': minutes_admission,
+          'minutes_discharge': minutes_admission + minutes_stay,
+          'num_fab': rng.geometric(1 - PROBABILITY_TRANSFER, num_encounters),
+          'num_icd': 1 + rng.poisson(MEAN_SECONDARY_DIAGNOSES, num_encounters),
+          'num_ops': np.where(rng.random(num_encounters) < FRACTION_WITHOUT_PROCEDURES, 0, 1 + rng.poisson(MEAN_ADDITIONAL_PROCEDURES, num_encounters))}
+
+
+def get_entgeltbereich(is_psy: np.ndarray) -> pa.DictionaryArray:
+  return pa.DictionaryArray.from_arrays(is_psy.astype(np.int32), ['DRG', 'PSY'])
+
+
+def generate_fall(rng: np.random.Generator, encounters: dict) -> dict:
+  n = len(encounters['ids'])
+  is_newborn = rng.random(n) < FRACTION_NEWBORNS
+  age = np.where(is_newborn, 0, np.clip(rng.normal(62, 22, n), 1, 104).astype(np.int64))
+  year_admission = format_dates(encounters['minutes_admission'], False) // 10000
+  is_ventilated = rng.random(n) < FRACTION_VENTILATED
+  is_intensive = is_ventilated | (rng.random(n) < FRACTION_INTENSIVE)
+  is_merged = rng.random(n) < FRACTION_MERGED
+  is_pre = rng.random(n) >= FRACTIONS_EMPTY['Behandlungsbeginn-vorstationär']
+  is_post = rng.random(n) >= FRACTIONS_EMPTY['Behandlungsende-nachstationär']
+  days_stay = (encounters['minutes_discharge'] - encounters['minutes_admission']) // 1440
+  days_pre = rng.integers(1, 5, n)
+  days_post = rng.integers(1, 14, n)
+  ids_insurant = pc.binary_join_element_wise(pick(rng, list('ABCDEFGHIJKLMNOPRSTUVWXYZ'), n).dictionary_decode(), pad_with_zeros(rng.integers(0, 10 ** 9, n), 9), '')
+  return {'IK':                                      constant('261700001', n),
+          'Entlassender-Standort':                   constant('770001000', n),
+          'Entgeltbereich':                          get_entgeltbereich(encounters['is_psy']),
+          'KH-internes-Kennzeichen':                 encounters['ids'],
+          'Versicherten-ID':                         set_empty(rng, ids_insurant, FRACTIONS_EMPTY['Versicherten-ID']),
+          'Vertragskennzeichen-64b-Modellvorhaben':  set_empty(rng, constant('64b', n), FRACTIONS_EMPTY['Vertragskennzeichen-64b-Modellvorhaben']),
+          'IK-der-Krankenkasse':                     set_empty(rng, pick(rng, ['101575519', '108310400', '103411401', '161556856'], n), FRACTIONS_EMPTY['IK-der-Krankenkasse']),
+          'Geburtsjahr':                             year_admission - age,
+          'Geburtsmonat':                            set_empty(rng, rng.integers(1, 13, n), FRACTIONS_EMPTY['Geburtsmonat']),
+          'Geschlecht':                              choose(rng, WEIGHTS_GESCHLECHT, n),
+          'PLZ':                                     set_empty(rng, pad_with_zeros(rng.integers(1067, 99999, n), 5), FRACTIONS_EMPTY['PLZ']),
+          'Wohnort':                                 set_empty(rng, pick(rng, ['Musterstadt', 'Berlin', 'Hamburg', 'München', 'Köln'], n), FRACTIONS_EMPTY['Wohnort']),
+          'Aufnahmedatum':                           format_dates(encounters['minutes_admission']),
+          'Aufnahmeanlass':                          where(is_newborn, 'G', choose(rng, WEIGHTS_AUFNAHMEANLASS, n)),
+          'Aufnahmegrund':                           choose(rng, WEIGHTS_AUFNAHMEGRUND, n),
+          'Fallzusammenführung':                     pa.DictionaryArray.from_arrays(is_merged.astype(np.int32), ['N', 'J']),
+          'Fallzusammenführungsgrund':               set_empty_where(choose(rng, WEIGHTS_FALLZUSAMMENFUEHRUNGSGRUND, n), ~is_merged),
+          'Entlassungsdatum':                        format_dates(encounters['minutes_discharge']),
+          'Entlassungsgrund':                        choose(rng, WEIGHTS_ENTLASSUNGSGRUND, n),
+          'Alter-in-Tagen-am-Aufnahmetag':           set_empty_where(rng.integers(0, 365, n), ~is_newborn),
+          'Alter-in-Jahren-am-Aufnahmetag':          set_empty_where(age, is_newborn),
+          'Aufnahmegewicht':                         set_empty_where(np.clip(rng.normal(3300, 600, n), 500, 6000).astype(np.int64), ~is_newborn),
+          'Patientennummer':                         pc.binary_join_element_wise('P', to_strings(rng.integers(ID_FIRST, ID_FIRST + max(n * 7 // 10, 1), n)), ''),
+          'Interkurrente-Dialysen':                  set_empty(rng, rng.integers(1, 10, n), FRACTIONS_EMPTY['Interkurrente-Dialysen']),
+          'Beatmungsstunden':                        set_empty_where(format_decimals(rng.lognormal(3.5, 1.2, n)), ~is_ventilated),
+          'Behandlungsbeginn-vorstationär':          set_empty_where(format_dates(encounters['minutes_admission'] - days_pre * 1440, False), ~is_pre),
+          'Behandlungstage-vorstationär':            set_empty_where(days_pre, ~is_pre),
+          'Behandlungsende-nachstationär':           set_empty_where(format_dates(encounters['minutes_discharge'] + days_post * 1440, False), ~is_post),
+          'Behandlungstage-nachstationär':           set_empty_where(days_post, ~is_post),
+          'IK-Verlegungs-KH':                        set_empty(rng, constant('260100023', n), FRACTIONS_EMPTY['IK-Verlegungs-KH']),
+          'Belegungstage-in-anderem-Entgeltbereich': np.zeros(n, dtype=np.int64),
+          'Beurlaubungstage-PSY':                    set_empty_where(rng.poisson(0.5, n), ~encounters['is_psy']),
+          'Kennung-Besonderer-Fall-Modellvorhaben':  set_empty(rng, constant('1', n), FRACTIONS_EMPTY['Kennung-Besonderer-Fall-Modellvorhaben']),
+          'Verweildauer-Intensiv':                   set_empty_where(format_decimals(np.minimum(rng.geometric(0.4, n), days_stay + 1) - rng.random(n)), ~is_intensive)}
+
+
+def generate_fab(rng: np.random.Generator, encounters: dict) -> dict:
+  """
+  The stay of an encounter is split evenly between its departments
+  """
+  counts = encounters['num_fab']
+  n = counts.sum()
+  position = get_position_in_group(counts)
+  total = np.repeat(counts, counts)
+  minutes_admission = np.repeat(encounters['minutes_admission'], counts)
+  minutes_stay = np.repeat(encounters['minutes_discharge'], counts) - minutes_admission
+  is_intensive = rng.random(n) < FRACTION_INTENSIVE
+  return {'IK':                            constant('261700001', n),
+          'Entlassender-Standort':         constant('770001000', n),
+          'Entgeltbereich':                get_entgeltbereich(np.repeat(encounters['is_psy'], counts)),
+          'KH-internes-Kennzeichen':       np.repeat(encounters['ids'], counts),
+          'Standortnummer-Behandlungsort': set_empty(rng, constant('770001000', n), FRACTIONS_EMPTY['Standortnummer-Behandlungsort']),
+          'Fachabteilung':                 where(is_intensive, 'HA3600', choose(rng, WEIGHTS_FACHABTEILUNG, n)),
+          'FAB-Aufnahmedatum':             format_dates(minutes_admission + minutes_stay * position // total),
+          'FAB-Entlassungsdatum':          format_dates(minutes_admission + minutes_stay * (position + 1) // total),
+          'Kennung-Intensivbett':          pa.DictionaryArray.from_arrays(is_intensive.astype(np.int32), ['N', 'J'])}
+
+
+def generate_icd(rng: np.random.Generator, encounters: dict) -> dict:
+  counts = encounters['num_icd']
+  n = counts.sum()
+  has_secondary = rng.random(n) < FRACTION_SECONDARY_CODES
+  return {'IK':                           constant('261700001', n),
+          'Entlassender-Standort':        constant('770001000', n),
+          'Entgeltbereich':               get_entgeltbereich(np.repeat(encounters['is_psy'], counts)),
+          'KH-internes-Kennzeichen':      np.repeat(encounters['ids'], counts),
+          'Diagnoseart':                  pa.DictionaryArray.from_arrays((get_position_in_group(counts) > 0).astype(np.int32), ['HD', 'ND']),
+          'ICD-Version':                  format_dates(np.repeat(encounters['minutes_admission'], counts), False) // 10000,
+          'ICD-Kode':                     pick(rng, CODES_ICD, n, get_zipf_weights(len(CODES_ICD))),
+          'Lokalisation':                 choose(rng, WEIGHTS_LOKALISATION, n),
+          'Diagnosensicherheit':          choose(rng, WEIGHTS_DIAGNOSENSICHERHEIT, n),
+          'Sekundär-Kode':                set_empty_where(pick(rng, CODES_ICD, n), ~has_secondary),
+          'Sekundär-Lokalisation':        set_empty_where(choose(rng, WEIGHTS_LOKALISATION, n), ~has_secondary),
+          'Sekundär-Diagnosensicherheit': set_empty_where(choose(rng, WEIGHTS_DIAGNOSENSICHERHEIT, n), ~has_secondary)}
+
+
+def generate_ops(rng: np.random.Generator, encounters: dict) -> dict:
+  counts = encounters['num_ops']
+  n = counts.sum()
+  minutes_admission = np.repeat(encounters['minutes_admission'], counts)
+  minutes_stay = np.repeat(encounters['minutes_discharge'], counts) - minutes_admission
+  return {'IK':                      constant('261700001', n),
+          'Entlassender-Standort':   constant('770001000', n),
+          'Entgeltbereich':          get_entgeltbereich(np.repeat(encounters['is_psy'], counts)),
+          'KH-internes-Kennzeichen': np.repeat(encounters['ids'], counts),
+          'OPS-Version':             format_dates(minutes_admission, False) // 10000,
+          'OPS-Kode':                pick(rng, CODES_OPS, n, get_zipf_weights(len(CODES_OPS))),
+          'Lokalisation':            choose(rng, WEIGHTS_LOKALISATION, n),
+          'OPS-Datum':               format_dates(minutes_admission + (minutes_stay * rng.random(n)).astype(np.int64)),
+          'Belegoperateur':          constant('N', n),
+          'Beleganästhesist':        constant('N', n),
+          'Beleghebamme':            constant('N', n)}
+
+
+def set_invalid_values(rng: np.random.Generator, dict_csv: dict, rate_invalid: float) -> dict:
+  if rate_invalid <= 0:
+    return dict_csv
+  for column, value_invalid in VALUES_INVALID.items():
+    if column in dict_csv:
+      dict_csv[column] = where(rng.random(len(dict_csv[column])) < rate_invalid, value_invalid, dict_csv[column])
+  return dict_csv
+
+
+def vary_header(rng: np.random.Generator, name_csv: str, list_columns: list) -> list:
+  """
+  Header as written by different hospital information systems. The variation is the
+  same for all columns of a file, as duplicate columns (like 'Lokalisation' in ICD.csv)
+  must not differ only in case
+  """
+  if name_csv == 'FAB.csv' and rng.random() < 0.5:
+    list_columns = ['FAB' if column == 'Fachabteilung' else column for column in list_columns]
+  if name_csv == 'ICD.csv' and rng.random() < 0.5:
+    list_columns = [column.replace('Sekundär-', '') if column in ('Sekundär-Lokalisation', 'Sekundär-Diagnosensicherheit') else column for column in list_columns]
+  variation = rng.integers(4)
+  if variation & 1:
+    list_columns = [column.replace('-', '') for column in list_columns]
+  if variation & 2:
+    list_columns = [column.upper() for column in list_columns] if rng.random() < 0.5 else [column.lower() for column in list_columns]
+  return list_columns
+
+
+GENERATORS = [('FALL.csv', generate_fall), ('FAB.csv', generate_fab), ('ICD.csv', generate_icd), ('OPS.csv', generate_ops)]
+
+
+def write_p21_zip(path_zip: str, num_encounters: int, seed: int = SEED, rate_invalid: float = RATE_INVALID, vary_headers: bool = True) -> dict:
+  """
+  Writes the four csv files into a zip file block by block. Returns the number of rows
+  of each csv file
+  """
+  dict_rows = {}
+  options = pa_csv.WriteOptions(include_header=False, delimiter=';', quoting_style='none')
+  with zipfile.ZipFile(path_zip, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as file_zip:
+    for index_csv, (name_csv, generate) in enumerate(GENERATORS):
+      dict_rows[name_csv] = 0
+      with file_zip.open(name_csv, 'w', force_zip64=True) as file_csv:
+        for index_first in range(0, num_encounters, SIZE_BLOCK):
+          encounters = generate_encounters(np.random.default_rng([seed, index_first]), index_first, min(SIZE_BLOCK, num_encounters - index_first))
+          rng = np.random.default_rng([seed, index_first, index_csv + 1])
+          table = pa.table(set_invalid_values(rng, generate(rng, encounters), rate_invalid))
+          if index_first == 0:
+            header = vary_header(np.random.default_rng([seed, index_csv]), name_csv, table.column_names) if vary_headers else table.column_names
+            file_csv.write((';'.join(header) + '\n').encode('utf-8'))
+          pa_csv.write_csv(table, file_csv, options)
+          dict_rows[name_csv] += table.num_rows
+  return dict_rows
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Generates a zip file with synthetic p21 data')
+  parser.add_argument('path_zip', help='path of the zip file to write')
+  parser.add_argument('num_encounters', type=int, help='number of encounters in FALL.csv')
+  parser.add_argument('--seed', type=int, default=SEED, help='seed of the random generators')
+  parser.add_argument('--rate-invalid', type=float, default=RATE_INVALID, help='fraction of validated fields with an invalid value')
+  parser.add_argument('--no-header-variations', action='store_true', help='write the headers like in the p21 specification')
+  args = parser.parse_args()
+  for name, num_rows in write_p21_zip(args.path_zip, args.num_encounters, args.seed, args.rate_invalid, not args.no_header_variations).items():
+    print('{0}: {1} rows'.format(name, num_rows))
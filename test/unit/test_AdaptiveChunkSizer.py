@@ -0,0 +1,66 @@
+import os
+import unittest
+
+from src.p21import import AdaptiveChunkSizer
+
+
+class TestAdaptiveChunkSizer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        os.environ.pop('p21_chunk_size_min', None)
+        os.environ.pop('p21_chunk_size_max', None)
+        self.SIZER = AdaptiveChunkSizer(10000)
+        self.SIZER.get_available_memory = lambda: None
+
+    def tearDown(self) -> None:
+        os.environ.pop('p21_chunk_size_min', None)
+        os.environ.pop('p21_chunk_size_max', None)
+
+    def test_initial_size(self):
+        self.assertEqual(10000, self.SIZER.get_size())
+
+    def test_initial_size_is_clamped_to_bounds(self):
+        os.environ['p21_chunk_size_min'] = '20000'
+        os.environ['p21_chunk_size_max'] = '30000'
+        self.assertEqual(20000, AdaptiveChunkSizer(10000).get_size())
+
+    def test_invalid_bounds(self):
+        os.environ['p21_chunk_size_min'] = '5000'
+        os.environ['p21_chunk_size_max'] = '1000'
+        with self.assertRaises(SystemExit):
+            AdaptiveChunkSizer(10000)
+
+    def test_grow_on_fast_parsing(self):
+        self.SIZER.record_parse(10000, 0.01)
+        self.assertEqual(20000, self.SIZER.get_size())
+
+    def test_shrink_on_slow_writing(self):
+        self.SIZER.record_write(10000, 20000, 100.0)
+        self.assertEqual(5000, self.SIZER.get_size())
+
+    def test_converge_to_target_time(self):
+        for _ in range(20):
+            size = self.SIZER.get_size()
+            self.SIZER.record_parse(size, size * 0.0001)
+        self.assertEqual(int(self.SIZER.SECONDS_TARGET / 0.0001), self.SIZER.get_size())
+
+    def test_size_stays_within_bounds(self):
+        for _ in range(50):
+            self.SIZER.record_parse(self.SIZER.get_size(), 0.0)
+        self.assertEqual(self.SIZER.SIZE_MAX, self.SIZER.get_size())
+        for _ in range(50):
+            self.SIZER.record_write(self.SIZER.get_size(), 0, 1000.0)
+        self.assertEqual(self.SIZER.SIZE_MIN, self.SIZER.get_size())
+
+    def test_limit_by_available_memory_and_fan_out(self):
+        self.SIZER.get_available_memory = lambda: 1600 * 1000 * 1000
+        self.SIZER.record_write(10000, 100000, 0.001)
+        self.assertEqual(8000, self.SIZER.get_size())
+
+    def test_get_available_memory(self):
+        bytes_available = AdaptiveChunkSizer.get_available_memory()
+        self.assertTrue(bytes_available is None or bytes_available > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
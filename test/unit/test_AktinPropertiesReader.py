@@ -32,3 +32,19 @@ class TestAktinPropertiesReader(unittest.TestCase):
     def test_get_missing_property(self):
         prop = self.READER.get_property('broker.url')
         self.assertEqual('', prop)
+
+    def test_get_property_of_modified_file(self):
+        path_parent = os.path.dirname(os.getcwd())
+        path_properties = os.path.join(path_parent, 'resources', 'modified.properties')
+        try:
+            with open(path_properties, 'w') as properties:
+                properties.write('pseudonym.salt=salt1\n')
+            os.environ['path_aktin_properties'] = path_properties
+            reader = AktinPropertiesReader()
+            self.assertEqual('salt1', reader.get_property('pseudonym.salt'))
+            with open(path_properties, 'w') as properties:
+                properties.write('pseudonym.salt=salt2\n')
+            os.utime(path_properties, ns=(0, 0))
+            self.assertEqual('salt2', reader.get_property('pseudonym.salt'))
+        finally:
+            os.remove(path_properties)
@@ -0,0 +1,85 @@
+import os
+import unittest
+import pandas as pd
+
+from src.p21import import ArrowCSVBackend
+from src.p21import import PandasCSVBackend
+from src.p21import import FALLPreprocessor, FABPreprocessor, ICDPreprocessor, OPSPreprocessor
+from src.p21import import FALLVerifier, FABVerifier, ICDVerifier, OPSVerifier
+from src.p21import import TmpFolderManager
+from src.p21import import ZipFileExtractor
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+def read_valid_chunks_as_df(backend, verifier, list_ids: list = None) -> pd.DataFrame:
+    list_chunks = [chunk.astype(str) for chunk in backend.read_valid_chunks(verifier, list_ids)]
+    df = pd.concat(list_chunks) if list_chunks else pd.DataFrame(columns=verifier.SCHEMA.COLUMNS)
+    return df.reset_index(drop=True)
+
+
+@unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+class TestArrowCSVBackend(unittest.TestCase):
+
+    def setUp(self) -> None:
+        path_parent = os.path.dirname(os.getcwd())
+        path_resources = os.path.join(path_parent, 'resources')
+        path_zip = os.path.join(path_resources, 'p21_verification.zip')
+        self.TMP = TmpFolderManager(path_resources)
+        zfe = ZipFileExtractor(path_zip)
+        self.PATH_TMP = self.TMP.create_tmp_folder()
+        zfe.extract_zip_to_folder(self.PATH_TMP)
+        self.TMP.rename_files_in_tmp_folder_to_lowercase()
+
+    def tearDown(self) -> None:
+        self.TMP.remove_tmp_folder()
+
+    def test_translate_pattern_to_re2(self):
+        self.assertEqual(r'^(?:^\p{Nd}{12}$)', ArrowCSVBackend.translate_pattern_to_re2(r'^\d{12}$'))
+        self.assertEqual(r'^(?:^[\p{L}\p{N}_]*$)', ArrowCSVBackend.translate_pattern_to_re2(r'^\w*$'))
+        self.assertEqual(r'^(?:^OG|MD$)', ArrowCSVBackend.translate_pattern_to_re2(r'^OG|MD$'))
+
+    def test_same_valid_chunks_as_pandas(self):
+        for verifier_class, preprocessor_class in [(FALLVerifier, FALLPreprocessor), (FABVerifier, FABPreprocessor),
+                                                   (ICDVerifier, ICDPreprocessor), (OPSVerifier, OPSPreprocessor)]:
+            preprocessor_class(self.PATH_TMP).preprocess()
+            verifier = verifier_class(self.PATH_TMP)
+            df_pandas = read_valid_chunks_as_df(PandasCSVBackend(), verifier)
+            df_arrow = read_valid_chunks_as_df(ArrowCSVBackend(), verifier)
+            self.assertFalse(df_arrow.empty)
+            pd.testing.assert_frame_equal(df_pandas, df_arrow, check_dtype=False)
+
+    def test_same_valid_chunks_as_pandas_with_id_filter(self):
+        ICDPreprocessor(self.PATH_TMP).preprocess()
+        icd = ICDVerifier(self.PATH_TMP)
+        list_ids = ['1000', '1001', '1021', '1022', '1023', 'unknown']
+        df_pandas = read_valid_chunks_as_df(PandasCSVBackend(), icd, list_ids)
+        df_arrow = read_valid_chunks_as_df(ArrowCSVBackend(), icd, list_ids)
+        self.assertTrue(set(df_arrow['khinterneskennzeichen']).issubset(set(list_ids)))
+        pd.testing.assert_frame_equal(df_pandas, df_arrow, check_dtype=False)
+
+    def test_same_valid_chunks_as_pandas_with_small_blocks(self):
+        ICDPreprocessor(self.PATH_TMP).preprocess()
+        icd = ICDVerifier(self.PATH_TMP)
+        df_pandas = read_valid_chunks_as_df(PandasCSVBackend(), icd)
+        backend = ArrowCSVBackend()
+        backend.SIZE_BLOCK = 1024
+        icd.CHUNK_SIZER.SIZE_MIN = icd.CHUNK_SIZER.SIZE = icd.CHUNK_SIZER.SIZE_MAX = 7
+        list_chunks = list(backend.read_valid_chunks(icd))
+        self.assertGreater(len(list_chunks), 2)
+        self.assertTrue(all(len(chunk.index) <= 7 for chunk in list_chunks))
+        df_arrow = pd.concat([chunk.astype(str) for chunk in list_chunks]).reset_index(drop=True)
+        pd.testing.assert_frame_equal(df_pandas, df_arrow, check_dtype=False)
+
+    def test_select_backend_by_environment(self):
+        os.environ['p21_csv_backend'] = 'pandas'
+        self.assertIsInstance(FALLVerifier(self.PATH_TMP).BACKEND, PandasCSVBackend)
+        os.environ['p21_csv_backend'] = 'arrow'
+        self.assertIsInstance(FALLVerifier(self.PATH_TMP).BACKEND, ArrowCSVBackend)
+        os.environ['p21_csv_backend'] = 'unknown'
+        with self.assertRaises(SystemExit):
+            FALLVerifier(self.PATH_TMP)
+        del os.environ['p21_csv_backend']
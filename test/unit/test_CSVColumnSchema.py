@@ -0,0 +1,33 @@
+import unittest
+import pandas as pd
+
+from src.p21import import CSVColumnSchema
+from src.p21import import ICDVerifier
+
+
+class TestCSVColumnSchema(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.SCHEMA = CSVColumnSchema(list(ICDVerifier.DICT_COLUMN_PATTERN.keys()), ICDVerifier.CATEGORICAL_COLUMNS)
+
+    def test_get_dtypes(self):
+        dtypes = self.SCHEMA.get_dtypes()
+        self.assertEqual(list(ICDVerifier.DICT_COLUMN_PATTERN.keys()), list(dtypes.keys()))
+        self.assertEqual('category', dtypes['diagnoseart'])
+        self.assertEqual('category', dtypes['lokalisation'])
+        self.assertEqual(str, dtypes['icdkode'])
+        self.assertEqual(str, dtypes['khinterneskennzeichen'])
+
+    def test_ignore_categorical_columns_not_in_columns(self):
+        schema = CSVColumnSchema(['khinterneskennzeichen', 'geschlecht'], ['geschlecht', 'aufnahmeanlass'])
+        self.assertEqual(['geschlecht'], schema.COLUMNS_CATEGORICAL)
+
+    def test_fill_empty_fields(self):
+        chunk = pd.DataFrame({'khinterneskennzeichen': ['1', '2', None], 'diagnoseart': ['HD', None, 'ND']})
+        chunk['diagnoseart'] = chunk['diagnoseart'].astype('category')
+        schema = CSVColumnSchema(['khinterneskennzeichen', 'diagnoseart'], ['diagnoseart'])
+        chunk = schema.fill_empty_fields(chunk)
+        self.assertEqual(['1', '2', ''], list(chunk['khinterneskennzeichen']))
+        self.assertEqual(['HD', '', 'ND'], list(chunk['diagnoseart']))
+        chunk.loc[0, 'diagnoseart'] = ''
+        self.assertEqual(2, len(chunk[chunk['diagnoseart'] == '']))
@@ -1,6 +1,52 @@
 import unittest
 import os
+import pandas as pd
 from src.p21import import FALLObservationFactConverter
+from src.p21import import OPSObservationFactConverter
+
+NUM_COPIES_OF_ENCOUNTERS = 3
+
+
+def sort_facts(list_facts: list) -> list:
+    return sorted(list_facts, key=lambda fact: repr(sorted(fact.items())))
+
+
+def create_chunk_of_several_encounters(df: pd.DataFrame) -> tuple:
+    """
+    Copies the rows of each encounter of df to NUM_COPIES_OF_ENCOUNTERS encounters and
+    shuffles the rows, so that the rows of different encounters are interleaved. Each
+    encounter gets its own encounter_num and admission date, two encounters share each
+    patient. Returns the chunk with the matched columns and a dict with
+    { encounter id : (encounter_num, patient_num, admission date in csv format) }
+    """
+    df = pd.concat([df.assign(khinterneskennzeichen=df['khinterneskennzeichen'] + '_{0}'.format(i)) for i in range(NUM_COPIES_OF_ENCOUNTERS)])
+    df = df.sample(frac=1, random_state=42).reset_index(drop=True)
+    dict_encounters = {}
+    for i, id_encounter in enumerate(df['khinterneskennzeichen'].unique()):
+        date = '2020{0:02d}{1:02d}{2:02d}{3:02d}'.format(1 + i % 12, 1 + i % 28, i % 24, i % 60)
+        dict_encounters[id_encounter] = ('E{0}'.format(i), 'P{0}'.format(i // 2), date)
+    list_encounters = [dict_encounters[id_encounter] for id_encounter in df['khinterneskennzeichen']]
+    chunk = df.assign(encounter_num=[encounter[0] for encounter in list_encounters], patient_num=[encounter[1] for encounter in list_encounters],
+                      date_admission=['{0}-{1}-{2} {3}:{4}'.format(d[:4], d[4:6], d[6:8], d[8:10], d[10:]) for _, _, d in list_encounters])
+    return chunk, dict_encounters
+
+
+def assert_same_facts_from_rows_and_chunk(test_case: unittest.TestCase, df: pd.DataFrame, converter_rows, converter_chunk, create_facts_from_row=None):
+    """
+    Converts the rows of several encounters (see create_chunk_of_several_encounters())
+    row by row with converter_rows and at once with converter_chunk and compares the
+    facts. Both converters must be new, as they number the instances of the encounters
+    """
+    create_facts_from_row = create_facts_from_row or converter_rows.create_observation_facts_from_row
+    chunk, dict_encounters = create_chunk_of_several_encounters(df)
+    list_facts_rows = []
+    for _, row in chunk.drop(columns=['encounter_num', 'patient_num', 'date_admission']).iterrows():
+        num_enc, num_pat, date_admission = dict_encounters[row['khinterneskennzeichen']]
+        for fact in create_facts_from_row(row):
+            list_facts_rows.append(converter_rows.add_encounter_values_to_row_dict(fact, num_enc, num_pat, date_admission))
+    facts = converter_chunk.create_observation_facts_from_chunk(chunk)
+    test_case.assertEqual(len(dict_encounters), len({fact['encounter_num'] for fact in facts.to_dicts()}))
+    test_case.assertEqual(sort_facts(list_facts_rows), sort_facts(facts.to_dicts()))
 
 
 class TestCSVObservationFactConverter(unittest.TestCase):
@@ -55,3 +101,28 @@ class TestCSVObservationFactConverter(unittest.TestCase):
         self.assertNotEqual('2022-01-01 00:00', row.get('download_date'))
         self.assertEqual('test_a70bfc58fd1f', row.get('sourcesystem_cd'))
         self.assertEqual(15, len(row.keys()))
+
+    def test_add_encounter_values_to_empty_row_dict(self):
+        row = self.CSV.add_encounter_values_to_row_dict({}, 'E5', 'P5', '202012310000')
+        self.assertEqual('E5', row.get('encounter_num'))
+        self.assertEqual('2020-12-31 00:00', row.get('start_date'))
+        self.assertEqual('@', row.get('units_cd'))
+        self.assertNotIn('import_date', row)
+        self.assertNotIn('sourcesystem_cd', row)
+        self.assertEqual(9, len(row.keys()))
+
+    def test_convert_dates_of_series_like_single_dates(self):
+        list_dates = ['202012311230', '2020123112', '', '20201231123', '150001011200']
+        list_expected = [None if not date else self.CSV.DATE_CONVERTER.convert_single_date(date) for date in list_dates]
+        self.assertEqual(list_expected, self.CSV.convert_dates_of_series(pd.Series(list_dates)).tolist())
+
+    def test_convert_invalid_dates_of_series(self):
+        with self.assertRaises(ValueError):
+            self.CSV.convert_dates_of_series(pd.Series(['202012311230', '2020123112', '202002301230']))
+
+    def test_single_import_date_for_all_facts(self):
+        row1 = self.CSV.add_static_values_to_row_dict({}, 'E5', 'P5', '202012310000')
+        row2 = OPSObservationFactConverter().add_static_values_to_row_dict({}, 'E6', 'P6', '202012310000')
+        self.assertEqual(row1['import_date'], row2['import_date'])
+        self.assertEqual(row1['import_date'], row1['update_date'])
+        self.assertEqual(row1['import_date'], row1['download_date'])
@@ -119,6 +119,18 @@ class TestCSVPreprocessor(unittest.TestCase):
         self.assertTrue(columns_matched == columns_required)
         ICDPreprocessor.CSV_NAME = 'icd.csv'
 
+    def test_preprocess_ICD_no_sek_with_custom_chunk_size(self):
+        ICDPreprocessor.CSV_NAME = 'icd_no_sek.csv'
+        ICDPreprocessor.SIZE_CHUNKS = 10
+        icd = ICDPreprocessor(self.PATH_TMP)
+        count_rows_old = count_rows_in_column(icd, 'KH-internes-Kennzeichen')
+        icd.preprocess()
+        self.assertEqual(count_rows_old, count_rows_in_column(icd, 'sekundärkode'))
+        with open(icd.PATH_CSV, encoding='utf-8') as file_csv:
+            self.assertEqual(1, sum('khinterneskennzeichen' in line for line in file_csv))
+        ICDPreprocessor.CSV_NAME = 'icd.csv'
+        ICDPreprocessor.SIZE_CHUNKS = 10000
+
     def test_preprocess_OPS(self):
         ops = OPSPreprocessor(self.PATH_TMP)
         ops.preprocess()
@@ -0,0 +1,51 @@
+import unittest
+
+from src.p21import import EncounterMatchingCache
+from src.p21import import OneWayAnonymizer
+
+
+class TestEncounterMatchingCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.CACHE = EncounterMatchingCache()
+        self.NUM_EXTRACTIONS = 0
+
+    def __extract(self) -> list:
+        self.NUM_EXTRACTIONS += 1
+        return [('id1', 1, 1)]
+
+    def __extract_nothing(self):
+        self.NUM_EXTRACTIONS += 1
+        raise ValueError('No entries for database query was found')
+
+    def test_encounter_info_is_extracted_once(self):
+        self.assertEqual([('id1', 1, 1)], self.CACHE.get_encounter_info('billing', self.__extract))
+        self.assertEqual([('id1', 1, 1)], self.CACHE.get_encounter_info('billing', self.__extract))
+        self.assertEqual(1, self.NUM_EXTRACTIONS)
+
+    def test_encounter_info_is_cached_per_key(self):
+        self.CACHE.get_encounter_info('billing', self.__extract)
+        self.CACHE.get_encounter_info('encounter', self.__extract)
+        self.assertEqual(2, self.NUM_EXTRACTIONS)
+
+    def test_failed_extraction_is_raised_again(self):
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                self.CACHE.get_encounter_info('billing', self.__extract_nothing)
+        self.assertEqual(1, self.NUM_EXTRACTIONS)
+
+    def test_anonymize_list_equals_anonymizer(self):
+        anonymizer = OneWayAnonymizer('sha1')
+        list_ext = ['ext1', 'ext2', 'ext1', 'ext3']
+        self.assertEqual(anonymizer.anonymize_list('root', list_ext, 'salt'), self.CACHE.anonymize_list(anonymizer, 'root', list_ext, 'salt'))
+        self.assertEqual(anonymizer.anonymize_list('root', list_ext, 'salt'), self.CACHE.anonymize_list(anonymizer, 'root', list_ext, 'salt'))
+
+    def test_anonymize_list_with_different_root(self):
+        anonymizer = OneWayAnonymizer('sha1')
+        list_hash1 = self.CACHE.anonymize_list(anonymizer, 'root1', ['ext1'], 'salt')
+        list_hash2 = self.CACHE.anonymize_list(anonymizer, 'root2', ['ext1'], 'salt')
+        self.assertNotEqual(list_hash1, list_hash2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,6 +6,7 @@ from src.p21import import FABObservationFactConverter
 from src.p21import import FABPreprocessor
 from src.p21import import TmpFolderManager
 from src.p21import import ZipFileExtractor
+from test_CSVObservationFactConverter import assert_same_facts_from_rows_and_chunk
 
 
 class TestFABObservationFactConverter(unittest.TestCase):
@@ -36,6 +37,9 @@ class TestFABObservationFactConverter(unittest.TestCase):
     def tearDown(self) -> None:
         self.TMP.remove_tmp_folder()
 
+    def test_create_observation_facts_from_chunk(self):
+        assert_same_facts_from_rows_and_chunk(self, self.DF, self.CONVERTER, FABObservationFactConverter())
+
     def test_create_fab_observation_fact_row(self):
         self.__test_pat1_row1()
         self.__test_pat1_row2_missing_discharge()
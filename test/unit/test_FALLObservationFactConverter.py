@@ -6,6 +6,7 @@ from src.p21import import FALLObservationFactConverter
 from src.p21import import FALLPreprocessor
 from src.p21import import TmpFolderManager
 from src.p21import import ZipFileExtractor
+from test_CSVObservationFactConverter import assert_same_facts_from_rows_and_chunk
 
 
 def drop_nan_columns_in_row(row: pd.Series):
@@ -40,6 +41,10 @@ class TestFALLObservationFactConverter(unittest.TestCase):
     def tearDown(self) -> None:
         self.TMP.remove_tmp_folder()
 
+    def test_create_observation_facts_from_chunk(self):
+        assert_same_facts_from_rows_and_chunk(self, self.DF, self.CONVERTER, FALLObservationFactConverter(),
+                                              lambda row: self.CONVERTER.create_observation_facts_from_row(row) + self.CONVERTER.create_script_rows())
+
     def test_create_script_rows(self):
         list_script_rows = self.CONVERTER.create_script_rows()
         df = pd.DataFrame(list_script_rows)
@@ -0,0 +1,60 @@
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from src.p21import import I2b2DateConverter
+
+
+class TestI2b2DateConverter(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.CONVERTER = I2b2DateConverter()
+
+    def test_convert_date(self):
+        self.assertEqual('2020-12-31 12:30', self.CONVERTER.convert('202012311230'))
+
+    def test_convert_date_with_hour_24(self):
+        self.assertEqual('2020-12-31 23:59', self.CONVERTER.convert('202012312400'))
+
+    def test_convert_invalid_date(self):
+        with self.assertRaises(ValueError):
+            self.CONVERTER.convert('202002301230')
+
+    def test_convert_series(self):
+        series = pd.Series(['202012311230', '202012312400', '20201231', '', None, '202002301230'])
+        list_expected = ['2020-12-31 12:30', '2020-12-31 23:59', '2020-12-31 00:00', None, None, None]
+        self.assertEqual(list_expected, self.CONVERTER.convert_series(series).tolist())
+
+    def test_convert_series_equals_single_conversion(self):
+        list_dates = ['202001010000', '202002291259', '202012312400', '201912310101']
+        list_converted = self.CONVERTER.convert_series(pd.Series(list_dates)).tolist()
+        self.assertEqual([I2b2DateConverter.convert_single_date(date) for date in list_dates], list_converted)
+
+    def test_convert_series_with_dates_out_of_range_of_nanoseconds(self):
+        """
+        Older pandas versions coerce dates before 1677 and after 2262 to NaT, which is
+        simulated here
+        """
+        to_datetime = pd.to_datetime
+
+        def to_datetime_in_nanoseconds(*args, **kwargs):
+            dates = to_datetime(*args, **kwargs)
+            return dates.where(dates.dt.year.between(1678, 2261))
+
+        series = pd.Series(['150001011200', '290001012400', '202012311230', '', '290002301230'])
+        with mock.patch.object(pd, 'to_datetime', to_datetime_in_nanoseconds):
+            list_converted = self.CONVERTER.convert_series(series).tolist()
+        self.assertEqual(['1500-01-01 12:00', '2900-01-01 23:59', '2020-12-31 12:30', None, None], list_converted)
+
+    def test_cache_is_bounded(self):
+        self.CONVERTER.SIZE_CACHE = 2
+        self.CONVERTER.convert('202001010000')
+        self.CONVERTER.convert('202001020000')
+        self.CONVERTER.convert('202001010000')
+        self.CONVERTER.convert('202001030000')
+        self.assertEqual(['202001010000', '202001030000'], list(self.CONVERTER.CACHE.keys()))
+
+
+if __name__ == '__main__':
+    unittest.main()
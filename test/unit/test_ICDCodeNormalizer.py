@@ -0,0 +1,42 @@
+import unittest
+import pandas as pd
+
+from src.p21import import ICDCodeNormalizer
+
+
+class TestICDCodeNormalizer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.NORMALIZER = ICDCodeNormalizer()
+        self.LIST_CODES = ['F2424', 'F24.24', 'J90', 'J21.', 'F24.2', 'F242']
+        self.LIST_CONCEPTS = ['ICD10GM:F24.24', 'ICD10GM:F24.24', 'ICD10GM:J90', 'ICD10GM:J21.', 'ICD10GM:F24.2', 'ICD10GM:F24.2']
+
+    def test_get_concept(self):
+        self.assertEqual(self.LIST_CONCEPTS, [self.NORMALIZER.get_concept(code) for code in self.LIST_CODES])
+
+    def test_convert_series(self):
+        series = pd.Series(self.LIST_CODES + [''])
+        self.assertEqual(self.LIST_CONCEPTS + [None], self.NORMALIZER.convert_series(series).tolist())
+
+    def test_distinct_codes_are_converted_once(self):
+        self.NORMALIZER.cache_series(pd.Series(['F2424', 'F2424', 'J90', '']))
+        self.assertEqual({'F2424', 'J90'}, set(self.NORMALIZER.CACHE.keys()))
+        self.assertIs(self.NORMALIZER.get_concept('F2424'), self.NORMALIZER.get_concept('F2424'))
+
+    def test_cache_is_bounded(self):
+        self.NORMALIZER.SIZE_CACHE = 2
+        self.NORMALIZER.get_concept('F2424')
+        self.NORMALIZER.get_concept('J90')
+        self.NORMALIZER.get_concept('F2424')
+        self.NORMALIZER.get_concept('J21.')
+        self.assertEqual(['F2424', 'J21.'], list(self.NORMALIZER.CACHE.keys()))
+
+    def test_convert_series_with_more_codes_than_cache(self):
+        self.NORMALIZER.SIZE_CACHE = 2
+        series = pd.Series(self.LIST_CODES + [''])
+        self.assertEqual(self.LIST_CONCEPTS + [None], self.NORMALIZER.convert_series(series).tolist())
+        self.assertEqual(2, len(self.NORMALIZER.CACHE))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,6 +6,7 @@ from src.p21import import ICDObservationFactConverter
 from src.p21import import ICDPreprocessor
 from src.p21import import TmpFolderManager
 from src.p21import import ZipFileExtractor
+from test_CSVObservationFactConverter import assert_same_facts_from_rows_and_chunk, sort_facts
 
 
 class TestICDObservationFactConverter(unittest.TestCase):
@@ -45,6 +46,18 @@ class TestICDObservationFactConverter(unittest.TestCase):
         self.__test_pat2_row2_with_sec_diag_missing_localisation()
         self.__test_pat2_row3_with_sec_diag_missing_certainty()
 
+    def test_create_observation_facts_from_chunk(self):
+        assert_same_facts_from_rows_and_chunk(self, self.DF, self.CONVERTER, ICDObservationFactConverter())
+
+    def test_iter_observation_fact_batches(self):
+        chunk = self.DF.assign(encounter_num='E1', patient_num='P1', date_admission='2020-01-01 00:00')
+        facts = ICDObservationFactConverter().create_observation_facts_from_chunk(chunk)
+        list_batches = list(self.CONVERTER.iter_observation_fact_batches(chunk, 22))
+        self.assertEqual(4, len(list_batches))
+        self.assertTrue(all(len(batch) <= 22 for batch in list_batches))
+        list_facts_batches = [fact for batch in list_batches for fact in batch.to_dicts()]
+        self.assertEqual(sort_facts(facts.to_dicts()), sort_facts(list_facts_batches))
+
     def __test_pat1_row1(self):
         csv_row = self.DF.iloc[0]
         list_observation_fact_dicts = self.CONVERTER.create_observation_facts_from_row(csv_row)
@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from src.p21import import ImportStageReport
+
+
+class TestImportStageReport(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.REPORT = ImportStageReport(path_zip='p21.zip')
+
+    def tearDown(self) -> None:
+        os.environ.pop('p21_report_path', None)
+        os.environ.pop('p21_metrics_path', None)
+
+    def test_measure_stage(self):
+        with self.REPORT.measure('matching') as stage:
+            stage['rows_in'] += 10
+            time.sleep(0.01)
+        stage = self.REPORT.get_stage('matching')
+        self.assertEqual(10, stage['rows_in'])
+        self.assertGreaterEqual(stage['seconds_wall'], 0.01)
+
+    def test_measure_same_stage_twice(self):
+        for _ in range(2):
+            with self.REPORT.measure('upload', 'fall.csv') as stage:
+                stage['facts'] += 5
+        self.assertEqual(1, len(self.REPORT.get_stages()))
+        self.assertEqual(10, self.REPORT.get_stage('upload', 'fall.csv')['facts'])
+
+    def test_nested_stage_is_excluded_from_outer_stage(self):
+        with self.REPORT.measure('upload'):
+            with self.REPORT.measure('conversion'):
+                time.sleep(0.05)
+        self.assertGreaterEqual(self.REPORT.get_stage('conversion')['seconds_wall'], 0.05)
+        self.assertLess(self.REPORT.get_stage('upload')['seconds_wall'], 0.05)
+
+    def test_measure_iterator(self):
+        list_items = list(self.REPORT.measure_iterator('reading', [[1, 2], [3]], 'fab.csv'))
+        self.assertEqual([[1, 2], [3]], list_items)
+        self.assertEqual(3, self.REPORT.get_stage('reading', 'fab.csv')['rows_out'])
+
+    def test_add_stages(self):
+        report_worker = ImportStageReport()
+        with report_worker.measure('preprocessing', 'icd.csv') as stage:
+            stage['rows_in'] += 7
+        self.REPORT.add_stages(report_worker.get_stages())
+        self.REPORT.add_stages(report_worker.get_stages())
+        self.assertEqual(14, self.REPORT.get_stage('preprocessing', 'icd.csv')['rows_in'])
+
+    def test_to_dict(self):
+        with self.REPORT.measure('matching') as stage:
+            stage['rows_in'] += 10
+            time.sleep(0.001)
+        dict_report = self.REPORT.to_dict()
+        self.assertEqual('p21.zip', dict_report['path_zip'])
+        self.assertEqual(['matching'], [stage['stage'] for stage in dict_report['stages']])
+        self.assertIn('rows_per_second', dict_report['stages'][0])
+        self.assertNotIn('facts_per_second', dict_report['stages'][0])
+
+    def test_write_report_as_json_lines(self):
+        with tempfile.TemporaryDirectory() as path_folder:
+            path_report = os.path.join(path_folder, 'report.jsonl')
+            os.environ['p21_report_path'] = path_report
+            self.REPORT.write()
+            self.REPORT.write()
+            with open(path_report, encoding='utf-8') as file_report:
+                list_reports = [json.loads(line) for line in file_report]
+        self.assertEqual(2, len(list_reports))
+        self.assertEqual('p21.zip', list_reports[0]['path_zip'])
+
+    def test_to_dict_with_facts_per_file_and_peak_rss(self):
+        for name_csv, num_facts in [('fall.csv', 5), ('icd.csv', 3)]:
+            with self.REPORT.measure('upload', name_csv) as stage:
+                stage['facts'] += num_facts
+        dict_report = self.REPORT.to_dict()
+        self.assertEqual({'fall.csv': 5, 'icd.csv': 3}, dict_report['facts'])
+        self.assertGreater(dict_report['peak_rss_mb'], 0)
+
+    def test_to_prometheus(self):
+        self.REPORT.ATTRIBUTES.update(success=True, encounters_total=10, encounters_matched=8, sql={'kinds': {'select': {'count': 4, 'rows': 0, 'seconds': 0.5}}})
+        with self.REPORT.measure('upload', 'fall.csv') as stage:
+            stage['facts'] += 5
+        list_lines = self.REPORT.to_prometheus().splitlines()
+        self.assertIn('p21_import_success 1', list_lines)
+        self.assertIn('p21_import_encounters{status="total"} 10', list_lines)
+        self.assertIn('p21_import_encounters{status="matched"} 8', list_lines)
+        self.assertNotIn('p21_import_encounters{status="valid"}', ' '.join(list_lines))
+        self.assertIn('p21_import_facts{file="fall.csv"} 5', list_lines)
+        self.assertIn('p21_import_sql_statements{kind="select"} 4', list_lines)
+        self.assertIn('# TYPE p21_import_stage_duration_seconds gauge', list_lines)
+
+    def test_write_metrics_replaces_file(self):
+        with tempfile.TemporaryDirectory() as path_folder:
+            path_metrics = os.path.join(path_folder, 'p21.prom')
+            os.environ['p21_metrics_path'] = path_metrics
+            self.REPORT.write()
+            self.REPORT.ATTRIBUTES['success'] = True
+            self.REPORT.write()
+            with open(path_metrics, encoding='utf-8') as file_metrics:
+                text = file_metrics.read()
+            self.assertEqual(['p21.prom'], os.listdir(path_folder))
+        self.assertEqual(1, text.count('# TYPE p21_import_success gauge'))
+        self.assertIn('p21_import_success 1\n', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+import contextlib
+import io
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+import src.p21import as p21import
+from src.p21import import AktinPropertiesReader
+from src.p21import import DatabaseConnection
+from src.p21import import OneWayAnonymizer
+from src.p21import import P21Importer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.getcwd()), 'resources'))
+import generate_p21_data  # noqa: E402
+
+NUM_ENCOUNTERS = 300
+
+SCHEMA_DATABASE = '''
+CREATE TABLE observation_fact (encounter_num INTEGER, patient_num INTEGER, concept_cd TEXT, provider_id TEXT, start_date TEXT, modifier_cd TEXT,
+                               instance_num INTEGER, valtype_cd TEXT, tval_char TEXT, nval_num NUMERIC, valueflag_cd TEXT, quantity_num NUMERIC,
+                               units_cd TEXT, end_date TEXT, location_cd TEXT, observation_blob TEXT, confidence_num NUMERIC, update_date TEXT,
+                               download_date TEXT, import_date TEXT, sourcesystem_cd TEXT, upload_id INTEGER, text_search_index INTEGER);
+CREATE TABLE patient_mapping (patient_ide TEXT, patient_num INTEGER);
+CREATE TABLE encounter_mapping (encounter_ide TEXT, encounter_num INTEGER, patient_ide TEXT);
+CREATE TABLE optinout_patients (study_id TEXT, pat_psn TEXT);
+'''
+
+QUERY_FACTS = ('SELECT encounter_num, patient_num, concept_cd, provider_id, start_date, modifier_cd, instance_num, valtype_cd, tval_char, nval_num, '
+               'valueflag_cd, units_cd, end_date, location_cd, sourcesystem_cd, import_date IS NOT NULL FROM observation_fact ORDER BY 1, 3, 6, 7, 5, 9, 10')
+
+
+class SQLiteCursor:
+    """
+    Stand-in for a psycopg2 cursor on a sqlite database. Placeholders are translated
+    to the qmark style of sqlite, mogrify() quotes the values like psycopg2
+    """
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.CURSOR = connection.cursor()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.CURSOR.close()
+
+    @property
+    def rowcount(self) -> int:
+        return self.CURSOR.rowcount
+
+    @staticmethod
+    def __translate_placeholders(query: str) -> str:
+        return re.sub(r'%([s%])', lambda match: '?' if match.group(1) == 's' else '%', query)
+
+    def execute(self, query: str, parameters: tuple = None):
+        self.CURSOR.execute(self.__translate_placeholders(query), parameters or ())
+
+    def executemany(self, query: str, list_parameters: list):
+        self.CURSOR.executemany(self.__translate_placeholders(query), list_parameters)
+
+    def fetchall(self) -> list:
+        return self.CURSOR.fetchall()
+
+    @staticmethod
+    def mogrify(query: str, parameters: tuple) -> bytes:
+        def quote(value) -> str:
+            if value is None:
+                return 'NULL'
+            if isinstance(value, (int, float)):
+                return str(value)
+            return "'{0}'".format(str(value).replace("'", "''"))
+        return (query % tuple(quote(value) for value in parameters)).encode()
+
+
+class SQLiteConnection:
+
+    def __init__(self, path_db: str):
+        self.CONNECTION = sqlite3.connect(path_db)
+
+    def cursor(self) -> SQLiteCursor:
+        return SQLiteCursor(self.CONNECTION)
+
+    def commit(self):
+        self.CONNECTION.commit()
+
+    def rollback(self):
+        self.CONNECTION.rollback()
+
+    def close(self):
+        self.CONNECTION.close()
+
+
+def connect(url: str) -> SQLiteConnection:
+    return SQLiteConnection(url[len('sqlite:///'):])
+
+
+def execute_values(cursor: SQLiteCursor, statement: str, list_rows: list, template: str):
+    cursor.executemany(statement.replace('VALUES %s', 'VALUES ' + template), list_rows)
+
+
+class TestLightweightImporter(unittest.TestCase):
+    """
+    Imports the same zip file with the LightweightImporter and with the pandas engine
+    into two sqlite databases given by 'p21_database_url'. The LightweightImporter
+    connects to the database by a stand-in of psycopg2 (see SQLiteConnection)
+    """
+
+    def setUp(self) -> None:
+        self.DIR_TMP = tempfile.TemporaryDirectory()
+        self.PATH_ZIP = os.path.join(self.DIR_TMP.name, 'p21.zip')
+        generate_p21_data.write_p21_zip(self.PATH_ZIP, NUM_ENCOUNTERS, seed=7, rate_invalid=0.01)
+        self.ENV = {'username': 'test', 'password': 'test', 'connection-url': 'jdbc:postgresql://localhost:5432/i2b2', 'uuid': 'a70bfc58fd1f',
+                    'script_id': 'test', 'script_version': '1.0', 'path_aktin_properties': os.path.join(os.path.dirname(os.getcwd()), 'resources', 'aktin.properties'),
+                    'p21_progress_interval': '0'}
+
+    def tearDown(self) -> None:
+        DatabaseConnection.dispose_engines()
+        self.DIR_TMP.cleanup()
+
+    def __create_database(self, name: str) -> str:
+        """
+        All encounters except every seventh are in the database, every fifth of them
+        was already imported and is updated
+        """
+        path_db = os.path.join(self.DIR_TMP.name, name)
+        with mock.patch.dict(os.environ, self.ENV):
+            reader = AktinPropertiesReader()
+            anonymizer = OneWayAnonymizer(reader.get_property('pseudonym.algorithm'))
+            list_ids = [str(generate_p21_data.ID_FIRST + i) for i in range(NUM_ENCOUNTERS) if i % 7]
+            list_hashes = anonymizer.anonymize_list(reader.get_property('cda.billing.root.preset'), list_ids, reader.get_property('pseudonym.salt'))
+        with contextlib.closing(sqlite3.connect(path_db)) as connection:
+            connection.executescript(SCHEMA_DATABASE)
+            connection.executemany('INSERT INTO patient_mapping VALUES (?, ?)', ((f'patient{i}', i) for i in range(len(list_ids))))
+            connection.executemany("INSERT INTO observation_fact (encounter_num, patient_num, concept_cd, tval_char, provider_id, modifier_cd, instance_num, start_date) "
+                                   "VALUES (?, ?, 'AKTIN:Fallkennzeichen', ?, '@', '@', 1, '2020-01-01')",
+                                   ((i, i, hash_id) for i, hash_id in enumerate(list_hashes)))
+            connection.executemany("INSERT INTO observation_fact (encounter_num, patient_num, concept_cd, modifier_cd, provider_id, sourcesystem_cd, instance_num, start_date) "
+                                   "VALUES (?, ?, 'P21:SCRIPT', 'scriptId', 'P21', 'test_old', 1, '2020-01-01')",
+                                   ((i, i) for i in range(0, len(list_ids), 5)))
+            connection.commit()
+        return path_db
+
+    def __import(self, path_db: str, threshold: int) -> tuple:
+        """
+        Returns the facts of the database, the numbers of imported and updated encounters
+        and the engine of the import report
+        """
+        path_report = os.path.join(self.DIR_TMP.name, 'report.jsonl')
+        psycopg2 = types.SimpleNamespace(connect=connect, Error=sqlite3.Error)
+        env = {**self.ENV, 'p21_database_url': 'sqlite:///{0}'.format(path_db), 'p21_lightweight_threshold': str(threshold), 'p21_report_path': path_report}
+        with mock.patch.dict(os.environ, env), mock.patch.object(p21import, 'psycopg2', psycopg2), \
+                mock.patch.object(p21import, 'psycopg2_extras', types.SimpleNamespace(execute_values=execute_values)), contextlib.redirect_stdout(io.StringIO()):
+            importer = P21Importer(self.PATH_ZIP)
+            importer.import_file()
+        with open(path_report, encoding='utf-8') as file_report:
+            engine = file_report.readlines()[-1]
+        with contextlib.closing(sqlite3.connect(path_db)) as connection:
+            list_facts = connection.execute(QUERY_FACTS).fetchall()
+        return list_facts, importer.get_import_results(), engine
+
+    def test_same_facts_as_pandas_engine(self):
+        list_facts_pandas, results_pandas, engine_pandas = self.__import(self.__create_database('pandas.sqlite'), 0)
+        list_facts_lightweight, results_lightweight, engine_lightweight = self.__import(self.__create_database('lightweight.sqlite'), 10 ** 9)
+        self.assertIn('"engine": "pandas"', engine_pandas)
+        self.assertIn('"engine": "lightweight"', engine_lightweight)
+        self.assertGreater(len(list_facts_pandas), NUM_ENCOUNTERS * 10)
+        self.assertEqual(list_facts_pandas, list_facts_lightweight)
+        self.assertEqual(results_pandas, results_lightweight)
+        num_imports, num_updates = results_lightweight
+        self.assertGreater(num_imports, 0)
+        self.assertGreater(num_updates, 0)
+
+    def test_upload_with_quote_in_static_column(self):
+        """
+        The static columns are inserted as literals of the values template of
+        execute_values (see PsycopgObservationFactTableHandler.upload_data())
+        """
+        self.ENV['uuid'] = "a70b'fc%s"
+        list_facts, (num_imports, num_updates), _ = self.__import(self.__create_database('lightweight.sqlite'), 10 ** 9)
+        self.assertGreater(num_imports + num_updates, 0)
+        self.assertIn("test_a70b'fc%s", {fact[14] for fact in list_facts})
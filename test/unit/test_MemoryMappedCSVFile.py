@@ -0,0 +1,74 @@
+import os
+import unittest
+
+from src.p21import import MemoryMappedCSVFile
+from src.p21import import TmpFolderManager
+
+
+class TestMemoryMappedCSVFile(unittest.TestCase):
+
+    def setUp(self) -> None:
+        path_parent = os.path.dirname(os.getcwd())
+        path_resources = os.path.join(path_parent, 'resources')
+        self.TMP = TmpFolderManager(path_resources)
+        path_tmp = self.TMP.create_tmp_folder()
+        self.PATH_CSV = os.path.join(path_tmp, 'test.csv')
+
+    def tearDown(self) -> None:
+        self.TMP.remove_tmp_folder()
+
+    def __write_csv(self, content: bytes):
+        with open(self.PATH_CSV, 'wb') as file_csv:
+            file_csv.write(content)
+
+    def __read_csv(self) -> bytes:
+        with open(self.PATH_CSV, 'rb') as file_csv:
+            return file_csv.read()
+
+    def test_count_records(self):
+        self.__write_csv(b'a;b\n1;2\n3;4\n')
+        self.assertEqual(3, MemoryMappedCSVFile(self.PATH_CSV).count_records())
+
+    def test_count_records_without_trailing_newline(self):
+        self.__write_csv(b'a;b\n1;2\n3;4')
+        self.assertEqual(3, MemoryMappedCSVFile(self.PATH_CSV).count_records())
+
+    def test_count_records_of_empty_file(self):
+        self.__write_csv(b'')
+        self.assertEqual(0, MemoryMappedCSVFile(self.PATH_CSV).count_records())
+
+    def test_count_records_with_newlines_in_quoted_fields(self):
+        self.__write_csv(b'a;b\n"1\n1";2\n"3"";\n4";"x"\n')
+        self.assertEqual(3, MemoryMappedCSVFile(self.PATH_CSV).count_records())
+
+    def test_count_records_with_quoted_fields_across_blocks(self):
+        self.__write_csv(b'a;b\n"1\n1";2\n"3\n\n3";4\n5;6\n')
+        mmcsv = MemoryMappedCSVFile(self.PATH_CSV)
+        mmcsv.SIZE_BLOCK = 3
+        self.assertEqual(4, mmcsv.count_records())
+
+    def test_replace_header_of_same_length(self):
+        self.__write_csv(b'A;B\n1;2\n')
+        MemoryMappedCSVFile(self.PATH_CSV).replace_header(b'a;b\n')
+        self.assertEqual(b'a;b\n1;2\n', self.__read_csv())
+
+    def test_replace_header_with_longer_header(self):
+        self.__write_csv(b'A;B\n1;2\n3;4\n')
+        MemoryMappedCSVFile(self.PATH_CSV).replace_header(b'aaa;bbb\n')
+        self.assertEqual(b'aaa;bbb\n1;2\n3;4\n', self.__read_csv())
+
+    def test_replace_header_with_shorter_header(self):
+        self.__write_csv(b'\xef\xbb\xbfA-A;B-B\r\n1;2\n3;4\n')
+        mmcsv = MemoryMappedCSVFile(self.PATH_CSV)
+        mmcsv.SIZE_BLOCK = 4
+        mmcsv.replace_header(b'aa;bb\n')
+        self.assertEqual(b'aa;bb\n1;2\n3;4\n', self.__read_csv())
+
+    def test_replace_header_of_header_only_file(self):
+        self.__write_csv(b'A;B')
+        MemoryMappedCSVFile(self.PATH_CSV).replace_header(b'a;b\n')
+        self.assertEqual(b'a;b\n', self.__read_csv())
+
+
+if __name__ == '__main__':
+    unittest.main()
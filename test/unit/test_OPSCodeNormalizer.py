@@ -0,0 +1,23 @@
+import unittest
+import pandas as pd
+
+from src.p21import import OPSCodeNormalizer
+
+
+class TestOPSCodeNormalizer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.NORMALIZER = OPSCodeNormalizer()
+        self.LIST_CODES = ['964922', '9-64922', '9649.22', '9-649.22', '1-5020', '1-501', '1501']
+        self.LIST_CONCEPTS = ['OPS:9-649.22', 'OPS:9-649.22', 'OPS:9-649.22', 'OPS:9-649.22', 'OPS:1-502.0', 'OPS:1-501', 'OPS:1-501']
+
+    def test_get_concept(self):
+        self.assertEqual(self.LIST_CONCEPTS, [self.NORMALIZER.get_concept(code) for code in self.LIST_CODES])
+
+    def test_convert_series(self):
+        series = pd.Series(self.LIST_CODES + [''])
+        self.assertEqual(self.LIST_CONCEPTS + [None], self.NORMALIZER.convert_series(series).tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+from src.p21import import ObservationFactBuffer
+
+
+class TestObservationFactBuffer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.BUFFER = ObservationFactBuffer()
+        self.CHUNK = pd.DataFrame({'encounter_num': ['E1', 'E2'], 'patient_num': ['P1', 'P2'], 'date_admission': ['2020-01-01 00:00', '2020-01-02 00:00']})
+
+    def test_add_facts_with_defaults(self):
+        self.BUFFER.add_facts(self.CHUNK, concept_cd='P21:DV', modifier_cd='@', valtype_cd='N', nval_num=pd.Series(['1', '2']))
+        self.assertEqual(2, len(self.BUFFER))
+        fact = self.BUFFER.to_dicts()[1]
+        self.assertEqual('E2', fact['encounter_num'])
+        self.assertEqual('P2', fact['patient_num'])
+        self.assertEqual('P21:DV', fact['concept_cd'])
+        self.assertEqual('2020-01-02 00:00', fact['start_date'])
+        self.assertEqual(1, fact['instance_num'])
+        self.assertEqual('2', fact['nval_num'])
+        self.assertIsNone(fact['tval_char'])
+        self.assertEqual('@', fact['units_cd'])
+        self.assertEqual(list(ObservationFactBuffer.COLUMNS), list(fact.keys()))
+
+    def test_add_facts_with_arrays(self):
+        self.BUFFER.add_facts(self.CHUNK, concept_cd=np.array(['A', 'B']), modifier_cd='@', valtype_cd='@', instance_num=np.array([3, 4]))
+        self.assertEqual(['A', 'B'], self.BUFFER.ARRAYS[ObservationFactBuffer.COLUMNS.index('concept_cd')])
+        self.assertEqual([3, 4], self.BUFFER.ARRAYS[ObservationFactBuffer.COLUMNS.index('instance_num')])
+        self.assertIs(int, type(self.BUFFER.to_dicts()[0]['instance_num']))
+
+    def test_add_facts_of_empty_chunk(self):
+        self.BUFFER.add_facts(self.CHUNK.iloc[0:0], concept_cd='A', modifier_cd='@', valtype_cd='@')
+        self.assertEqual(0, len(self.BUFFER))
+
+    def test_append_fact(self):
+        fact = dict.fromkeys(ObservationFactBuffer.COLUMNS, 'x')
+        self.BUFFER.append_fact(fact)
+        self.assertEqual([tuple(fact.values())], list(self.BUFFER.iter_rows()))
+
+
+if __name__ == '__main__':
+    unittest.main()
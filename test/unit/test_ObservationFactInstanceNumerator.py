@@ -0,0 +1,48 @@
+import random
+import unittest
+import pandas as pd
+
+from src.p21import import ObservationFactInstanceCounter
+from src.p21import import ObservationFactInstanceNumerator
+
+
+class TestObservationFactInstanceNumerator(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.NUMERATOR = ObservationFactInstanceNumerator()
+
+    def test_number_single_chunk(self):
+        ids = pd.Series(['1', '2', '1', '3', '1', '2'])
+        self.assertEqual([1, 1, 2, 1, 3, 2], self.NUMERATOR.add_chunk_instance_counts(ids).tolist())
+
+    def test_number_across_chunks(self):
+        self.NUMERATOR.add_chunk_instance_counts(pd.Series(['1', '2', '1']))
+        ids = pd.Series(['3', '1', '2'])
+        self.assertEqual([1, 3, 2], self.NUMERATOR.add_chunk_instance_counts(ids).tolist())
+
+    def test_number_with_weights(self):
+        ids = pd.Series(['1', '1', '2', '1'])
+        weights = pd.Series([2, 1, 2, 2])
+        self.assertEqual([1, 3, 1, 4], self.NUMERATOR.add_chunk_instance_counts(ids, weights).tolist())
+        self.assertEqual([6, 3], self.NUMERATOR.add_chunk_instance_counts(pd.Series(['1', '2'])).tolist())
+
+    def test_same_numbers_as_counter(self):
+        rng = random.Random(42)
+        list_ids = [str(rng.randint(1, 50)) for _ in range(1000)]
+        list_weights = [rng.randint(1, 2) for _ in range(1000)]
+        counter = ObservationFactInstanceCounter()
+        list_expected = []
+        for id_case, weight in zip(list_ids, list_weights):
+            list_expected.append(counter.add_row_instance_count(id_case))
+            for _ in range(weight - 1):
+                counter.add_row_instance_count(id_case)
+        list_instances = []
+        for i in range(0, 1000, 300):
+            ids = pd.Series(list_ids[i:i + 300])
+            weights = pd.Series(list_weights[i:i + 300])
+            list_instances.extend(self.NUMERATOR.add_chunk_instance_counts(ids, weights).tolist())
+        self.assertEqual(list_expected, list_instances)
+
+
+if __name__ == '__main__':
+    unittest.main()
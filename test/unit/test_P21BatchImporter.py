@@ -0,0 +1,44 @@
+import contextlib
+import io
+import unittest
+import os
+from unittest import mock
+
+from src.p21import import P21BatchImporter
+from src.p21import import P21Importer
+
+
+class TestP21BatchImporter(unittest.TestCase):
+
+    def test_init_with_valid_zip_files(self):
+        path_parent = os.path.dirname(os.getcwd())
+        path_zip = os.path.join(path_parent, 'resources', 'p21_verification.zip')
+        _ = P21BatchImporter([path_zip, path_zip])
+
+    def test_init_with_invalid_zip_file(self):
+        path_parent = os.path.dirname(os.getcwd())
+        path_zip = os.path.join(path_parent, 'resources', 'p21_verification.zip')
+        with self.assertRaises(SystemExit):
+            P21BatchImporter([path_zip, 'p21.zip'])
+
+    def test_failing_zip_file_does_not_stop_batch(self):
+        path_parent = os.path.dirname(os.getcwd())
+        path_zip = os.path.join(path_parent, 'resources', 'p21_verification.zip')
+        batch = P21BatchImporter([path_zip, path_zip, path_zip])
+        stdout, stderr = io.StringIO(), io.StringIO()
+        side_effect = [ValueError("time data '202002301230' does not match format"), SystemExit('no valid encounter found'), None]
+        with mock.patch.object(P21Importer, 'import_file', side_effect=side_effect) as import_file, \
+                contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            self.assertFalse(batch.import_files())
+        self.assertEqual(3, import_file.call_count)
+        self.assertIn('Traceback', stderr.getvalue())
+        list_lines = stdout.getvalue().splitlines()
+        index_report = list_lines.index('Zusammenfassung:')
+        self.assertIn("fehlgeschlagen nach", list_lines[index_report + 1])
+        self.assertIn("ValueError: time data '202002301230'", list_lines[index_report + 1])
+        self.assertIn("(no valid encounter found)", list_lines[index_report + 2])
+        self.assertIn("0 Fälle hochgeladen", list_lines[index_report + 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
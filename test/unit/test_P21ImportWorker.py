@@ -0,0 +1,58 @@
+import io
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stderr
+
+from src.p21import import P21ImportWorker
+from src.p21import import P21ImportWorkerClient
+
+
+class TestP21ImportWorker(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.DIR_TMP = tempfile.TemporaryDirectory()
+        self.PATH_SOCKET = os.path.join(self.DIR_TMP.name, 'p21.sock')
+
+    def tearDown(self) -> None:
+        self.DIR_TMP.cleanup()
+
+    def test_run_job_with_invalid_zip_file(self):
+        file_out = io.StringIO()
+        code_exit = P21ImportWorker.run_job({'path_zip': 'p21.zip', 'env': {}}, file_out)
+        self.assertEqual(1, code_exit)
+        self.assertIn({'stderr': 'file path is not valid'}, [json.loads(line) for line in file_out.getvalue().splitlines()])
+
+    def test_run_job_restores_environment(self):
+        os.environ.pop('p21_test_variable', None)
+        P21ImportWorker.run_job({'path_zip': 'p21.zip', 'env': {'p21_test_variable': '1'}}, io.StringIO())
+        self.assertNotIn('p21_test_variable', os.environ)
+
+    def test_submit_without_worker(self):
+        self.assertIsNone(P21ImportWorkerClient(self.PATH_SOCKET).submit('p21.zip'))
+
+    def test_submit_to_worker(self):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(self.PATH_SOCKET)
+            server.listen()
+            thread = threading.Thread(target=self.__handle_one_connection, args=(server,))
+            thread.start()
+            stderr = io.StringIO()
+            with redirect_stderr(stderr):
+                code_exit = P21ImportWorkerClient(self.PATH_SOCKET).submit('p21.zip')
+            thread.join()
+        self.assertEqual(1, code_exit)
+        self.assertIn('file path is not valid', stderr.getvalue())
+
+    @staticmethod
+    def __handle_one_connection(server: socket.socket):
+        conn, _ = server.accept()
+        with conn:
+            P21ImportWorker('').handle_connection(conn)
+
+
+if __name__ == '__main__':
+    unittest.main()
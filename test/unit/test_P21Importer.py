@@ -0,0 +1,98 @@
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import zipfile
+from concurrent import futures
+from unittest import mock
+
+from src.p21import import P21Importer
+
+
+class TestP21Importer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        path_parent = os.path.dirname(os.getcwd())
+        self.PATH_ZIP_VERIFICATION = os.path.join(path_parent, 'resources', 'p21_verification.zip')
+        self.DIR_TMP = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.DIR_TMP.cleanup()
+
+    def __create_zip(self, dict_names: dict) -> str:
+        """
+        dict_names -> { name in created zip : name in p21_verification.zip }
+        """
+        path_zip = os.path.join(self.DIR_TMP.name, 'p21.zip')
+        with zipfile.ZipFile(self.PATH_ZIP_VERIFICATION) as zip_in, zipfile.ZipFile(path_zip, 'w') as zip_out:
+            for name_out, name_in in dict_names.items():
+                zip_out.writestr(name_out, zip_in.read(name_in))
+        return path_zip
+
+    def test_check_file(self):
+        path_zip = self.__create_zip({'FALL.csv': 'FALL.csv', 'FAB.csv': 'FAB.csv', 'ICD.csv': 'ICD.csv', 'OPS.csv': 'OPS.csv'})
+        P21Importer(path_zip).check_file()
+        self.assertEqual(['p21.zip'], os.listdir(self.DIR_TMP.name))
+
+    def test_check_file_without_fall(self):
+        path_zip = self.__create_zip({'FAB.csv': 'FAB.csv'})
+        with self.assertRaises(SystemExit):
+            P21Importer(path_zip).check_file()
+        self.assertEqual(['p21.zip'], os.listdir(self.DIR_TMP.name))
+
+    def test_check_file_with_missing_columns(self):
+        path_zip = self.__create_zip({'FALL.csv': 'FALL.csv', 'FAB.csv': 'FAB_missing_cols.csv'})
+        with self.assertRaises(SystemExit):
+            P21Importer(path_zip).check_file()
+
+    def __import_in_process_pool(self, path_zip: str) -> tuple:
+        """
+        Imports given zip file with the pandas engine and the csv files preprocessed in a
+        process pool of four workers. Returns the SystemExit of the import and the stages
+        of its report
+        """
+        path_report = os.path.join(self.DIR_TMP.name, 'report.jsonl')
+        env = {'uuid': 'a70bfc58fd1f', 'script_id': 'test', 'script_version': '1.0', 'p21_lightweight_threshold': '0', 'p21_report_path': path_report}
+        pool = mock.MagicMock(wraps=futures.ProcessPoolExecutor)
+        with mock.patch.dict(os.environ, env), mock.patch('os.cpu_count', return_value=4), mock.patch.object(futures, 'ProcessPoolExecutor', pool), \
+                contextlib.redirect_stdout(io.StringIO()), self.assertRaises(SystemExit) as context:
+            P21Importer(path_zip).import_file()
+        pool.assert_called_once_with(max_workers=4)
+        with open(path_report, encoding='utf-8') as file_report:
+            dict_report = json.loads(file_report.readline())
+        return context.exception, dict_report['stages']
+
+    def test_preprocess_in_process_pool_raises_first_failing_file(self):
+        path_zip = self.__create_zip({'FALL.csv': 'FALL.csv', 'FAB.csv': 'FAB_missing_cols.csv', 'ICD.csv': 'ICD.csv', 'OPS.csv': 'OPS_missing_cols.csv'})
+        for _ in range(3):
+            exit_import, _ = self.__import_in_process_pool(path_zip)
+            self.assertIn('fab.csv', str(exit_import.code))
+
+    def test_preprocess_in_process_pool_merges_stages_of_workers(self):
+        path_zip = self.__create_zip({'FALL.csv': 'FALL_empty.csv', 'FAB.csv': 'FAB.csv', 'ICD.csv': 'ICD.csv', 'OPS.csv': 'OPS.csv'})
+        exit_import, list_stages = self.__import_in_process_pool(path_zip)
+        self.assertEqual('no valid encounter found in fall.csv', exit_import.code)
+        dict_stages = {(stage['stage'], stage['file']): stage for stage in list_stages}
+        for name_csv in ['fall.csv', 'fab.csv', 'icd.csv', 'ops.csv']:
+            for name_stage in ['preprocessing', 'check_column_names']:
+                self.assertGreater(dict_stages[(name_stage, name_csv)]['seconds_wall'], 0)
+        self.assertGreater(dict_stages[('preprocessing', 'icd.csv')]['seconds_cpu'], 0)
+        self.assertIn(('preprocessing_all_files', None), dict_stages)
+
+    def test_check_file_loads_no_heavy_modules(self):
+        path_zip = self.__create_zip({'FALL.csv': 'FALL.csv', 'ICD.csv': 'ICD.csv'})
+        path_script = os.path.join(os.path.dirname(os.path.dirname(os.getcwd())), 'src', 'p21import.py')
+        code = ('import runpy, sys\n'
+                'sys.argv = ["p21import.py", "--check-only", sys.argv[1]]\n'
+                'runpy.run_path({0!r}, run_name="__main__")\n'
+                'print(sorted(m for m in ("pandas", "sqlalchemy", "numpy", "psycopg2", "pyarrow") if m in sys.modules))').format(path_script)
+        result = subprocess.run([sys.executable, '-c', code, path_zip], capture_output=True, text=True, check=True)
+        self.assertEqual('[]', result.stdout.splitlines()[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
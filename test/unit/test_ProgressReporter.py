@@ -0,0 +1,53 @@
+import contextlib
+import io
+import os
+import unittest
+
+from src.p21import import ProgressReporter
+
+
+class TestProgressReporter(unittest.TestCase):
+
+    def tearDown(self) -> None:
+        os.environ.pop('p21_progress_interval', None)
+
+    def test_format_progress_with_total(self):
+        progress = ProgressReporter('fall.csv')
+        progress.start(1000)
+        progress.add_rows(250)
+        progress.add_facts(1000)
+        self.assertEqual('fall.csv: 250 von 1000 Zeilen (25.0 %), 50 Zeilen/s, 200 Fakten/s, verbleibend ca. 0:00:15', progress.format_progress(5.0))
+
+    def test_format_progress_without_total(self):
+        progress = ProgressReporter('icd.csv')
+        progress.add_rows(100)
+        self.assertEqual('icd.csv: 100 Zeilen, 10 Zeilen/s', progress.format_progress(10.0))
+
+    def test_print_is_throttled(self):
+        os.environ['p21_progress_interval'] = '3600'
+        progress = ProgressReporter('fall.csv')
+        progress.start(10)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            for _ in range(10):
+                progress.add_rows(1)
+        self.assertEqual('', output.getvalue())
+
+    def test_print_when_due(self):
+        os.environ['p21_progress_interval'] = '0.000001'
+        progress = ProgressReporter('fall.csv')
+        progress.start(10)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            progress.add_rows(5)
+        self.assertTrue(output.getvalue().startswith('fall.csv: 5 von 10 Zeilen (50.0 %)'))
+
+    def test_disabled(self):
+        os.environ['p21_progress_interval'] = '0'
+        progress = ProgressReporter('fall.csv')
+        self.assertFalse(progress.is_enabled())
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            progress.add_rows(5)
+        self.assertEqual('', output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import unittest
+
+import sqlalchemy as db
+
+from src.p21import import SQLStatementMonitor
+
+
+class TestSQLStatementMonitor(unittest.TestCase):
+
+    def setUp(self) -> None:
+        os.environ.pop('p21_sql_explain', None)
+        self.ENGINE = db.create_engine('sqlite://')
+        SQLStatementMonitor.register(self.ENGINE)
+        with self.ENGINE.begin() as conn:
+            conn.exec_driver_sql('CREATE TABLE observation_fact (encounter_num INTEGER, concept_cd TEXT)')
+        self.MONITOR = SQLStatementMonitor()
+        self.MONITOR.start()
+
+    def tearDown(self) -> None:
+        self.MONITOR.stop()
+        self.ENGINE.dispose()
+
+    def __lookup_encounters(self, num_encounters: int):
+        with self.ENGINE.connect() as conn:
+            for num_enc in range(num_encounters):
+                conn.exec_driver_sql('SELECT concept_cd FROM observation_fact WHERE encounter_num = ?', (num_enc,)).fetchall()
+
+    def test_count_statements_by_kind(self):
+        with self.ENGINE.begin() as conn:
+            conn.exec_driver_sql('INSERT INTO observation_fact VALUES (?, ?)', [(1, 'A'), (2, 'B'), (3, 'C')])
+            conn.exec_driver_sql('DELETE FROM observation_fact WHERE encounter_num = 1')
+        self.__lookup_encounters(2)
+        dict_kinds = self.MONITOR.to_dict()['kinds']
+        self.assertEqual({'count': 1, 'rows': 3}, {k: dict_kinds['insert'][k] for k in ['count', 'rows']})
+        self.assertEqual({'count': 1, 'rows': 1}, {k: dict_kinds['delete'][k] for k in ['count', 'rows']})
+        self.assertEqual(2, dict_kinds['select']['count'])
+
+    def test_group_inserts_by_columns(self):
+        self.MONITOR.record('INSERT INTO observation_fact (encounter_num) VALUES (1), (2)', 0.1, 2)
+        self.MONITOR.record('INSERT INTO observation_fact (encounter_num) VALUES (3)', 0.2, 1)
+        self.assertEqual(['INSERT INTO observation_fact (encounter_num) VALUES ...'], list(self.MONITOR.STATEMENTS.keys()))
+        self.assertEqual(3, self.MONITOR.STATEMENTS['INSERT INTO observation_fact (encounter_num) VALUES ...']['rows'])
+
+    def test_detect_statements_repeated_per_encounter(self):
+        self.__lookup_encounters(10)
+        with self.ENGINE.connect() as conn:
+            conn.exec_driver_sql('SELECT count(*) FROM observation_fact').fetchall()
+        result = self.MONITOR.to_dict(num_encounters=10)
+        self.assertEqual(11, result['statements'])
+        self.assertEqual(1.1, result['statements_per_encounter'])
+        self.assertEqual(1, len(result['repeated_per_encounter']))
+        self.assertEqual(1.0, result['repeated_per_encounter'][0]['count_per_encounter'])
+        self.assertEqual('SELECT concept_cd FROM observation_fact WHERE encounter_num = ?', result['slowest'][0]['statement'])
+
+    def test_no_recording_without_active_monitor(self):
+        self.MONITOR.stop()
+        self.__lookup_encounters(3)
+        with SQLStatementMonitor.measure('SELECT 1') as list_counts:
+            list_counts.append(1)
+        self.assertEqual({}, self.MONITOR.STATEMENTS)
+
+    def test_measure_statement_without_sqlalchemy(self):
+        with SQLStatementMonitor.measure('DELETE FROM observation_fact WHERE encounter_num = %s') as list_counts:
+            list_counts.append(4)
+        entry = self.MONITOR.STATEMENTS['DELETE FROM observation_fact WHERE encounter_num = %s']
+        self.assertEqual('delete', entry['kind'])
+        self.assertEqual(1, entry['count'])
+        self.assertEqual(4, entry['rows'])
+
+    def test_capture_failed_explain(self):
+        os.environ['p21_sql_explain'] = 'true'
+        monitor = SQLStatementMonitor()
+        monitor.start()
+        self.__lookup_encounters(1)
+        monitor.stop()
+        entry = monitor.to_dict()['slowest'][0]
+        self.assertTrue(entry['plan'].startswith('EXPLAIN failed'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.p21import import StageProfiler
+
+
+class TestStageProfiler(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.PATH_TMP = tempfile.mkdtemp()
+
+    def tearDown(self) -> None:
+        os.environ.pop('p21_profile_dir', None)
+        shutil.rmtree(self.PATH_TMP)
+
+    def test_disabled_without_profile_dir(self):
+        os.environ.pop('p21_profile_dir', None)
+        profiler = StageProfiler('p21')
+        self.assertFalse(profiler.is_enabled())
+        with profiler.profile('matching'):
+            sum(range(1000))
+        self.assertIsNone(profiler.PATH_FOLDER)
+        self.assertEqual([], os.listdir(self.PATH_TMP))
+
+    def test_profile_stages(self):
+        os.environ['p21_profile_dir'] = self.PATH_TMP
+        profiler = StageProfiler('p21')
+        with profiler.profile('matching'):
+            list_numbers = [str(i) for i in range(1000)]
+        with profiler.profile('upload', 'fall.csv'):
+            sum(range(1000))
+        self.assertEqual(1000, len(list_numbers))
+        self.assertTrue(os.path.basename(profiler.PATH_FOLDER).startswith('p21_'))
+        list_files = sorted(os.path.basename(path) for path in glob.glob(os.path.join(profiler.PATH_FOLDER, '*')))
+        self.assertEqual(['01_matching.pstats', '01_matching_allocations.txt', '02_upload_fall.csv.pstats', '02_upload_fall.csv_allocations.txt'], list_files)
+        with open(os.path.join(profiler.PATH_FOLDER, '01_matching_allocations.txt')) as file:
+            self.assertIn('peak of traced memory', file.read())
+
+    def test_separate_folder_per_import(self):
+        os.environ['p21_profile_dir'] = self.PATH_TMP
+        list_profilers = [StageProfiler('p21'), StageProfiler('p21')]
+        for profiler in list_profilers:
+            with profiler.profile('matching'):
+                pass
+        self.assertNotEqual(list_profilers[0].PATH_FOLDER, list_profilers[1].PATH_FOLDER)
+        self.assertEqual(2, len(os.listdir(self.PATH_TMP)))
+
+
+if __name__ == '__main__':
+    unittest.main()
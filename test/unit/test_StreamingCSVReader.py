@@ -0,0 +1,73 @@
+import os
+import unittest
+import pandas as pd
+
+from src.p21import import StreamingCSVReader
+from src.p21import import FALLPreprocessor, FABPreprocessor, ICDPreprocessor, OPSPreprocessor
+from src.p21import import FALLVerifier, FABVerifier, ICDVerifier, OPSVerifier
+from src.p21import import TmpFolderManager
+from src.p21import import ZipFileExtractor
+
+
+class TestStreamingCSVReader(unittest.TestCase):
+
+    def setUp(self) -> None:
+        path_parent = os.path.dirname(os.getcwd())
+        path_resources = os.path.join(path_parent, 'resources')
+        path_zip = os.path.join(path_resources, 'p21_verification.zip')
+        self.TMP = TmpFolderManager(path_resources)
+        zfe = ZipFileExtractor(path_zip)
+        self.PATH_TMP = self.TMP.create_tmp_folder()
+        zfe.extract_zip_to_folder(self.PATH_TMP)
+        self.TMP.rename_files_in_tmp_folder_to_lowercase()
+
+    def tearDown(self) -> None:
+        self.TMP.remove_tmp_folder()
+
+    def test_deduplicate_column_names(self):
+        list_columns = ['a', 'b', 'a', 'a', 'a.1', 'c']
+        self.assertEqual(['a', 'b', 'a.1', 'a.2', 'a.1.1', 'c'], StreamingCSVReader.deduplicate_column_names(list_columns))
+
+    def test_same_header_as_preprocessor(self):
+        for verifier_class, preprocessor_class in [(FALLVerifier, FALLPreprocessor), (FABVerifier, FABPreprocessor),
+                                                   (ICDVerifier, ICDPreprocessor), (OPSVerifier, OPSPreprocessor)]:
+            reader = StreamingCSVReader(verifier_class(self.PATH_TMP), preprocessor_class(self.PATH_TMP))
+            list_header = reader.read_header()
+            reader.check_column_names()
+            preprocessor_class(self.PATH_TMP).preprocess()
+            df = pd.read_csv(reader.VERIFIER.PATH_CSV, nrows=0, sep=';', encoding='utf-8', dtype=str)
+            self.assertTrue(set(list_header).issubset(set(df.columns)))
+
+    def test_check_missing_column_names(self):
+        FALLVerifier.CSV_NAME = 'fall_missing_cols.csv'
+        FALLPreprocessor.CSV_NAME = 'fall_missing_cols.csv'
+        reader = StreamingCSVReader(FALLVerifier(self.PATH_TMP), FALLPreprocessor(self.PATH_TMP))
+        with self.assertRaises(SystemExit):
+            reader.check_column_names()
+        FALLVerifier.CSV_NAME = 'fall.csv'
+        FALLPreprocessor.CSV_NAME = 'fall.csv'
+
+    def test_same_valid_rows_as_verifier(self):
+        for verifier_class, preprocessor_class in [(FALLVerifier, FALLPreprocessor), (FABVerifier, FABPreprocessor),
+                                                   (ICDVerifier, ICDPreprocessor), (OPSVerifier, OPSPreprocessor)]:
+            reader = StreamingCSVReader(verifier_class(self.PATH_TMP), preprocessor_class(self.PATH_TMP))
+            df_streamed = pd.DataFrame(list(reader.read_valid_rows()), columns=reader.VERIFIER.SCHEMA.COLUMNS)
+            preprocessor_class(self.PATH_TMP).preprocess()
+            verifier = verifier_class(self.PATH_TMP)
+            df_verified = pd.concat([chunk.astype(str) for chunk in verifier.read_valid_chunks()])
+            self.assertFalse(df_streamed.empty)
+            pd.testing.assert_frame_equal(df_verified.reset_index(drop=True), df_streamed, check_dtype=False)
+
+    def test_read_valid_rows_with_id_filter(self):
+        reader = StreamingCSVReader(FABVerifier(self.PATH_TMP), FABPreprocessor(self.PATH_TMP))
+        set_ids = {'1000', '1021'}
+        list_rows = list(reader.read_valid_rows(set_ids))
+        self.assertTrue(list_rows)
+        self.assertEqual({'1000'}, {row['khinterneskennzeichen'] for row in list_rows})
+
+    def test_append_zeros_to_internal_id(self):
+        FALLPreprocessor.LEADING_ZEROS = 2
+        reader = StreamingCSVReader(FALLVerifier(self.PATH_TMP), FALLPreprocessor(self.PATH_TMP))
+        list_rows = list(reader.read_valid_rows())
+        FALLPreprocessor.LEADING_ZEROS = 0
+        self.assertTrue(all(row['khinterneskennzeichen'].startswith('00') for row in list_rows))
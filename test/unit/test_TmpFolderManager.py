@@ -1,5 +1,6 @@
 import unittest
 import os
+import tempfile
 from src.p21import import TmpFolderManager
 
 
@@ -9,7 +10,7 @@ def write_basic_file_to_folder(path_folder: str):
 
 
 def does_tmp_folder_exist_in_folder(path_folder: str):
-    return os.path.isdir(os.path.join(path_folder, 'tmp'))
+    return any(name.startswith(TmpFolderManager.PREFIX) for name in os.listdir(path_folder))
 
 
 class TestTmpFolderManager(unittest.TestCase):
@@ -22,11 +23,14 @@ class TestTmpFolderManager(unittest.TestCase):
     def tearDown(self) -> None:
         self.TMP.remove_tmp_folder()
         self.assertFalse(does_tmp_folder_exist_in_folder(self.PATH_RESOURCES))
+        os.environ.pop('p21_tmp_ram_dir', None)
+        os.environ.pop('p21_tmp_ram_limit_mb', None)
 
     def test_create_and_delete_tmp_folder(self):
         self.assertFalse(does_tmp_folder_exist_in_folder(self.PATH_RESOURCES))
-        self.TMP.create_tmp_folder()
+        path_tmp = self.TMP.create_tmp_folder()
         self.assertTrue(does_tmp_folder_exist_in_folder(self.PATH_RESOURCES))
+        self.assertEqual(self.PATH_RESOURCES, os.path.dirname(path_tmp))
 
     def test_rename_files_in_tmp_to_lowercase(self):
         path_tmp = self.TMP.create_tmp_folder()
@@ -34,3 +38,28 @@ class TestTmpFolderManager(unittest.TestCase):
         self.assertEqual(os.listdir(path_tmp), ['TEST'])
         self.TMP.rename_files_in_tmp_folder_to_lowercase()
         self.assertEqual(os.listdir(path_tmp), ['test'])
+
+    def test_concurrent_tmp_folders_are_separate(self):
+        tmp2 = TmpFolderManager(self.PATH_RESOURCES)
+        path_tmp1 = self.TMP.create_tmp_folder()
+        path_tmp2 = tmp2.create_tmp_folder()
+        self.assertNotEqual(path_tmp1, path_tmp2)
+        tmp2.remove_tmp_folder()
+        self.assertTrue(os.path.isdir(path_tmp1))
+        self.assertFalse(os.path.isdir(path_tmp2))
+
+    def test_create_tmp_folder_in_ram_dir(self):
+        with tempfile.TemporaryDirectory() as path_ram:
+            os.environ['p21_tmp_ram_dir'] = path_ram
+            self.TMP = TmpFolderManager(self.PATH_RESOURCES)
+            path_tmp = self.TMP.create_tmp_folder(1024)
+            self.assertEqual(path_ram, os.path.dirname(path_tmp))
+            self.TMP.remove_tmp_folder()
+
+    def test_fallback_to_disk_for_large_content(self):
+        with tempfile.TemporaryDirectory() as path_ram:
+            os.environ['p21_tmp_ram_dir'] = path_ram
+            os.environ['p21_tmp_ram_limit_mb'] = '1'
+            self.TMP = TmpFolderManager(self.PATH_RESOURCES)
+            path_tmp = self.TMP.create_tmp_folder(1024 * 1024)
+            self.assertEqual(self.PATH_RESOURCES, os.path.dirname(path_tmp))
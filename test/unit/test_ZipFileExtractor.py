@@ -1,5 +1,6 @@
 import unittest
 import os
+import tempfile
 from src.p21import import ZipFileExtractor
 
 
@@ -17,3 +18,12 @@ class TestZipFileExtractor(unittest.TestCase):
     def test_extract_zip_to_folder(self):
         # done indirectly by other tests
         pass
+
+    def test_extract_headers_to_folder(self):
+        path_parent = os.path.dirname(os.getcwd())
+        path_zip = os.path.join(path_parent, 'resources', 'p21_verification.zip')
+        with tempfile.TemporaryDirectory() as path_folder:
+            ZipFileExtractor(path_zip).extract_headers_to_folder(path_folder)
+            self.assertEqual(18, len(os.listdir(path_folder)))
+            with open(os.path.join(path_folder, 'FALL.csv'), 'rb') as file_csv:
+                self.assertEqual(1, file_csv.read().count(b'\n'))